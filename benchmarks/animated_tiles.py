@@ -0,0 +1,80 @@
+"""Pads the level's Walls with a block of animated tiles sharing one animation off the global clock and times a game
+tick, next to the same tiles each advancing their own AnimationStates like coins used to. Prints the time per tick
+of both for each tile count.
+
+    python benchmarks/animated_tiles.py --tiles 1000,5000,20000 --ticks 120
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+SRC = Path(__file__).resolve().parent.parent / "src"
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+sys.path.insert(0, str(SRC))
+
+import pygplus as pgp
+
+
+def pad_tiles(engine, count, make_tile):
+    """Fills a block of count cells below the level."""
+    walls = engine.scene["Walls"]
+    columns = 500
+    top = max(y for _, y in walls.hash_tilemap) + 20
+    for index in range(count):
+        grid_pos = (index % columns, top + index//columns)
+        tile = make_tile([grid_pos[0]*walls.tile_size, grid_pos[1]*walls.tile_size])
+        walls.append(tile)
+        walls.hash_tilemap[grid_pos] = tile
+
+
+def time_ticks(engine, ticks):
+    start = time.perf_counter()
+    for tick in range(ticks):
+        engine.keys["right"] = tick % 120 < 60
+        engine.keys["left"] = not engine.keys["right"]
+        engine.update()
+    return (time.perf_counter() - start) / ticks * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tiles", default="1000,5000,20000")
+    parser.add_argument("--ticks", type=int, default=120)
+    args = parser.parse_args()
+
+    os.chdir(SRC)
+    import main as game
+    from sprites import Tile, AnimatedTile
+    engine = game.Engine()
+    frames = pgp.load_spritesheet(Path("assets/tiles/gold_coin/gold_coin_collect.png"))
+
+    class OwnAnimationTile(Tile):
+        """What an animated tile cost before: a state machine per tile, ticked every update."""
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.anim = pgp.animation.AnimationStates({"default": frames}, speed=0.1)
+
+        def update(self):
+            super().update()
+            self.surface = self.anim.update()
+
+    columns = ["tiles", "shared_ms", "own_state_ms"]
+    print(" ".join(f"{column:>14}" for column in columns))
+    for count in args.tiles.split(","):
+        row = {"tiles": int(count)}
+        shared = pgp.animation.SharedAnimation(frames, [100] * len(frames))
+        for name, make_tile in (("shared_ms", lambda pos: AnimatedTile(frames[0], pos, animation=shared)),
+                                ("own_state_ms", lambda pos: OwnAnimationTile(frames[0], pos))):
+            engine.reset()
+            engine.next_level.cancel()
+            pad_tiles(engine, int(count), make_tile)
+            row[name] = time_ticks(engine, args.ticks)
+        print(" ".join(f"{row[column]:>14.3f}" if isinstance(row[column], float) else f"{row[column]:>14}"
+                       for column in columns))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Times Background.draw() at 1600x900 with a few repeating parallax layers, while the camera moves and while it
+stands still, next to blitting every repeat of every layer each frame and to a plain fill. Prints the time per frame
+of each.
+
+    python benchmarks/background.py --layers 3 --frames 300
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+SRC = Path(__file__).resolve().parent.parent / "src"
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+sys.path.insert(0, str(SRC))
+
+import pygame as pg
+import pygplus as pgp
+
+
+def make_layers(count):
+    """A static backdrop at the back, then count repeating layers that move more and more with the camera."""
+    stone = pgp.load_image("assets/tiles/stone.png")
+    brick = pgp.load_image("assets/tiles/brick.png")
+    layers = [pgp.background.ParallaxLayer(pg.transform.scale_by(brick, 4), parallax=(0, 0), offset=(200, 100))]
+    for index in range(count):
+        factor = (index+1) / (count+1)
+        layers.append(pgp.background.ParallaxLayer(stone if index == 0 else brick, parallax=(factor, factor/2),
+                                                   repeat_x=True, repeat_y=index == 0,
+                                                   opacity=255 if index == 0 else 160))
+    return layers
+
+
+def naive(background, target):
+    """What drawing the layers costs without strips or caching: one blit per repeat of the image."""
+    target.fill(background.color)
+    for layer in background.layers:
+        x, y = layer.position(background.engine.camera_position)
+        width, height = layer.surface.get_size()
+        surface = layer.surface
+        if not layer.opacity == 255:
+            surface = surface.copy()
+            surface.set_alpha(layer.opacity)
+        columns = range(x, target.get_width(), width) if layer.repeat_x else (x,)
+        rows = range(y, target.get_height(), height) if layer.repeat_y else (y,)
+        for column in columns:
+            for row in rows:
+                target.blit(surface, (column, row))
+
+
+def time_frames(engine, frames, draw, moving):
+    start = time.perf_counter()
+    for frame in range(frames):
+        if moving:
+            engine.camera_position = (frame*7.3, frame*1.9)
+        draw()
+    return (time.perf_counter() - start) / frames * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--layers", type=int, default=3)
+    parser.add_argument("--frames", type=int, default=300)
+    args = parser.parse_args()
+
+    os.chdir(SRC)
+    import main as game
+    engine = game.Engine()
+    screen = engine.screen
+    background = pgp.background.Background(layers=make_layers(args.layers))
+    background.build(screen)
+
+    columns = ["camera", "draw_ms", "blits", "every_repeat_ms", "fill_ms"]
+    print(" ".join(f"{column:>16}" for column in columns))
+    for moving in (True, False):
+        engine.camera_position = (0, 0)
+        row = {"camera": "moving" if moving else "still"}
+        row["draw_ms"] = time_frames(engine, args.frames, lambda: background.draw(screen), moving)
+        row["blits"] = background.blit_count
+        row["every_repeat_ms"] = time_frames(engine, args.frames, lambda: naive(background, screen), moving)
+        row["fill_ms"] = time_frames(engine, args.frames, lambda: screen.fill(background.color), moving)
+        print(" ".join(f"{row[column]:>16.3f}" if isinstance(row[column], float) else f"{row[column]:>16}"
+                       for column in columns))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Times HitDetector.update() with growing numbers of projectiles and enemies next to testing every projectile
+against every enemy, and prints the time per tick of both. The area they move in grows with their number so the
+crowding stays that of --per-screen of each on a 1600x900 screen, use --fixed-area to cram them all on one screen.
+
+    python benchmarks/hits.py --counts 100,200,400,800 --ticks 60
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+SRC = Path(__file__).resolve().parent.parent / "src"
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+sys.path.insert(0, str(SRC))
+
+import pygplus as pgp
+
+SCREEN = (1600, 900)
+AREA = list(SCREEN)
+
+
+class Mover(pgp.sprite.Sprite):
+    def __init__(self, size, speed, rng):
+        super().__init__()
+        self.size = [size, size]
+        self.pos = [rng.uniform(0, AREA[0]), rng.uniform(0, AREA[1])]
+        self.reset_old_pos()
+        self.movement.update(rng.uniform(-speed, speed), rng.uniform(-speed, speed))
+
+    def update(self):
+        super().update()
+        self.pos[0] = (self.pos[0] + self.movement[0]) % AREA[0]
+        self.pos[1] = (self.pos[1] + self.movement[1]) % AREA[1]
+
+
+class Projectile(Mover):
+    hit_mask = 1
+    swept_hits = True
+
+
+class Target(Mover):
+    hit_layer = 1
+
+
+def naive(projectiles, targets):
+    hits = 0
+    for projectile in projectiles:
+        for target in targets:
+            if pgp.hits.sweep_time(projectile.old_pos, (projectile.pos[0]-projectile.old_pos[0],
+                                   projectile.pos[1]-projectile.old_pos[1]), projectile.size,
+                                   target.pos, target.size) is not None:
+                hits += 1
+    return hits
+
+
+def run(count, ticks, per_screen):
+    screens = max(count/per_screen, 1) if per_screen else 1
+    AREA[0] = SCREEN[0]*screens
+    rng = random.Random(1)
+    projectiles = pgp.sprite.SpriteList(stable_order=False)
+    targets = pgp.sprite.SpriteList(stable_order=False)
+    for _ in range(count):
+        projectiles.append(Projectile(36, 22, rng))
+        targets.append(Target(80, 3, rng))
+    detector = pgp.hits.HitDetector()
+    detector.add_hitters(projectiles)
+    detector.add_hurtables(targets)
+
+    detector_time = naive_time = hits = naive_hits = tests = 0
+    for _ in range(ticks):
+        projectiles.update()
+        targets.update()
+        start = time.perf_counter()
+        detector.update()
+        detector_time += time.perf_counter() - start
+        start = time.perf_counter()
+        naive_hits += naive(projectiles, targets)
+        naive_time += time.perf_counter() - start
+        hits += len(detector.hits)
+        tests += detector.test_count
+
+    if not hits == naive_hits:
+        raise Exception(f"Detector found {hits} hits, testing every pair found {naive_hits}")
+    return {
+        "count": count,
+        "hits": hits // ticks,
+        "tests": tests // ticks,
+        "detector_ms": detector_time / ticks * 1000,
+        "naive_ms": naive_time / ticks * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--counts", default="100,200,400,800")
+    parser.add_argument("--ticks", type=int, default=60)
+    parser.add_argument("--per-screen", type=int, default=100)
+    parser.add_argument("--fixed-area", action="store_true")
+    args = parser.parse_args()
+
+    os.chdir(SRC)
+    import main as game
+    game.Engine()
+
+    columns = ["count", "hits", "tests", "detector_ms", "naive_ms"]
+    print(" ".join(f"{column:>12}" for column in columns))
+    for count in args.counts.split(","):
+        row = run(int(count), args.ticks, 0 if args.fixed_area else args.per_screen)
+        print(" ".join(f"{row[column]:>12.3f}" if isinstance(row[column], float) else f"{row[column]:>12}"
+                       for column in columns))
+
+
+if __name__ == "__main__":
+    main()
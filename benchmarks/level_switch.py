@@ -0,0 +1,79 @@
+"""Plays the game headless while the next level is prefetched, switches to it once it's ready and checks that no
+frame during the prefetch or the switch went over the frame budget. Exits with 1 if one did. Frames after the
+switch are only reported, they measure playing the new level rather than switching to it.
+
+    python benchmarks/level_switch.py --switches 3 --budget-ms 16.7
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+SRC = Path(__file__).resolve().parent.parent / "src"
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+sys.path.insert(0, str(SRC))
+
+import pygplus as pgp
+
+
+def frame(engine, tick):
+    engine.keys["right"] = True
+    engine.keys["up"] = tick % 40 < 8
+    start = time.perf_counter()
+    engine.update()
+    engine.draw()
+    engine.present()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--switches", type=int, default=3)
+    parser.add_argument("--budget-ms", type=float, default=pgp.TARGET_DT*1000)
+    parser.add_argument("--frames-after", type=int, default=30, help="frames to keep measuring after a switch")
+    args = parser.parse_args()
+
+    os.chdir(SRC)
+    import main as game
+    engine = game.Engine()
+    start = time.perf_counter()
+    engine.reset()
+    print(f"Synchronous load of {engine.level_path.name}: {(time.perf_counter()-start)*1000:.1f} ms")
+
+    print(f"{'level':>20} {'frames':>7} {'max_ms':>8} {'switch_ms':>10} {'over':>5} {'after_max_ms':>13}")
+    failed = False
+    tick = 0
+    for _ in range(args.switches):
+        path = engine.next_level_path
+        times = []
+        while not engine.next_level.done:
+            times.append(frame(engine, tick))
+            tick += 1
+
+        start = time.perf_counter()
+        engine.switch_level()
+        switch_time = time.perf_counter() - start
+        # The switch happens between frames, so it counts towards the frame it's in
+        if times:
+            times[-1] += switch_time
+        else:
+            times.append(switch_time)
+
+        after = []
+        for _ in range(args.frames_after):
+            after.append(frame(engine, tick))
+            tick += 1
+
+        over = sum(1 for seconds in times if seconds*1000 > args.budget_ms)
+        failed = failed or over > 0
+        print(f"{path.name:>20} {len(times):>7} {max(times)*1000:>8.2f} {switch_time*1000:>10.2f} {over:>5} "
+              f"{max(after)*1000:>13.2f}")
+
+    print("OK: no frame over budget" if not failed else f"FAILED: frames over {args.budget_ms:.1f} ms")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""Writes synthetic Tiled maps against the game's basic_tileset.json and grass.json tilesets, for scale and stress
+testing. The maps have the same layers as the hand made ones: "Walls", "Objects" and "Offgrid".
+
+    python benchmarks/mapgen.py out.json --width 2000 --height 200 --coins 5000 --enemies 500
+"""
+import argparse
+import json
+import os
+import random
+from pathlib import Path
+
+SRC = Path(__file__).resolve().parent.parent / "src"
+TILESETS = SRC / "assets/tilemap_project/tilesets"
+TILE_SIZE = 16
+
+# gids with basic_tileset.json at firstgid 1 and grass.json at firstgid 9
+BASIC_FIRSTGID = 1
+GRASS_FIRSTGID = 9
+SPRING = BASIC_FIRSTGID + 4
+COIN = BASIC_FIRSTGID + 5
+GREEN_NINJA = BASIC_FIRSTGID + 6
+ROPE = BASIC_FIRSTGID + 7
+GRASS = GRASS_FIRSTGID + 6
+GRASS_SLOPE1 = GRASS_FIRSTGID + 14
+GRASS_SLOPE2 = GRASS_FIRSTGID + 4
+
+
+def tile_layer(layer_id, name, width, height, data):
+    return {"data": data, "height": height, "id": layer_id, "name": name, "opacity": 1, "type": "tilelayer",
+            "visible": True, "width": width, "x": 0, "y": 0}
+
+
+def point_object(object_id, x, y, properties=None):
+    obj = {"height": 0, "id": object_id, "name": "", "point": True, "rotation": 0, "type": "", "visible": True,
+           "width": 0, "x": x, "y": y}
+    if properties:
+        obj["properties"] = properties
+    return obj
+
+
+def generate_map(width=200, height=60, terrain_density=1.0, slope_frequency=0.3, coins=50, springs=5, ropes=5,
+                 enemies=10, seed=None, tileset_folder: Path = None):
+    """Returns a Tiled map as a dict.
+
+    The ground is a random walk of column heights. terrain_density is the chance each cell under the surface is
+    filled, and slope_frequency the chance a one tile step in the ground becomes a slope. Coins, springs and ropes
+    sit above the ground in the "Objects" layer. Enemies are tile objects in "Offgrid" with boundary_left/right
+    points on either side of them. tileset_folder is what tileset sources are made relative to (the folder the map
+    will be written to)."""
+    rng = random.Random(seed)
+    walls = [0] * (width*height)
+    objects = [0] * (width*height)
+
+    # Ground surface row of every column
+    surface = []
+    ground = height * 2 // 3
+    for x in range(width):
+        if x > 2 and rng.random() < 0.35:
+            ground = max(height // 3, min(height - 2, ground + rng.choice((-1, 1))))
+        surface.append(ground)
+
+    for x in range(width):
+        top = surface[x]
+        for y in range(top, height):
+            if y == top or y == top + 1 or rng.random() < terrain_density:
+                walls[y*width + x] = GRASS
+        # A step up to the right becomes a slope1 on the higher column, a step down a slope2 on this one
+        if x > 0 and surface[x] == surface[x-1] - 1 and rng.random() < slope_frequency:
+            walls[top*width + x] = GRASS_SLOPE1
+        elif x < width-1 and surface[x+1] == surface[x] + 1 and rng.random() < slope_frequency:
+            walls[top*width + x] = GRASS_SLOPE2
+
+    def free_spot(gap):
+        for _ in range(100):
+            x = rng.randrange(1, width-1)
+            y = surface[x] - gap
+            if y >= 0 and objects[y*width + x] == 0:
+                return x, y
+        return None
+
+    for gid, count, gap in ((COIN, coins, 2), (SPRING, springs, 1), (ROPE, ropes, 3)):
+        for _ in range(count):
+            spot = free_spot(gap + (rng.randrange(3) if gid == COIN else 0))
+            if spot is not None:
+                objects[spot[1]*width + spot[0]] = gid
+
+    offgrid = []
+    next_id = 1
+    spawn_x = 2
+    offgrid.append(point_object(next_id, spawn_x*TILE_SIZE + TILE_SIZE/2, surface[spawn_x]*TILE_SIZE - TILE_SIZE,
+                                [{"name": "spawn", "type": "string", "value": ""}]))
+    next_id += 1
+    for _ in range(enemies):
+        x = rng.randrange(4, width-4)
+        ground_y = surface[x]*TILE_SIZE
+        left_id, right_id = next_id + 1, next_id + 2
+        offgrid.append({
+            "gid": GREEN_NINJA, "height": 24, "id": next_id, "name": "", "rotation": 0, "type": "", "visible": True,
+            "width": 24, "x": x*TILE_SIZE, "y": ground_y,
+            "properties": [
+                {"name": "boundary_left", "type": "object", "value": left_id},
+                {"name": "boundary_right", "type": "object", "value": right_id},
+                {"name": "tile_type", "type": "string", "value": "green_ninja"}
+            ]
+        })
+        offgrid.append(point_object(left_id, (x-3)*TILE_SIZE, ground_y - 12))
+        offgrid.append(point_object(right_id, (x+4)*TILE_SIZE, ground_y - 12))
+        next_id += 3
+
+    tileset_folder = Path(tileset_folder) if tileset_folder is not None else TILESETS
+    def source(name):
+        try:
+            return Path(os.path.relpath(TILESETS / name, tileset_folder)).as_posix()
+        except ValueError:
+            # Different drive on Windows
+            return (TILESETS / name).as_posix()
+
+    return {
+        "backgroundcolor": "#77c4ec", "compressionlevel": -1, "height": height, "infinite": False,
+        "layers": [
+            {"draworder": "topdown", "id": 4, "name": "Offgrid", "objects": offgrid, "opacity": 1,
+             "type": "objectgroup", "visible": True, "x": 0, "y": 0},
+            tile_layer(2, "Objects", width, height, objects),
+            tile_layer(3, "Walls", width, height, walls),
+        ],
+        "nextlayerid": 5, "nextobjectid": next_id, "orientation": "orthogonal", "renderorder": "right-down",
+        "tiledversion": "1.10.1", "tileheight": TILE_SIZE,
+        "tilesets": [
+            {"firstgid": BASIC_FIRSTGID, "source": source("basic_tileset.json")},
+            {"firstgid": GRASS_FIRSTGID, "source": source("grass.json")}
+        ],
+        "tilewidth": TILE_SIZE, "type": "map", "version": "1.10", "width": width
+    }
+
+
+def write_map(filename: Path, **kwargs):
+    filename = Path(filename)
+    data = generate_map(tileset_folder=filename.resolve().parent, **kwargs)
+    filename.write_text(json.dumps(data))
+    return data
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("filename", type=Path)
+    parser.add_argument("--width", type=int, default=200)
+    parser.add_argument("--height", type=int, default=60)
+    parser.add_argument("--terrain-density", type=float, default=1.0)
+    parser.add_argument("--slope-frequency", type=float, default=0.3)
+    parser.add_argument("--coins", type=int, default=50)
+    parser.add_argument("--springs", type=int, default=5)
+    parser.add_argument("--ropes", type=int, default=5)
+    parser.add_argument("--enemies", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=None)
+    args = vars(parser.parse_args())
+    write_map(args.pop("filename"), **args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Compares the surface memory of the player's frames with a number of recolors, made as indexed surfaces drawn
+through palette.Recolor next to a pallete_swap() copy of every frame and its flip per recolor like blinking used to
+be. Also draws the frames in animation runs like a character does, and times getting the surface to blit with
+the hit rate of the converted cache. Prints bytes, microseconds and the hit rate for each count.
+
+    python benchmarks/palette.py --recolors 1,4,16
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+SRC = Path(__file__).resolve().parent.parent / "src"
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+sys.path.insert(0, str(SRC))
+
+import pygplus as pgp
+
+SHEETS = (("assets/player/player_idle.png", 4), ("assets/player/player_walk.png", 10),
+          ("assets/player/player_fall.png", 3))
+BODY = (21, 12, 69)
+
+
+def random_colors(count, rng):
+    return [tuple(rng.randrange(256) for _ in range(3)) for _ in range(count)]
+
+
+def copied_bytes(count, rng):
+    """Every frame, its flip, and a swapped copy of both per recolor."""
+    surfaces = []
+    for filename, frames in SHEETS:
+        for frame in pgp.load_spritesheet(Path(filename), size=24, count=frames):
+            variants = [frame] + [pgp.pallete_swap(frame, BODY, color) for color in random_colors(count, rng)]
+            surfaces += variants + [pgp.animation.flip_x(variant) for variant in variants]
+    return sum(pgp.memory.surface_bytes(surface) for surface in surfaces)
+
+
+def indexed_bytes(count, rng, draws):
+    """Every indexed frame and its flip, plus what the converted cache holds after drawing animations with random
+    recolors. Returns (bytes, cached bytes, microseconds per resolve(), cache hit rate)."""
+    animations = []
+    for filename, frames in SHEETS:
+        frames = pgp.palette.load_spritesheet(Path(filename), size=24, count=frames)
+        animations += [frames, [pgp.animation.flip_x(frame) for frame in frames]]
+    recolors = [pgp.palette.ORIGINAL] + [pgp.palette.Recolor({BODY: color}) for color in random_colors(count, rng)]
+    pgp.palette.clear_cache()
+    # A character plays one animation facing one way with one recolor at a time, a frame every 6 draws
+    picks = []
+    for _ in range(draws // 60):
+        animation, recolor = rng.choice(animations), rng.choice(recolors)
+        picks += [(animation[index//6 % len(animation)], recolor) for index in range(60)]
+    hits, misses = pgp.palette.hits, pgp.palette.misses
+    start = time.perf_counter()
+    for surface, recolor in picks:
+        pgp.palette.resolve(surface, recolor)
+    elapsed = time.perf_counter() - start
+    hit_rate = (pgp.palette.hits - hits) / ((pgp.palette.hits - hits) + (pgp.palette.misses - misses))
+    cached = pgp.memory.breakdown().get("cache:palette", {"bytes": 0})["bytes"]
+    sources = sum(pgp.memory.surface_bytes(frame) for animation in animations for frame in animation)
+    return sources + cached, cached, elapsed / len(picks) * 1e6, hit_rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--recolors", default="1,4,16")
+    parser.add_argument("--draws", type=int, default=6000)
+    args = parser.parse_args()
+
+    os.chdir(SRC)
+    import main as game
+    game.Engine()
+
+    columns = ["recolors", "indexed_bytes", "cached_bytes", "copied_bytes", "resolve_us", "hit_rate"]
+    print(" ".join(f"{column:>14}" for column in columns))
+    for count in args.recolors.split(","):
+        row = {"recolors": int(count)}
+        (row["indexed_bytes"], row["cached_bytes"], row["resolve_us"],
+         row["hit_rate"]) = indexed_bytes(int(count), random.Random(1), args.draws)
+        row["copied_bytes"] = copied_bytes(int(count), random.Random(1))
+        print(" ".join(f"{row[column]:>14.3f}" if isinstance(row[column], float) else f"{row[column]:>14}"
+                       for column in columns))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Runs the particle system headless inside the game with emitters spread over the screen and prints update and draw
+time per tick for growing numbers of live particles.
+
+    python benchmarks/particles.py --counts 5000,20000,50000 --ticks 240
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+SRC = Path(__file__).resolve().parent.parent / "src"
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+sys.path.insert(0, str(SRC))
+
+import pygplus as pgp
+
+EMITTERS = 32
+
+
+def run(engine, count, ticks, collide):
+    effect = pgp.particles.ParticleEffect(
+        colors=((255, 230, 90), (255, 120, 40, 0)), sizes=(8, 4), lifetime=(50, 70), speed=(1, 8), gravity=0.3,
+        collide=collide
+    )
+    # Live particles settle at rate * mean lifetime
+    rate = count / 60
+    particles = pgp.particles.ParticleSystem(max_particles=int(count*1.2), spawn_budget=int(rate*2) + EMITTERS,
+                                             draw_budget=int(count*1.2), seed=1)
+    particles.set_collision_walls(engine.scene["Walls"])
+    engine.particles = particles
+    cam_x, cam_y = engine.camera_position
+    for index in range(EMITTERS):
+        pos = (cam_x + engine.screen_width*(index + 0.5)/EMITTERS, cam_y + engine.screen_height/3)
+        particles.add_emitter(effect, pos, rate/EMITTERS)
+
+    # Warm up to the steady state before measuring
+    for _ in range(90):
+        particles.update()
+
+    update_time = draw_time = live = 0
+    for _ in range(ticks):
+        start = time.perf_counter()
+        particles.update()
+        update_time += time.perf_counter() - start
+        start = time.perf_counter()
+        engine.screen.fill((119, 196, 236))
+        particles.draw()
+        engine.render_queue.flush()
+        draw_time += time.perf_counter() - start
+        live += particles.count
+
+    return {
+        "target": count,
+        "live": live // ticks,
+        "update_ms": update_time / ticks * 1000,
+        "draw_ms": draw_time / ticks * 1000,
+        "total_ms": (update_time + draw_time) / ticks * 1000,
+        "dropped": particles.dropped_count,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--counts", default="1000,5000,10000,20000,40000")
+    parser.add_argument("--ticks", type=int, default=240)
+    parser.add_argument("--no-collide", action="store_true", help="don't collide particles with the walls")
+    args = parser.parse_args()
+
+    os.chdir(SRC)
+    import main as game
+    engine = game.Engine()
+    engine.reset()
+    engine.accumulator = pgp.TARGET_DT/2
+
+    columns = ["target", "live", "update_ms", "draw_ms", "total_ms", "dropped"]
+    print(" ".join(f"{column:>10}" for column in columns))
+    for count in args.counts.split(","):
+        row = run(engine, int(count), args.ticks, not args.no_collide)
+        print(" ".join(f"{row[column]:>10.3f}" if isinstance(row[column], float) else f"{row[column]:>10}"
+                       for column in columns))
+    print(f"Frame budget at {pgp.TARGET_FPS} Hz: {pgp.TARGET_DT*1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
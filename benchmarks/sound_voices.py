@@ -0,0 +1,91 @@
+"""Plays the game's sounds through a SoundBank on SDL's dummy audio driver and checks the voice limits: a sound's
+own cap with and without stealing, the global cap with priorities, voices freeing up once they finish, and that
+banks sharing a sound keep their own volume. Prints each check and exits with 1 if one failed.
+
+    python benchmarks/sound_voices.py
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+SRC = Path(__file__).resolve().parent.parent / "src"
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+sys.path.insert(0, str(SRC))
+
+import pygplus as pgp
+
+SOUND = Path("assets/sounds/spring.wav")  # The longest one, so voices are still busy during a check
+
+
+def play(bank, name, count, priority=None):
+    return [bank.play(name, priority) for _ in range(count)]
+
+
+def check_own_cap(bank):
+    bank.load("capped", SOUND, max_voices=2, steal=False)
+    channels = play(bank, "capped", 5)
+    played = sum(channel is not None for channel in channels)
+    return played == 2 and bank.dropped == 3, f"{played} played, {bank.dropped} dropped"
+
+def check_own_cap_steals(bank):
+    bank.load("stealing", SOUND, max_voices=2, steal=True)
+    channels = play(bank, "stealing", 5)
+    voices = len(bank.active_voices("stealing"))
+    # The third play restarts the first channel, the fourth the second and so on
+    return channels[2] == channels[0] and voices == 2 and bank.stolen == 3, f"{voices} voices, {bank.stolen} stolen"
+
+def check_global_cap(bank):
+    bank.load("ambient", SOUND, max_voices=8, priority=0)
+    bank.load("important", SOUND, max_voices=8, priority=2)
+    first = play(bank, "ambient", len(bank.voices))
+    stolen = bank.play("important")
+    dropped = bank.play("ambient", priority=-1)  # Everything playing is more important than this
+    return (stolen == first[0] and dropped is None and bank.stolen == 1 and bank.dropped == 1,
+            f"{bank.stolen} stolen, {bank.dropped} dropped")
+
+def check_voices_free_up(bank):
+    bank.load("capped", SOUND, max_voices=1, steal=False)
+    bank.play("capped")
+    time.sleep(pgp.audio.load_sound(SOUND).get_length() + 0.2)
+    channel = bank.play("capped")
+    return channel is not None and bank.dropped == 0, f"{bank.dropped} dropped after the first voice finished"
+
+def check_volume(bank):
+    other = pgp.audio.SoundBank(channels=len(bank.voices))
+    bank.load("quiet", SOUND, volume=0.25)
+    other.load("loud", SOUND, volume=1.0)
+    # Both banks play on the mixer's channels, so one at a time
+    volumes = []
+    for played_bank, name in ((bank, "quiet"), (other, "loud")):
+        volumes.append(round(played_bank.play(name).get_volume(), 2))
+        played_bank.stop_all()
+    volumes = tuple(volumes)
+    sound_volume = round(pgp.audio.load_sound(SOUND).get_volume(), 2)
+    return volumes == (0.25, 1.0) and sound_volume == 1.0, f"channels at {volumes}, shared sound at {sound_volume}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--channels", type=int, default=4)
+    args = parser.parse_args()
+
+    os.chdir(SRC)
+    pgp.audio.use_headless_audio()
+    failed = False
+    for check in (check_own_cap, check_own_cap_steals, check_global_cap, check_voices_free_up, check_volume):
+        bank = pgp.audio.SoundBank(channels=args.channels)
+        if not bank.enabled:
+            print("The mixer couldn't be initialized")
+            sys.exit(1)
+        passed, details = check(bank)
+        bank.stop_all()
+        print(f"{'ok' if passed else 'FAILED':>6}  {check.__name__}: {details}")
+        failed |= not passed
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
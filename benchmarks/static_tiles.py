@@ -0,0 +1,71 @@
+"""Pads the level's Walls with a solid block of extra tiles and times a game tick with static tiles skipped, next to
+ticking every tile like before. Prints the time per tick of both for each wall count.
+
+    python benchmarks/static_tiles.py --walls 10000,50000,100000 --ticks 120
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+SRC = Path(__file__).resolve().parent.parent / "src"
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+sys.path.insert(0, str(SRC))
+
+import pygplus as pgp
+
+
+def pad_walls(engine, count):
+    """Fills a block of count cells below the level with plain tiles."""
+    from sprites import Tile
+    walls = engine.scene["Walls"]
+    surface = next(iter(walls)).surface
+    columns = 500
+    top = max(y for _, y in walls.hash_tilemap) + 20
+    for index in range(count):
+        grid_pos = (index % columns, top + index//columns)
+        tile = Tile(surface, [grid_pos[0]*walls.tile_size, grid_pos[1]*walls.tile_size])
+        walls.append(tile)
+        walls.hash_tilemap[grid_pos] = tile
+
+
+def time_ticks(engine, ticks):
+    start = time.perf_counter()
+    for tick in range(ticks):
+        engine.keys["right"] = tick % 120 < 60
+        engine.keys["left"] = not engine.keys["right"]
+        engine.update()
+    return (time.perf_counter() - start) / ticks * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--walls", default="10000,50000,100000")
+    parser.add_argument("--ticks", type=int, default=120)
+    args = parser.parse_args()
+
+    os.chdir(SRC)
+    import main as game
+    engine = game.Engine()
+
+    columns = ["walls", "active", "tick_ms", "all_ticked_ms"]
+    print(" ".join(f"{column:>14}" for column in columns))
+    for count in args.walls.split(","):
+        engine.reset()
+        engine.next_level.cancel()
+        pad_walls(engine, int(count))
+        walls = engine.scene["Walls"]
+        row = {"walls": len(walls), "active": len(walls.active_sprites)}
+        row["tick_ms"] = time_ticks(engine, args.ticks)
+        # What every tick cost before static tiles were left out
+        for tile in walls:
+            tile.activate()
+        row["all_ticked_ms"] = time_ticks(engine, args.ticks)
+        print(" ".join(f"{row[column]:>14.3f}" if isinstance(row[column], float) else f"{row[column]:>14}"
+                       for column in columns))
+
+
+if __name__ == "__main__":
+    main()
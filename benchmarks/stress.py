@@ -0,0 +1,102 @@
+"""Runs the game headless on generated maps of growing size and prints how load time, memory and tick/draw time
+scale with map size.
+
+    python benchmarks/stress.py --sizes 100x60,1000x200,10000x200 --ticks 120 --csv curves.csv
+"""
+import argparse
+import csv
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+SRC = Path(__file__).resolve().parent.parent / "src"
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+sys.path.insert(0, str(SRC))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import pygplus as pgp
+from mapgen import write_map
+
+
+def current_rss():
+    """Resident memory in bytes, or None where /proc isn't available."""
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def run(engine, filename, ticks):
+    engine.level_path = filename
+    start = time.perf_counter()
+    engine.reset()
+    load_time = time.perf_counter() - start
+    # Keep the next level's prefetch and the particle setup out of the timed ticks
+    engine.next_level.cancel()
+    engine.particles.ready()
+
+    tick_time = draw_time = 0
+    for tick in range(ticks):
+        engine.keys["right"] = True
+        engine.keys["up"] = tick % 40 < 8
+        start = time.perf_counter()
+        engine.update()
+        tick_time += time.perf_counter() - start
+        start = time.perf_counter()
+        engine.draw()
+        draw_time += time.perf_counter() - start
+
+    return {
+        "cells": None,
+        "sprites": sum(len(spritelist) for spritelist in engine.scene.values()),
+        "load_s": load_time,
+        "surface_mb": pgp.memory.total_bytes() / 1024**2,
+        "rss_mb": (current_rss() or 0) / 1024**2,
+        "tick_ms": tick_time / ticks * 1000,
+        "draw_ms": draw_time / ticks * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="100x60,300x100,1000x100,3000x200")
+    parser.add_argument("--ticks", type=int, default=120)
+    parser.add_argument("--density", type=float, default=0.8, help="terrain density")
+    parser.add_argument("--objects-per-1000-cells", type=float, default=3)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--csv", type=Path, default=None)
+    args = parser.parse_args()
+
+    os.chdir(SRC)
+    import main as game
+    engine = game.Engine()
+
+    columns = ["cells", "sprites", "load_s", "surface_mb", "rss_mb", "tick_ms", "draw_ms"]
+    print(" ".join(f"{column:>10}" for column in columns))
+    rows = []
+    with tempfile.TemporaryDirectory() as folder:
+        for size in args.sizes.split(","):
+            width, height = (int(n) for n in size.split("x"))
+            objects = int(width*height * args.objects_per_1000_cells / 1000)
+            filename = Path(folder) / f"stress_{width}x{height}.json"
+            write_map(filename, width=width, height=height, terrain_density=args.density, coins=objects,
+                      springs=objects//10, ropes=objects//10, enemies=objects//5, seed=args.seed)
+            row = run(engine, filename, args.ticks)
+            row["cells"] = width*height
+            rows.append(row)
+            print(" ".join(f"{row[column]:>10.3f}" if isinstance(row[column], float) else f"{row[column]:>10}"
+                           for column in columns))
+
+    if args.csv is not None:
+        with open(args.csv, "w", newline="") as file:
+            writer = csv.DictWriter(file, fieldnames=columns)
+            writer.writeheader()
+            writer.writerows(rows)
+
+
+if __name__ == "__main__":
+    main()
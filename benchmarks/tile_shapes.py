@@ -0,0 +1,91 @@
+"""Times point and floor queries against slope tiles through their precomputed geometry, next to the triangle tests
+and rect math they used before. Prints the time per million queries of both for every shape.
+
+    python benchmarks/tile_shapes.py --queries 200000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+SRC = Path(__file__).resolve().parent.parent / "src"
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+sys.path.insert(0, str(SRC))
+
+import pygplus as pgp
+
+
+def old_point_in_tile(tile, point):
+    if tile.rect().collidepoint(*point):
+        rel_to_tile = point[0] - tile.left, point[1] - tile.top
+        if tile.shape_type == "slope1":
+            return rel_to_tile[1] > tile.size[0]-rel_to_tile[0]
+        elif tile.shape_type == "slope2":
+            return rel_to_tile[1] >= rel_to_tile[0]
+        return True
+    return False
+
+
+def old_floor_under(tile, left, right):
+    if tile.shape_type == "slope1":
+        pos_height = right - tile.left
+    else:
+        pos_height = tile.right - left
+    pos_height = min(pos_height, tile.rect().height)
+    return max(pos_height, 0)
+
+
+def new_floor_under(tile, left, right):
+    return tile.geometry.floor_under(left - tile.left, right - tile.left)
+
+
+def time_queries(function, tile, args, repeats=5):
+    """Best of repeats, in microseconds per query (so milliseconds per million)."""
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for arg in args:
+            function(tile, *arg)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best / len(args) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--queries", type=int, default=100000)
+    args = parser.parse_args()
+
+    os.chdir(SRC)
+    import main as game
+    from sprites import Tile
+    game.Engine()
+    rng = random.Random(1)
+
+    columns = ["shape", "point_ms", "old_point_ms", "floor_ms", "old_floor_ms"]
+    print(" ".join(f"{column:>14}" for column in columns))
+    for shape_type in ("slope1", "slope2"):
+        tile = Tile(None, [640, 1280])
+        tile.set_shape(shape_type)
+        points = [((rng.uniform(630, 710), rng.uniform(1270, 1350)),) for _ in range(args.queries)]
+        spans = [(left, left+48) for left in (rng.uniform(600, 700) for _ in range(args.queries))]
+        # The tables work in whole pixels where the old math was exact, so they can be a pixel apart
+        for left, right in spans[:1000]:
+            if abs(new_floor_under(tile, left, right) - old_floor_under(tile, left, right)) > 1:
+                raise Exception(f"{shape_type} floor differs at {left}, {right}")
+        row = {
+            "shape": shape_type,
+            "point_ms": time_queries(Tile.point_in_tile, tile, points),
+            "old_point_ms": time_queries(old_point_in_tile, tile, points),
+            "floor_ms": time_queries(new_floor_under, tile, spans),
+            "old_floor_ms": time_queries(old_floor_under, tile, spans),
+        }
+        print(" ".join(f"{row[column]:>14.1f}" if isinstance(row[column], float) else f"{row[column]:>14}"
+                       for column in columns))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Times Tilemap loading on maps made by repeating basic_tilemap3 side by side. Load time per cell should stay
+flat as the map grows, which means the loader is linear in tiles and objects.
+
+    python benchmarks/tilemap_load.py --max-copies 64
+"""
+import argparse
+import os
+import sys
+import json
+import tempfile
+import time
+from pathlib import Path
+
+SRC = Path(__file__).resolve().parent.parent / "src"
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+sys.path.insert(0, str(SRC))
+os.chdir(SRC)
+
+import pygame as pg
+import pygplus as pgp
+
+MAP = SRC / "assets/tilemap_project/tilemaps/basic_tilemap3.json"
+
+
+def repeat_map(copies, folder):
+    data = json.loads(MAP.read_text())
+    width = data["width"]
+    for tileset in data["tilesets"]:
+        tileset["source"] = str((MAP.parent / tileset["source"]).resolve())
+    for layer in data["layers"]:
+        if layer["type"] == "tilelayer":
+            rows = [layer["data"][y*width:(y+1)*width] for y in range(layer["height"])]
+            layer["data"] = [num for row in rows for num in row*copies]
+            layer["width"] = width*copies
+        elif layer["type"] == "objectgroup":
+            objects = []
+            id_step = data["nextobjectid"]
+            for copy in range(copies):
+                for obj in layer["objects"]:
+                    obj = json.loads(json.dumps(obj))
+                    obj["id"] += copy*id_step
+                    obj["x"] += copy*width*data["tilewidth"]
+                    for prop in obj.get("properties", []):
+                        if prop["type"] == "object":
+                            prop["value"] += copy*id_step
+                    objects.append(obj)
+            layer["objects"] = objects
+    data["width"] = width*copies
+    data["nextobjectid"] = id_step*copies
+    filename = Path(folder) / f"repeated_{copies}.json"
+    filename.write_text(json.dumps(data))
+    return filename, data["width"]*data["height"], sum(len(l.get("objects", [])) for l in data["layers"])
+
+
+def main():
+    from tilemap import Tilemap
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--max-copies", type=int, default=64)
+    args = parser.parse_args()
+
+    pg.display.init()
+    screen = pg.display.set_mode((1, 1))
+    engine = type("BenchEngine", (), {"screen": screen})
+    pgp.init_nodes(engine=engine)
+
+    print(f"{'copies':>7} {'cells':>9} {'objects':>8} {'load (s)':>9} {'us/cell':>8}")
+    with tempfile.TemporaryDirectory() as folder:
+        copies = 1
+        while copies <= args.max_copies:
+            filename, cells, objects = repeat_map(copies, folder)
+            start = time.perf_counter()
+            Tilemap(filename)
+            elapsed = time.perf_counter() - start
+            print(f"{copies:>7} {cells:>9} {objects:>8} {elapsed:>9.3f} {elapsed/cells*1e6:>8.2f}")
+            copies *= 2
+
+
+if __name__ == "__main__":
+    main()
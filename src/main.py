@@ -1,13 +1,19 @@
 import pygame as pg
 import pygplus as pgp
 
-from sprites import Player
-from tilemap import Tilemap
+from sprites import Player, CoinTile, Enemy
+from tilemap import Tilemap, parse_tilemap
 
 import asyncio
 from pathlib import Path
+import time
 
 import os; os.chdir(os.path.dirname(__file__))
+pgp.startup_timeline.mark("game modules imported")
+
+MINIMAP_COIN_COLOR = (255, 210, 60)
+MINIMAP_ENEMY_COLOR = (235, 70, 60)
+MINIMAP_PLAYER_COLOR = (255, 255, 255)
 
 
 class Engine(pgp.engine.Engine):
@@ -16,8 +22,56 @@ class Engine(pgp.engine.Engine):
                          height=900, 
                          title="Ninja Game", 
                          icon_path=Path("assets/icon.png"))
+        # basic_tilemap1 predates the Offgrid layer and has no spawn point, so it isn't in the rotation
+        self.levels = [Path(f"assets/tilemap_project/tilemaps/basic_tilemap{number}.json") for number in (2, 3)]
+        self.level_path = self.levels[1]
+        self.next_level = None  # Prefetch of the level after this one
+        self.next_level_path = None
+        self.particles = pgp.particles.ParticleSystem()
+        self.last_memory_dump = None
+        self.memory_growth = None
+        self.file_watcher = None
+        if pgp.HOT_RELOAD_SETTINGS["enable"]:
+            self.toggle_hot_reload()
+        self.hot_reload_count = 0
+        self.hot_reload_errors = {}  # Resolved path -> the exception it failed to load with, until it loads
+
+    def build_level(self, parsed):
+        """Turns parse_tilemap()'s result into a (tilemap, scene) pair in small steps, see pgp.prefetch.Prefetch."""
+        tilemap = Tilemap()
+        for progress in tilemap.build(parsed):
+            yield progress*0.8
+        scene = {}
+        l = tilemap.layers
+        scene["Projectiles"] = pgp.sprite.SpriteList(stable_order=False)
+        scene["Objects"] = l["Objects"]
+        scene["Walls"] = l["Walls"]
+        scene["Offgrid"] = l["Offgrid"]
+                   
+        for z, spritelist in enumerate(scene.values()):
+            spritelist.z = z
+
+        scene["Objects"].use_activity_scheduler()
+        scene["Offgrid"].use_activity_scheduler()
+        yield 0.82
+        for _ in scene["Walls"].load_hash_tilemap_steps():
+            yield 0.85
+        for _ in scene["Walls"].set_dynamic_surfaces_steps():
+            yield 0.9
+        for _ in scene["Walls"].load_navigation_steps():
+            yield 0.95
+        minimap = pgp.minimap.Minimap(scene["Walls"])
+        for sprite in scene["Objects"]:
+            if isinstance(sprite, CoinTile):
+                minimap.add_item(sprite, MINIMAP_COIN_COLOR)
+        for _ in minimap.build_steps():
+            yield 0.97
+        tilemap.background.build(self.screen)
+        return tilemap, scene
 
-    def reset(self):
+    def reset(self, level=None):
+        """Starts the level at level_path over. level is a (tilemap, scene) pair already built by build_level(),
+        which makes starting it a swap. Otherwise the level is loaded right here."""
         self.accumulator = 0
         self.keys = {
             "right": False,
@@ -28,21 +82,130 @@ class Engine(pgp.engine.Engine):
             "g": False
         }
 
-        tilemap = Tilemap(Path("assets/tilemap_project/tilemaps/basic_tilemap3.json"))
-        self.scene = {}
-        l = tilemap.layers
-        self.scene["Projectiles"] = pgp.sprite.SpriteList()
-        self.scene["Objects"] = l["Objects"]
-        self.scene["Walls"] = l["Walls"]
-        self.scene["Offgrid"] = l["Offgrid"]
-                   
-        self.scene["Walls"].load_hash_tilemap()
-        self.scene["Walls"].set_dynamic_surfaces()
+        prefetched = level is not None
+        if not prefetched:
+            level = pgp.prefetch.exhaust(self.build_level(parse_tilemap(self.level_path)))
+        self.tilemap, self.scene = level
+        self.kill_y = self.tilemap.height + 960  # How far below the map the player can fall before restarting
 
-        self.player = Player(*tilemap.spawn_point)
+        self.player = Player(*self.tilemap.spawn_point)
+        self.player.z = len(self.scene)
+        self.particles.clear()
+        self.particles.z = len(self.scene) + 1
+        self.scene["Walls"].minimap.z = len(self.scene) + 2
+        self.particles.set_collision_walls(self.scene["Walls"])
+        self.hit_detector = pgp.hits.HitDetector()
+        self.hit_detector.add_hitters(self.scene["Projectiles"])
+        # Enemies are the only hurtables and they're all in Offgrid. The detector walks every sprite of a list it's
+        # given, so lists like Objects that hold none aren't added
+        self.hit_detector.add_hurtables(self.scene["Offgrid"])
         self.camera_position = [0,0]
         self.old_camera_position = [0,0]
         self.position_camera(speed=1)  # Actual camera positions are set here
+        self.prefetch_next_level()
+
+        if not prefetched:
+            # Compare surface memory with the last reset, so anything that survives a restart shows up as growth.
+            # Skipped when switching to a prefetched level, since the full collection would stall the switch
+            memory_dump = pgp.memory.dump(collect=True)
+            if self.last_memory_dump is not None:
+                self.memory_growth = pgp.memory.diff(self.last_memory_dump, memory_dump)
+            self.last_memory_dump = memory_dump
+            self.memory_breakdown = memory_dump["owners"]
+            self.total_surface_bytes = memory_dump["total_bytes"]
+        self.ticks = 0
+        pgp.startup_timeline.mark("level built")
+
+    def prefetch_next_level(self):
+        """Starts preparing the level after the current one in the background, unless that's already happening."""
+        index = self.levels.index(self.level_path) + 1 if self.level_path in self.levels else 0
+        path = self.levels[index % len(self.levels)]
+        if self.next_level is not None and not self.next_level.cancelled and self.next_level_path == path:
+            return
+        if self.next_level is not None:
+            self.next_level.cancel()
+        self.next_level_path = path
+        self.next_level = pgp.prefetch.Prefetch(load=lambda: parse_tilemap(path), build=self.build_level)
+
+    def switch_level(self):
+        """Moves on to the prefetched next level. If it isn't ready yet the rest of it is built right away. Does
+        nothing if the prefetch failed on a map being edited, see hot_reload()."""
+        if self.next_level is None:
+            return
+        level = self.next_level.finish()
+        self.level_path = self.next_level_path
+        self.next_level = None
+        self.reset(level)
+
+    def toggle_hot_reload(self):
+        if self.file_watcher is None:
+            self.file_watcher = pgp.hotreload.FileWatcher(pgp.HOT_RELOAD_SETTINGS["roots"])
+        else:
+            self.file_watcher = None
+
+    def hot_reload(self):
+        """Swaps changed images into the surfaces already in use and patches the changed cells of the current map,
+        keeping the player and everything else as it is. A file that fails to load, like one an editor is halfway
+        through writing, is shown in the debug overlay and tried again on the next poll, and the game carries on
+        as it was."""
+        changed = self.file_watcher.poll()
+        if not changed:
+            return
+        errors = {}
+        minimap = self.scene["Walls"].minimap
+        images = [path for path in changed if path.suffix == ".png"]
+        reloaded = pgp.hotreload.reload_assets(images, errors)
+        if reloaded:
+            minimap.update_colors(pgp.hotreload.loaded_surfaces(reloaded))
+            # Shapes taken from tile images may have changed
+            for tile in self.scene["Walls"].hash_tilemap.values():
+                if tile.geometry is not None and tile.geometry.from_surface:
+                    tile.update_geometry()
+            self.particles.set_collision_walls(self.scene["Walls"])
+
+        map_paths = [path for path in changed if path.suffix == ".json"]
+        maps = [path.resolve() for path in map_paths]
+        # A changed tileset can change what the gids of any map stand for
+        tilesets_changed = any(path.parent.name == "tilesets" for path in maps)
+        if self.level_path.resolve() in maps or tilesets_changed:
+            walls = self.scene["Walls"]
+            old_walls = dict(walls.hash_tilemap)
+            try:
+                parsed = parse_tilemap(self.level_path)
+                changes = self.tilemap.patch(parsed, rebuild_all=tilesets_changed)
+            except Exception as error:
+                # Which of the changed maps and tilesets is broken isn't known, so they're all tried again
+                errors.update((path, error) for path in map_paths)
+            else:
+                for old, new in changes:
+                    if isinstance(old, CoinTile):
+                        minimap.remove_item(old)
+                    if isinstance(new, CoinTile):
+                        minimap.add_item(new, MINIMAP_COIN_COLOR)
+                if minimap.grown:
+                    minimap.build()
+                if walls.hash_tilemap != old_walls:
+                    # The particle grid is a snapshot of the walls, unlike the autotiler, navigation and minimap
+                    self.particles.set_collision_walls(walls)
+                self.kill_y = self.tilemap.height + 960
+        if self.next_level is None or self.next_level_path.resolve() in maps or tilesets_changed or images:
+            # Start the prefetch over so the next level doesn't come in stale, or again if it failed
+            if self.next_level is not None:
+                self.next_level.cancel()
+            self.prefetch_next_level()
+
+        for path in changed:
+            self.hot_reload_errors.pop(path.resolve(), None)
+        for path, error in errors.items():
+            self.hot_reload_errors[path.resolve()] = error
+            self.file_watcher.retry(path)
+        self.hot_reload_count += 1
+
+    def handle_hits(self):
+        for hit in self.hit_detector.hits:
+            # A shuriken only takes out the first enemy in its way, and an enemy only goes down once
+            if hit.hitter.hit_mask and hit.hurtable.hit_layer:
+                hit.hitter.strike(hit.hurtable)
 
     def handle_events(self):
         for event in pg.event.get():
@@ -58,6 +221,10 @@ class Engine(pgp.engine.Engine):
                     case pg.K_f: self.enable_debug_text = not self.enable_debug_text
                     case pg.K_g: self.keys["g"] = not self.keys["g"]
                     case pg.K_r: self.reset()
+                    case pg.K_n: self.switch_level()
+                    case pg.K_h: self.toggle_hot_reload()
+                    case pg.K_p: self.profile_capture.start(frames=120)
+                    case pg.K_m: pgp.memory.dump(Path(f"surface_memory_{time.strftime('%Y%m%d_%H%M%S')}.json"))
             elif event.type == pg.KEYUP:
                 match event.key:
                     case pg.K_w | pg.K_UP | pg.K_SPACE: self.keys["up"] = False
@@ -83,11 +250,21 @@ class Engine(pgp.engine.Engine):
             pgp.lerp(self.old_camera_position[1], self.camera_position[1], alpha)
         ]
 
-        self.screen.fill((119, 196, 236))
-
-        for spritelist in self.scene.values():
-            spritelist.draw()
-        self.player.draw()
+        capture = self.profile_capture
+        with capture.section("draw Background"):
+            self.draw_background()
+        for name, spritelist in self.scene.items():
+            with capture.section(f"draw {name}"):
+                spritelist.draw()
+        with capture.section("draw Player"):
+            self.player.draw()
+        with capture.section("draw Particles"):
+            self.particles.draw()
+        if pgp.MINIMAP_SETTINGS["enable"]:
+            with capture.section("draw Minimap"):
+                self.draw_minimap()
+        with capture.section("submit draw queue"):
+            self.render_queue.flush()
 
         # grid_pos = self.player.pos[0]//64*64, self.player.pos[1]//64*64
         # grid_pos = relative_to_camera(grid_pos, self.camera_position)
@@ -96,27 +273,105 @@ class Engine(pgp.engine.Engine):
 
         self.camera_position = old
 
-        if self.enable_debug_text:
-            self.reset_debug_text()
-            self.debug_text("FPS", self.fps)
-            self.debug_text("Updates per frame", self.updates_per_frame)
-            # self.debug_text("Change x", self.player.change_x)
-            # self.debug_text("Change y", self.player.change_y)
-            self.debug_text("Y position", self.player.pos[1])
-            self.debug_text("X position", self.player.pos[0])
-            self.debug_text("Can jump", self.player.can_jump)
-            self.debug_text("Collisions", self.player.collisions)
-            self.debug_text("On Slope", self.player.on_slope)
-            self.debug_text("Jump Count", self.player.jump_count)
+    def draw_minimap(self):
+        minimap = self.scene["Walls"].minimap
+        center = (self.player.centerx, self.player.centery)
+        # Enemies all have an update policy, so the scheduler's spatial index has the ones inside the view
+        nearby = self.scene["Offgrid"].scheduler.index.query(minimap.view_rect(center))
+        markers = [((enemy.centerx, enemy.centery), MINIMAP_ENEMY_COLOR) for enemy in nearby
+                   if isinstance(enemy, Enemy)]
+        markers.append((center, MINIMAP_PLAYER_COLOR))
+        minimap.draw(center, markers)
+
+    def draw_background(self):
+        self.tilemap.background.draw(self.screen)
+
+    def draw_debug_text(self):
+        self.debug_text("FPS", self.fps)
+        if pgp.PACING_SETTINGS["enable"]:
+            self.debug_text("Frame time (ms)", self.pacer.mean_frame_time*1000)
+            self.debug_text("Frame jitter (ms)", self.pacer.jitter*1000)
+        if self.profile_capture.active:
+            self.debug_text("Profiling, frames left", self.profile_capture.frames_left)
+        if pgp.startup_timeline.finished:
+            self.debug_text("Time to first frame (ms)", pgp.startup_timeline.elapsed*1000)
+        self.debug_text("Updates per frame", self.updates_per_frame)
+        # self.debug_text("Change x", self.player.change_x)
+        # self.debug_text("Change y", self.player.change_y)
+        self.debug_text("Y position", self.player.pos[1])
+        self.debug_text("X position", self.player.pos[0])
+        self.debug_text("Can jump", self.player.can_jump)
+        self.debug_text("Collisions", self.player.collisions)
+        self.debug_text("On Slope", self.player.on_slope)
+        self.debug_text("Jump Count", self.player.jump_count)
+        if self.file_watcher is not None:
+            self.debug_text("Hot reload files watched/reloads",
+                            f"{len(self.file_watcher.mtimes)}/{self.hot_reload_count}")
+            for path, error in self.hot_reload_errors.items():
+                self.debug_text(f"Hot reload failed: {path.name}", str(error).splitlines()[0] if str(error) else
+                                type(error).__name__)
+        if self.next_level is not None:
+            self.debug_text("Next level prefetched (%)", "loading" if self.next_level.loading else
+                            round(self.next_level.progress*100))
+        if self.memory_growth is not None:
+            self.debug_text("Surface growth since last reset (KB)", self.memory_growth["total_bytes"]/1024)
+        for owner, entry in list(self.memory_breakdown.items())[:3]:
+            self.debug_text(owner, f"{entry['count']} surfaces, {entry['bytes']/1024:.0f} KB")
+        self.debug_text("Surface memory (MB)", self.total_surface_bytes/1024**2)
+        self.debug_text("Background blits", self.tilemap.background.blit_count)
+        self.debug_text("Draw commands", self.render_queue.command_count)
+        navigation = self.scene["Walls"].navigation
+        self.debug_text("Path cache hits/misses", f"{navigation.hits}/{navigation.misses}")
+        self.debug_text("Palette cache hits/misses", f"{pgp.palette.hits}/{pgp.palette.misses}")
+        self.debug_text("Path searches queued/expansions",
+                        f"{len(navigation.searches)}/{navigation.expansions_last_tick}")
+        self.debug_text("Hit tests/hits", f"{self.hit_detector.test_count}/{len(self.hit_detector.hits)}")
+        self.debug_text("Particles live/drawn/dropped",
+                        f"{self.particles.count}/{self.particles.drawn_count}/{self.particles.dropped_count}")
+        for name, spritelist in self.scene.items():
+            if spritelist.scheduler is not None:
+                scheduler = spritelist.scheduler
+                self.debug_text(f"{name} updated/throttled/sleeping",
+                                f"{scheduler.updated_count}/{scheduler.throttled_count}/{scheduler.sleeping_count}")
+            self.debug_text(f"{name} drawn/culled", f"{spritelist.drawn_count}/{spritelist.culled_count}")
 
     def update(self):
         self.handle_events()
 
-        if self.player.pos[1] > 3200:
+        self.ticks += 1
+        pgp.animation.clock.tick()
+        if self.ticks % pgp.TARGET_FPS == 0:
+            self.memory_breakdown = pgp.memory.breakdown()
+            self.total_surface_bytes = sum(entry["bytes"] for entry in self.memory_breakdown.values())
+
+        if self.player.pos[1] > self.kill_y:
             self.reset()
-        for spritelist in self.scene.values():
-            spritelist.update()
-        self.player.update()
+        capture = self.profile_capture
+        if self.file_watcher is not None:
+            with capture.section("hot reload"):
+                self.hot_reload()
+        if self.next_level is not None:
+            with capture.section("prefetch next level"):
+                try:
+                    self.next_level.step()
+                except Exception as error:
+                    if self.file_watcher is None:
+                        raise
+                    # The next level's map is being edited, hot_reload() starts the prefetch over once it changes
+                    self.hot_reload_errors[self.next_level_path.resolve()] = error
+                    self.next_level = None
+        for name, spritelist in self.scene.items():
+            with capture.section(f"update {name}"):
+                spritelist.update()
+        with capture.section("update Player"):
+            self.player.update()
+        with capture.section("update Hits"):
+            self.hit_detector.update()
+            self.handle_hits()
+        with capture.section("update Pathfinding"):
+            self.scene["Walls"].navigation.update()
+        with capture.section("update Particles"):
+            self.particles.update()
 
         self.position_camera()
 
@@ -1,6 +1,20 @@
+from .timeline import startup as startup_timeline
 from .utils import *
 from .constants import *
-from . import animation
-from . import sprite
-from . import engine
-from .sprite import init_nodes
\ No newline at end of file
+
+import importlib
+
+# Submodules are imported the first time they're used (pgp.sprite, pgp.engine, ...), so importing pygplus stays cheap
+_LAZY_SUBMODULES = (
+    "animation", "palette", "audio", "memory", "spatial", "activity", "autotile", "render", "profiling", "sprite",
+    "particles", "shapes", "navigation", "hits", "minimap", "background", "prefetch", "hotreload", "engine"
+)
+
+def __getattr__(name):
+    if name in _LAZY_SUBMODULES:
+        return importlib.import_module(f".{name}", __name__)
+    if name == "init_nodes":
+        return importlib.import_module(".sprite", __name__).init_nodes
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+startup_timeline.mark("pygplus imported")
\ No newline at end of file
@@ -0,0 +1,101 @@
+import pygame as pg
+
+from .spatial import SpatialHash
+
+
+class UpdatePolicy:
+    """How a sprite class wants to be updated depending on its distance (in world units) from the camera view.
+
+    Within active_radius it is updated every tick. Within throttle_radius it is updated every throttle_interval
+    ticks. Further away it sleeps. Whenever a throttled or sleeping sprite gets its next update, catch_up() is called
+    first with the number of ticks it missed."""
+    def __init__(self, active_radius=256, throttle_radius=None, throttle_interval=8):
+        self.active_radius = active_radius
+        self.throttle_radius = throttle_radius
+        self.throttle_interval = throttle_interval
+
+    @property
+    def radius(self):
+        return max(self.active_radius, self.throttle_radius or 0)
+
+
+def rect_distance(rect: pg.Rect, other: pg.Rect):
+    """Gap between two rects along the axis they are furthest apart on, 0 if they overlap."""
+    dx = max(other.left - rect.right, rect.left - other.right, 0)
+    dy = max(other.top - rect.bottom, rect.top - other.bottom, 0)
+    return max(dx, dy)
+
+
+class ActivityScheduler:
+    """Decides which sprites of a SpriteList get updated each tick. Sprites without an update_policy are always
+    updated. The rest live in a spatial index, and only the area around the view that any policy cares about is
+    looked at, so sleeping sprites far away cost nothing per tick."""
+    def __init__(self, cell_size=512):
+        self.tick = 0
+        self.always = {}  # Used as an ordered set
+        self.index = SpatialHash(cell_size)
+        self.last_ticks = {}
+        self.phases = {}
+        self.added = 0
+        self.max_radius = 0
+        self.updated_count = 0
+        self.throttled_count = 0
+        self.sleeping_count = 0
+
+    def add(self, sprite):
+        policy = sprite.update_policy
+        if policy is None:
+            self.always[sprite] = None
+            return
+        self.max_radius = max(self.max_radius, policy.radius)
+        self.index.insert(sprite, sprite.rect())
+        self.last_ticks[sprite] = self.tick
+        # Spread throttled updates out over ticks instead of running them all on the same one
+        self.phases[sprite] = self.added
+        self.added += 1
+
+    def remove(self, sprite):
+        if sprite in self.always:
+            del self.always[sprite]
+        else:
+            self.index.remove(sprite)
+            self.last_ticks.pop(sprite, None)
+            self.phases.pop(sprite, None)
+
+    def clear(self):
+        self.always.clear()
+        self.index.clear()
+        self.last_ticks.clear()
+        self.phases.clear()
+
+    def update(self, view: pg.Rect):
+        """Updates whatever should be updated this tick and returns those sprites."""
+        self.tick += 1
+        updated = list(self.always)
+        for sprite in updated:
+            sprite.update()
+
+        throttled = 0
+        search = view.inflate(self.max_radius*2, self.max_radius*2)
+        for sprite in self.index.query(search):
+            policy = sprite.update_policy
+            distance = rect_distance(sprite.rect(), view)
+            if distance > policy.active_radius:
+                if policy.throttle_radius is None or distance > policy.throttle_radius:
+                    continue
+                if (self.tick + self.phases[sprite]) % policy.throttle_interval:
+                    throttled += 1
+                    continue
+
+            missed = self.tick - self.last_ticks[sprite] - 1
+            if missed > 0:
+                sprite.catch_up(missed)
+            sprite.update()
+            self.last_ticks[sprite] = self.tick
+            self.index.update(sprite, sprite.rect())
+            updated.append(sprite)
+
+        self.updated_count = len(updated)
+        self.throttled_count = throttled
+        self.sleeping_count = len(self.index) + len(self.always) - len(updated) - throttled
+        return updated
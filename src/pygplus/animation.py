@@ -1,10 +1,17 @@
 import pygame as pg
 
-from .constants import RIGHT_FACING, LEFT_FACING
+from .constants import RIGHT_FACING, LEFT_FACING, TARGET_DT
+from . import memory
+from . import hotreload
 
+from bisect import bisect_right
 from math import floor
 
 
+def flip_x(surface):
+    return hotreload.derive(surface, pg.transform.flip(surface, True, False), flip_x)
+
+
 class AnimationStates:
     def __init__(self, frames_dict, speed: float=0.25, use_RL: bool=False):
         # frames_dict = {
@@ -16,7 +23,7 @@ class AnimationStates:
             new_dict[RIGHT_FACING] = frames_dict
             new_dict[LEFT_FACING] = {}
             for key, value in frames_dict.items():
-                new_dict[LEFT_FACING][key] = [pg.transform.flip(surface, True, False) for surface in value]
+                new_dict[LEFT_FACING][key] = [memory.track(flip_x(surface), "animation:flipped") for surface in value]
             
             self.frames_dict = new_dict
         else:
@@ -67,4 +74,49 @@ class AnimationStates:
         frame = frame_list[floor(self.frame_num)]
         self.frame_num += self.speed * speed_alpha
         return frame
-        
\ No newline at end of file
+        
+
+
+class AnimationClock:
+    """The time every SharedAnimation shows its frame for. The game calls tick() once per update."""
+    def __init__(self):
+        self.ticks = 0
+
+    def tick(self):
+        self.ticks += 1
+
+    @property
+    def time(self):
+        """Milliseconds of game time since the clock started."""
+        return self.ticks * TARGET_DT * 1000
+
+
+clock = AnimationClock()
+
+
+class SharedAnimation:
+    """An animation every sprite of one type shows in step, like a Tiled animated tile. The frame comes from the
+    global clock instead of a state per sprite, and is worked out at most once per tick no matter how many sprites
+    read surface. durations are in milliseconds, one per frame."""
+    def __init__(self, frames, durations):
+        if not len(frames) == len(durations) or not frames:
+            raise ValueError("Every frame needs a duration")
+        self.frames = list(frames)
+        self.durations = list(durations)
+        self.ends = []  # Time into the loop where every frame ends
+        end = 0
+        for duration in self.durations:
+            end += duration
+            self.ends.append(end)
+        self.period = end
+        self._surface = self.frames[0]
+        self._tick = None
+
+    @property
+    def surface(self):
+        if not self._tick == clock.ticks:
+            self._tick = clock.ticks
+            if self.period > 0:
+                index = bisect_right(self.ends, clock.time % self.period)
+                self._surface = self.frames[min(index, len(self.frames)-1)]
+        return self._surface
\ No newline at end of file
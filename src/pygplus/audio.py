@@ -0,0 +1,123 @@
+import pygame as pg
+
+from .timeline import startup as startup_timeline
+
+import os
+from pathlib import Path
+
+
+# Decoded sounds are shared by every SoundBank, so a restart that rebuilds the game never reads a WAV twice
+_decoded_sounds = {}
+
+def load_sound(filename: Path) -> pg.mixer.Sound:
+    key = str(filename)
+    if not key in _decoded_sounds:
+        with startup_timeline.measure("sound loads"):
+            _decoded_sounds[key] = pg.mixer.Sound(filename)
+    return _decoded_sounds[key]
+
+def use_headless_audio():
+    """Makes SDL use its dummy audio driver. The mixer still runs and channels still finish playing, so voice
+    limits behave like they do with real output. Has to be called before pg.init() or pg.mixer.init()."""
+    os.environ["SDL_AUDIODRIVER"] = "dummy"
+
+
+class SoundInfo:
+    def __init__(self, name, sound, max_voices, priority, steal, volume):
+        self.name = name
+        self.sound = sound  # Shared with every other bank that loaded the file, so the volume is set on the channel
+        self.max_voices = max_voices
+        self.priority = priority
+        self.steal = steal
+        self.volume = volume
+
+
+class Voice:
+    def __init__(self, channel: pg.mixer.Channel):
+        self.channel = channel
+        self.info = None
+        self.priority = 0
+        self.started = 0
+
+    @property
+    def busy(self):
+        return self.info is not None and self.channel.get_busy()
+
+
+class SoundBank:
+    """Named sounds played through a fixed pool of channels.
+
+    Each sound has its own cap on simultaneous voices, and the pool size is the global cap. When a sound hits its
+    own cap its oldest voice is restarted (or the play is dropped if steal is False). When the whole pool is busy
+    the oldest voice with the lowest priority is stolen, as long as it isn't more important than the new sound.
+    If the mixer can't be initialized, every play is silently dropped."""
+    def __init__(self, channels=16):
+        self.sounds = {}
+        self.voices = []
+        self.plays = 0
+        self.dropped = 0
+        self.stolen = 0
+        if pg.mixer.get_init() is None:
+            try:
+                pg.mixer.init()
+            except pg.error:
+                return
+        pg.mixer.set_num_channels(channels)
+        self.voices = [Voice(pg.mixer.Channel(i)) for i in range(channels)]
+
+    @property
+    def enabled(self):
+        return bool(self.voices)
+
+    def load(self, name, filename: Path, max_voices=4, priority=0, steal=True, volume=1.0):
+        if not self.enabled:
+            return
+        self.sounds[name] = SoundInfo(name, load_sound(filename), max_voices, priority, steal, volume)
+
+    def active_voices(self, name=None):
+        return [voice for voice in self.voices if voice.busy and (name is None or voice.info.name == name)]
+
+    def find_voice(self, info, priority):
+        own_voices = self.active_voices(info.name)
+        if len(own_voices) >= info.max_voices:
+            if not info.steal:
+                return None
+            return min(own_voices, key=lambda voice: voice.started)
+
+        for voice in self.voices:
+            if not voice.busy:
+                return voice
+
+        victim = min(self.voices, key=lambda voice: (voice.priority, voice.started))
+        if victim.priority > priority:
+            return None
+        return victim
+
+    def play(self, name, priority=None):
+        """Plays a loaded sound and returns its channel, or None if the play was dropped."""
+        if not self.enabled:
+            return None
+        info = self.sounds[name]
+        if priority is None:
+            priority = info.priority
+
+        voice = self.find_voice(info, priority)
+        if voice is None:
+            self.dropped += 1
+            return None
+        if voice.busy:
+            voice.channel.stop()
+            self.stolen += 1
+
+        self.plays += 1
+        voice.info = info
+        voice.priority = priority
+        voice.started = self.plays
+        voice.channel.play(info.sound)
+        voice.channel.set_volume(info.volume)
+        return voice.channel
+
+    def stop_all(self):
+        for voice in self.voices:
+            voice.channel.stop()
+            voice.info = None
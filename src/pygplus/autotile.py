@@ -0,0 +1,102 @@
+from .utils import load_spritesheet
+
+from pathlib import Path
+
+
+DYNAMIC_TEMPLATE = [
+    "top_left", "top", "top_right", "top_left_right", "slope2",
+    "left", "none", "right", "left_right", "slope2_bottom",
+    "bottom_left", "bottom", "bottom_right", "bottom_left_right", "slope1",
+    "left_top_bottom", "top_bottom", "right_top_bottom", "top_bottom_left_right", "slope1_bottom"
+]
+
+# A bit is set for every side that has no neighbouring tile
+OPEN_TOP = 1
+OPEN_BOTTOM = 2
+OPEN_LEFT = 4
+OPEN_RIGHT = 8
+SIDE_BITS = {"top": OPEN_TOP, "bottom": OPEN_BOTTOM, "left": OPEN_LEFT, "right": OPEN_RIGHT}
+NEIGHBOUR_OFFSETS = ((0, -1, OPEN_TOP), (0, 1, OPEN_BOTTOM), (-1, 0, OPEN_LEFT), (1, 0, OPEN_RIGHT))
+SLOPE_SHAPES = ("slope1", "slope2")
+
+
+loaded_dynamics = False
+DYNAMIC_NAME_TO_SURFACES = {}
+def load_dynamic_surfaces():
+    global loaded_dynamics
+    if not loaded_dynamics:
+        loaded_dynamics = True
+        DYNAMIC_NAME_TO_SURFACES["grass"] = load_spritesheet(Path("assets/tiles/grass.png"))
+
+
+def compile_template(template):
+    """Turns a template of names like "bottom_left" into a 16 entry list indexed by the open-side bitmask, plus a
+    dict for the slope entries. Every index points back into the template (and so into the spritesheet)."""
+    mask_table = [None] * 16
+    shape_table = {}
+    for index, name in enumerate(template):
+        if name.startswith(SLOPE_SHAPES):
+            shape_table[name] = index
+            continue
+        mask = 0
+        if not name == "none":
+            for side in name.split("_"):
+                mask |= SIDE_BITS[side]
+        mask_table[mask] = index
+    if None in mask_table:
+        raise ValueError("Template does not cover every combination of open sides")
+    return mask_table, shape_table
+
+
+class Autotiler:
+    """Picks the surface of every tile with a "dynamic_type" property from the tiles around it. The lookup table is
+    compiled once, so tiling a cell is four dict lookups and a list index. Use tile_all() after loading a map and
+    retile_around() after adding or removing a single tile."""
+    def __init__(self, hash_tilemap, template=DYNAMIC_TEMPLATE):
+        self.hash_tilemap = hash_tilemap
+        self.mask_table, self.shape_table = compile_template(template)
+        load_dynamic_surfaces()
+
+    def open_sides(self, grid_pos):
+        x, y = grid_pos
+        mask = 0
+        for dx, dy, bit in NEIGHBOUR_OFFSETS:
+            if not (x+dx, y+dy) in self.hash_tilemap:
+                mask |= bit
+        return mask
+
+    def template_index(self, grid_pos, tile):
+        if tile.shape_type in SLOPE_SHAPES:
+            return self.shape_table[tile.shape_type]
+        above = self.hash_tilemap.get((grid_pos[0], grid_pos[1]-1))
+        if above is not None and above.shape_type in SLOPE_SHAPES:
+            return self.shape_table[above.shape_type + "_bottom"]
+        return self.mask_table[self.open_sides(grid_pos)]
+
+    def tile_cell(self, grid_pos):
+        tile = self.hash_tilemap.get(grid_pos)
+        # Animated tiles show their animation's frames, so they're left out even with a dynamic_type
+        if tile is None or getattr(tile, "animated", False) or not "dynamic_type" in tile.properties:
+            return
+        surfaces = DYNAMIC_NAME_TO_SURFACES[tile.properties["dynamic_type"]]
+        tile.surface = surfaces[self.template_index(grid_pos, tile)]
+        if tile.geometry is not None and tile.geometry.from_surface:
+            tile.update_geometry()
+
+    def tile_all(self):
+        for _ in self.tile_all_steps():
+            pass
+
+    def tile_all_steps(self, chunk=512):
+        """tile_all() that yields every chunk cells, so it can be spread over frames."""
+        for index, grid_pos in enumerate(self.hash_tilemap):
+            self.tile_cell(grid_pos)
+            if index % chunk == chunk-1:
+                yield
+
+    def retile_around(self, grid_pos):
+        """Re-tiles a cell and its four neighbours, which is everything a single edit can affect."""
+        x, y = grid_pos
+        self.tile_cell(grid_pos)
+        for dx, dy, _ in NEIGHBOUR_OFFSETS:
+            self.tile_cell((x+dx, y+dy))
@@ -0,0 +1,139 @@
+import pygame as pg
+
+from .constants import BACKGROUND_SETTINGS
+from .utils import world_per_pixel
+from .sprite import Node
+from . import hotreload
+from . import memory
+
+
+class ParallaxLayer:
+    """An image behind the scene that scrolls at parallax times the camera's speed, so (0, 0) stays put on the screen
+    and (1, 1) moves with the world. offset is in world units, the surface at render target resolution."""
+    def __init__(self, surface: pg.Surface, parallax=(1, 1), offset=(0, 0), repeat_x=False, repeat_y=False,
+                 opacity=255):
+        self.surface = surface
+        self.parallax = tuple(parallax)
+        self.offset = tuple(offset)
+        self.repeat_x = repeat_x
+        self.repeat_y = repeat_y
+        self.opacity = opacity
+        self.strip = None  # The surface tiled enough times to cover the screen from any scroll position
+        self.covers_screen = False  # Repeats both ways without any see-through pixels
+
+    @property
+    def static(self):
+        return self.parallax == (0, 0)
+
+    def build(self, screen_size):
+        width, height = self.surface.get_size()
+        columns = -(-screen_size[0]//width) + 1 if self.repeat_x else 1
+        rows = -(-screen_size[1]//height) + 1 if self.repeat_y else 1
+        if columns == rows == 1:
+            strip = self.surface
+        else:
+            strip = pg.Surface((width*columns, height*rows)).convert()
+            strip.blits([(self.surface, (column*width, row*height)) for column in range(columns)
+                         for row in range(rows)], doreturn=False)
+            strip.set_colorkey(self.surface.get_colorkey())
+            memory.track(strip, "background:strip")
+        opaque = pg.mask.from_surface(self.surface).count() == width*height
+        self.covers_screen = self.repeat_x and self.repeat_y and opaque and self.opacity == 255
+        if not self.opacity == 255:
+            if strip is self.surface:
+                strip = memory.track(strip.copy(), "background:strip")
+            strip.set_alpha(self.opacity)
+        self.strip = strip
+
+    def position(self, camera_position):
+        """Where the strip goes on the screen, in render target pixels."""
+        pixel_size = world_per_pixel()
+        x = round((self.offset[0] - camera_position[0]*self.parallax[0]) / pixel_size)
+        y = round((self.offset[1] - camera_position[1]*self.parallax[1]) / pixel_size)
+        # A repeating strip is one tile longer than the screen, so it can always start within a tile left of it
+        if self.repeat_x:
+            x = x % self.surface.get_width() - self.surface.get_width()
+        if self.repeat_y:
+            y = y % self.surface.get_height() - self.surface.get_height()
+        return x, y
+
+
+class Background(Node):
+    """Draws a solid color and parallax layers, back to front, at the start of a frame.
+
+    Layers are turned into screen covering strips once, so a layer is a single blit per frame however many times
+    its image repeats. The color and the layers that never move, up to the first one that does, are composited into
+    one surface up front. When nothing moved since the frame before, the whole last background is reused with one
+    blit. Without layers, or with BACKGROUND_SETTINGS["parallax"] off, it's just a fill."""
+    def __init__(self, color=(119, 196, 236), layers=()):
+        self.color = color
+        self.layers = list(layers)
+        self.target_size = None
+        self.generation = None
+        self.composite = None  # The color and static layers at the back, None if there are none
+        self.moving = []  # Every layer drawn after the composite, static ones in front of a moving one included
+        self.covered = False
+        self.cache = None  # Copy of the last background that was drawn while nothing moved
+        self.cached_positions = None
+        self.last_positions = None
+        self.blit_count = 0
+
+    def build(self, target: pg.Surface):
+        self.target_size = target.get_size()
+        self.generation = hotreload.generation
+        for layer in self.layers:
+            layer.build(self.target_size)
+        layers = self.layers
+        # A layer that covers the whole screen hides everything behind it, the color included
+        self.covered = False
+        for index in range(len(layers)-1, -1, -1):
+            if layers[index].covers_screen:
+                layers = layers[index:]
+                self.covered = True
+                break
+        # Static layers behind every moving one go into the composite, the rest are drawn in order
+        behind = 0
+        while behind < len(layers) and layers[behind].static:
+            behind += 1
+        self.moving = layers[behind:]
+        self.composite = None
+        if behind:
+            self.composite = memory.track(pg.Surface(self.target_size).convert(), "background:composite")
+            self.composite.fill(self.color)
+            for layer in layers[:behind]:
+                self.composite.blit(layer.strip, layer.position((0, 0)))
+        self.cache = None
+        self.cached_positions = None
+        self.last_positions = None
+
+    def draw(self, target: pg.Surface = None):
+        target = target or self.engine.screen
+        if not BACKGROUND_SETTINGS["parallax"] or not self.layers:
+            target.fill(self.color)
+            self.blit_count = 0
+            return
+        if not self.target_size == target.get_size() or not self.generation == hotreload.generation:
+            self.build(target)
+
+        camera_position = self.engine.camera_position
+        positions = tuple(layer.position(camera_position) for layer in self.moving)
+        if positions == self.cached_positions:
+            target.blit(self.cache, (0, 0))
+            self.blit_count = 1
+            return
+
+        if self.composite is not None:
+            target.blit(self.composite, (0, 0))
+        elif not self.covered:  # Otherwise nothing behind the first layer shows through
+            target.fill(self.color)
+        for layer, position in zip(self.moving, positions):
+            target.blit(layer.strip, position)
+        self.blit_count = len(self.moving) + (self.composite is not None or not self.covered)
+
+        # Keep a copy once the camera has stood still for two frames, it's likely to stay still a while
+        if positions == self.last_positions and any(not layer.static for layer in self.moving):
+            if self.cache is None:
+                self.cache = memory.track(pg.Surface(self.target_size).convert(), "background:cache")
+            self.cache.blit(target, (0, 0))
+            self.cached_positions = positions
+        self.last_positions = positions
@@ -3,11 +3,69 @@ RIGHT_FACING = 0
 LEFT_FACING = 1
 
 # Settings
-MAX_FPS = 0  # Put 0 for no fps limit
+MAX_FPS = 0  # Put 0 for no fps limit (or the display refresh rate when frame pacing is on)
 TARGET_FPS = 60
 TARGET_DT = 1/TARGET_FPS
 FIXED_TIMESTEP_SETTINGS = {
     "enable": True,
     "interpolate": True,
     "busy_loop": False
+}
+STARTUP_SETTINGS = {
+    "fast": True,  # Only initialize the pygame subsystems in use and use pygame's bundled font
+    "print_report": False  # Print the startup timeline after the first flip
+}
+RENDER_SETTINGS = {
+    # Keep assets at their native resolution, draw into a screen/SCALE sized surface and upscale it once per frame.
+    # Has to be set before any assets are loaded
+    "low_res": False
+}
+PACING_SETTINGS = {
+    "enable": True,  # Sleep to a target frame time instead of drawing as fast as possible
+    "vsync": False,  # Let the display flip wait for the refresh instead. Falls back to sleeping if unavailable
+    "unfocused_fps": 15,  # Frame rate while the window is unfocused or minimized, 0 to not slow down
+    "spin_threshold": 0.002  # Seconds before the deadline where sleeping stops and spinning takes over
+}
+BACKGROUND_SETTINGS = {
+    "parallax": True  # Draw the map's image layers behind the scene, otherwise only fill with the background color
+}
+PARTICLE_SETTINGS = {
+    # Hard caps, anything over them is dropped instead of costing frame time
+    "max_particles": 20000,
+    "spawn_budget": 2000,  # New particles per tick
+    "draw_budget": 20000  # Particles rasterized per frame
+}
+NAVIGATION_SETTINGS = {
+    # In tiles. What walkers are assumed to be able to do when the navigation graph links up the ground
+    "jump_height": 2,
+    "jump_distance": 3,
+    "max_drop": 8,
+    "cache_size": 256,  # Paths kept in the LRU cache
+    "expansions_per_tick": 1500,  # A* node expansions shared by all path requests in a tick
+    "max_expansions": 6000  # A single search gives up after this many
+}
+PREFETCH_SETTINGS = {
+    "budget": 0.002,  # Seconds of main thread work per frame for a background load
+    "switch_interval": 0.001  # GIL switch interval while a worker thread is loading, see sys.setswitchinterval
+}
+HIT_SETTINGS = {
+    "cell_size": 128  # Grid cell size in world units for finding hit candidates, around the size of a hurtable
+}
+MINIMAP_SETTINGS = {
+    "enable": True,
+    "cell_pixels": 3,  # Size of a cell on the minimap at full resolution
+    "view_cells": (64, 36),  # Cells shown around the player
+    "background": (24, 28, 40),
+    "alpha": 210
+}
+HOT_RELOAD_SETTINGS = {
+    # Watch the asset folders and swap changed images and maps into the running game. Toggled with H in game
+    "enable": False,
+    "roots": ("assets",),
+    "interval": 0.5  # Seconds between scans for changed files
+}
+PALETTE_SETTINGS = {
+    # Display format copies of recolored indexed surfaces kept around, see palette.resolve(). The player alone
+    # draws 17 frames x 2 facings x 2 recolors, anything under that converts on every draw
+    "cache_size": 128
 }
\ No newline at end of file
@@ -2,25 +2,100 @@ import pygame as pg
 import pygplus as pgp
 
 import asyncio
-
-import os; os.chdir(os.path.dirname(__file__))
+from collections import deque
+import statistics
+import time
+
+
+def detect_refresh_rate(default=60):
+    rate = 0
+    if hasattr(pg.display, "get_current_refresh_rate"):
+        try:
+            rate = pg.display.get_current_refresh_rate()
+        except pg.error:
+            pass
+    return rate or default
+
+
+class FramePacer:
+    """Waits out the rest of each frame with a sleep that stops spin_threshold early, then spins to the exact
+    deadline, since sleeps can overshoot by a millisecond or more. A late frame starts the next one from now instead
+    of trying to catch up. Also keeps recent frame times to report jitter."""
+    def __init__(self, target_fps, unfocused_fps=15, spin_threshold=0.002, history=120):
+        self.target_fps = target_fps
+        self.unfocused_fps = unfocused_fps
+        self.spin_threshold = spin_threshold
+        self.frame_times = deque(maxlen=history)
+        self.last = time.perf_counter()
+
+    def current_target(self):
+        if self.unfocused_fps and not (pg.display.get_active() and pg.key.get_focused()):
+            return self.unfocused_fps
+        return self.target_fps
+
+    def tick(self):
+        """Waits for the next frame and returns the seconds since the last one."""
+        target = self.current_target()
+        if target:
+            deadline = self.last + 1/target
+            remaining = deadline - time.perf_counter()
+            if remaining > self.spin_threshold:
+                time.sleep(remaining - self.spin_threshold)
+            while time.perf_counter() < deadline:
+                pass
+        now = time.perf_counter()
+        dt = now - self.last
+        self.last = now
+        self.frame_times.append(dt)
+        return dt
+
+    @property
+    def mean_frame_time(self):
+        return statistics.fmean(self.frame_times) if self.frame_times else 0
+
+    @property
+    def jitter(self):
+        """Standard deviation of recent frame times, in seconds."""
+        return statistics.pstdev(self.frame_times) if len(self.frame_times) > 1 else 0
 
 
 class Engine:
     def __init__(self, width, height, title="Pygame game", icon_path=None, icon_size=32):
-        pg.init()
+        if pgp.STARTUP_SETTINGS["fast"]:
+            # Fonts are initialized when the debug font is first needed and the mixer by the sound bank
+            pg.display.init()
+        else:
+            pg.init()
+        pgp.startup_timeline.mark("pygame initialized")
 
         pgp.init_nodes(engine=self)
         self.screen_width = width
         self.screen_height = height
-        self.screen = pg.display.set_mode((self.screen_width, self.screen_height), vsync=False)
+        self.display = self.create_display()
+        if pgp.RENDER_SETTINGS["low_res"]:
+            # Everything is drawn here at asset resolution, then upscaled to the display once in present()
+            self.screen = pg.Surface((self.screen_width//pgp.SCALE, self.screen_height//pgp.SCALE)).convert()
+        else:
+            self.screen = self.display
+        self.render_queue = pgp.render.RenderQueue(self.screen)
         pg.display.set_caption(title)
         if icon_path:
             icon = pg.transform.scale(pg.image.load(icon_path).convert_alpha(), (icon_size, icon_size))
             pg.display.set_icon(icon)
+        pgp.startup_timeline.mark("window created")
         self.clock = pg.time.Clock()
-
-        self.debug_font = pg.font.SysFont("calibri", size=32)
+        self.refresh_rate = detect_refresh_rate()
+        # With vsync the flip already waits for the display, so the pacer only measures
+        self.pacer = FramePacer(
+            target_fps=None if self.vsync else (pgp.MAX_FPS or self.refresh_rate),
+            unfocused_fps=pgp.PACING_SETTINGS["unfocused_fps"],
+            spin_threshold=pgp.PACING_SETTINGS["spin_threshold"]
+        )
+        self.profile_capture = pgp.profiling.ProfileCapture()
+        self.sound_bank = pgp.audio.SoundBank(channels=16)
+        pgp.startup_timeline.mark("mixer initialized")
+
+        self._debug_font = None
         self.enable_debug_text = True
         self.reset_debug_text()
 
@@ -30,6 +105,30 @@ class Engine:
 
         self.running = True
 
+    def create_display(self):
+        size = (self.screen_width, self.screen_height)
+        self.vsync = False
+        if pgp.PACING_SETTINGS["enable"] and pgp.PACING_SETTINGS["vsync"]:
+            try:
+                # vsync needs a renderer, which pygame only uses with SCALED or OPENGL
+                display = pg.display.set_mode(size, pg.SCALED, vsync=1)
+                self.vsync = True
+                return display
+            except pg.error:
+                pass
+        return pg.display.set_mode(size, vsync=False)
+
+    @property
+    def debug_font(self):
+        if self._debug_font is None:
+            if pgp.STARTUP_SETTINGS["fast"]:
+                # pygame's bundled font, which skips the system font scan SysFont does
+                pg.font.init()
+                self._debug_font = pg.font.Font(None, size=36)
+            else:
+                self._debug_font = pg.font.SysFont("calibri", size=32)
+        return self._debug_font
+
     def reset(self):
         pass
 
@@ -47,6 +146,15 @@ class Engine:
     def draw_background(self):
         self.screen.fill((119, 196, 236))
 
+    def present(self):
+        """Gets the frame onto the display surface. Only does work when rendering at low resolution."""
+        if not self.screen is self.display:
+            pg.transform.scale(self.screen, self.display.get_size(), self.display)
+
+    def draw_debug_text(self):
+        """Called after present() when debug text is on, so text is drawn at display resolution."""
+        pass
+
     def debug_text(self, item, value, round_floats=True):
         if isinstance(value, float) and round_floats:
             text = f"{item}: {round(value, 2)}"
@@ -55,18 +163,25 @@ class Engine:
         surface = self.debug_font.render(text, True, (255, 255, 255))
         rect = surface.get_rect()
         rect.bottomleft = (10, self.debug_text_y)
-        self.screen.blit(surface, rect)
+        self.display.blit(surface, rect)
         self.debug_text_y -= self.debug_font.get_height() + 5
 
     def reset_debug_text(self):
         self.debug_text_y = self.screen_height - 4
 
+    def finish_startup(self):
+        pgp.startup_timeline.finish("first flip")
+        if pgp.STARTUP_SETTINGS["print_report"]:
+            print(pgp.startup_timeline.report())
+
     def gameloop(self):
         self.reset()
         self.running = True
         while self.running:
             if pgp.FIXED_TIMESTEP_SETTINGS["enable"]:
-                if pgp.FIXED_TIMESTEP_SETTINGS["busy_loop"]:
+                if pgp.PACING_SETTINGS["enable"]:
+                    self.dt = self.pacer.tick()
+                elif pgp.FIXED_TIMESTEP_SETTINGS["busy_loop"]:
                     self.dt = self.clock.tick_busy_loop(pgp.MAX_FPS)/1000
                 else:
                     self.dt = self.clock.tick(pgp.MAX_FPS)/1000
@@ -75,6 +190,7 @@ class Engine:
                 else:
                     self.fps = 1/self.dt
 
+                self.profile_capture.begin_frame()
                 self.accumulator += self.dt
                 self.updates_per_frame = 0
                 while self.accumulator >= pgp.TARGET_DT:
@@ -84,7 +200,14 @@ class Engine:
                     self.updates_per_frame += 1
                 
                 self.draw()
+                self.present()
+                if self.enable_debug_text:
+                    self.reset_debug_text()
+                    self.draw_debug_text()
                 pg.display.flip()
+                self.profile_capture.end_frame()
+                if not pgp.startup_timeline.finished:
+                    self.finish_startup()
             else:
                 raise NotImplementedError("Not finished yet. Just use fixed timestep for now.")
                 self.dt = self.clock.tick(pgp.MAX_FPS)/1000
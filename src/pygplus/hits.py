@@ -0,0 +1,121 @@
+from .constants import HIT_SETTINGS
+from .sprite import Node
+
+
+class Hit:
+    def __init__(self, hitter, hurtable, time):
+        self.hitter = hitter
+        self.hurtable = hurtable
+        self.time = time  # How far along the hitter's move this tick the hit happened, 0 to 1
+
+
+def sweep_time(start, move, size, other_pos, other_size):
+    """When a box of size moving from start by move first overlaps the other box, as a fraction of the move, or
+    None if it doesn't this tick. Works on the other box grown by size, so the moving box becomes a point."""
+    enter = 0.0
+    leave = 1.0
+    for axis in (0, 1):
+        low = other_pos[axis] - size[axis]
+        high = other_pos[axis] + other_size[axis]
+        if move[axis] == 0:
+            if not low < start[axis] < high:
+                return None
+            continue
+        near = (low - start[axis]) / move[axis]
+        far = (high - start[axis]) / move[axis]
+        if near > far:
+            near, far = far, near
+        enter = max(enter, near)
+        leave = min(leave, far)
+        if enter >= leave:
+            return None
+    return enter
+
+
+class HitDetector(Node):
+    """Finds which hitters (projectiles, attacks) touch which hurtables (enemies, the player) after everything moved
+    for the tick.
+
+    Hitters and hurtables come from whole SpriteLists, so sprites that are added or killed need no bookkeeping.
+    Sprites say what they are with hit_layer and what they can hit with hit_mask, both bit flags, and a hitter only
+    hits hurtables whose hit_layer shares a bit with its hit_mask. Hurtables are bucketed into a uniform grid every
+    tick and each hitter only tests the ones in the cells it covers, so the cost grows with the number of sprites
+    instead of hitters times hurtables. Hitters with swept_hits test the whole way they moved since last tick, so
+    fast ones can't skip through something thin.
+
+    Hits of the last update() are in hits, each hitter's ordered by time, for game code to act on."""
+    def __init__(self, cell_size=None):
+        self.cell_size = cell_size or HIT_SETTINGS["cell_size"]
+        self.hitters = []
+        self.hurtables = []
+        self.hits = []
+        self.test_count = 0
+
+    def add_hitters(self, spritelist):
+        self.hitters.append(spritelist)
+
+    def add_hurtables(self, spritelist):
+        self.hurtables.append(spritelist)
+
+    def clear(self):
+        self.hitters.clear()
+        self.hurtables.clear()
+        self.hits = []
+
+    def update(self):
+        self.hits = []
+        self.test_count = 0
+        cs = self.cell_size
+        grid = {}
+        for spritelist in self.hurtables:
+            for sprite in spritelist:
+                if not sprite.hit_layer:
+                    continue
+                x, y = sprite.pos
+                width, height = sprite.size
+                for cell_x in range(int(x//cs), int((x+width)//cs)+1):
+                    for cell_y in range(int(y//cs), int((y+height)//cs)+1):
+                        bucket = grid.get((cell_x, cell_y))
+                        if bucket is None:
+                            grid[(cell_x, cell_y)] = [sprite]
+                        else:
+                            bucket.append(sprite)
+        if not grid:
+            return
+
+        for spritelist in self.hitters:
+            for hitter in spritelist:
+                mask = hitter.hit_mask
+                if not mask:
+                    continue
+                x, y = hitter.pos
+                width, height = hitter.size
+                if hitter.swept_hits:
+                    start = hitter.old_pos
+                    move = (x - start[0], y - start[1])
+                    left, top = min(x, start[0]), min(y, start[1])
+                    right, bottom = max(x, start[0]) + width, max(y, start[1]) + height
+                else:
+                    start = hitter.pos
+                    move = (0, 0)
+                    left, top, right, bottom = x, y, x + width, y + height
+
+                found = []
+                tested = set()
+                for cell_x in range(int(left//cs), int(right//cs)+1):
+                    for cell_y in range(int(top//cs), int(bottom//cs)+1):
+                        for other in grid.get((cell_x, cell_y), ()):
+                            if other is hitter or other in tested or not mask & other.hit_layer:
+                                continue
+                            tested.add(other)
+                            other_x, other_y = other.pos
+                            if (other_x >= right or other_x + other.size[0] <= left or
+                                    other_y >= bottom or other_y + other.size[1] <= top):
+                                continue
+                            time = sweep_time(start, move, hitter.size, other.pos, other.size)
+                            if time is not None:
+                                found.append(Hit(hitter, other, time))
+                self.test_count += len(tested)
+                if len(found) > 1:
+                    found.sort(key=lambda hit: hit.time)
+                self.hits.extend(found)
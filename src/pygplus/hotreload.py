@@ -0,0 +1,159 @@
+import pygame as pg
+
+from .constants import HOT_RELOAD_SETTINGS
+
+from pathlib import Path
+import os
+import time
+import weakref
+
+
+# Resolved path -> list of (weak refs to the surfaces one load made, function turning a fresh pg.image.load() of
+# the file into the same surfaces again). Filled in by the pygplus loaders
+_loads = {}
+# Source surface -> list of (weak ref to a surface made from it, function making it again from the source)
+_derived = weakref.WeakKeyDictionary()
+# Called with the reloaded paths after every reload_assets(), for caches that hold on to surface contents
+_reload_callbacks = []
+_replaying = False
+generation = 0  # Goes up with every reload_assets() that swapped something, for caches that check instead
+
+
+def register_load(filename, surfaces, reconvert):
+    if _replaying:
+        return
+    path = Path(filename).resolve()
+    # Drop loads whose surfaces are all gone, like the last level's tilesets
+    loads = [load for load in _loads.get(path, ()) if any(ref() is not None for ref in load[0])]
+    loads.append(([weakref.ref(surface) for surface in surfaces], reconvert))
+    _loads[path] = loads
+
+def derive(source: pg.Surface, surface: pg.Surface, transform) -> pg.Surface:
+    """Remembers that surface is transform(source), so it's made again when source is reloaded. Returns surface."""
+    if not _replaying:
+        _derived.setdefault(source, []).append((weakref.ref(surface), transform))
+    return surface
+
+def on_reload(callback):
+    _reload_callbacks.append(callback)
+
+def copy_into(target: pg.Surface, new: pg.Surface):
+    """Overwrites target's pixels with new's, so everything already holding target sees the new image."""
+    colorkey = new.get_colorkey()
+    new.set_colorkey(None)
+    if target.get_bitsize() == 8:
+        target.set_palette(new.get_palette())  # An indexed surface, see palette.index_surfaces()
+    target.fill((0, 0, 0, 0))
+    target.blit(new, (0, 0))
+    new.set_colorkey(colorkey)
+    target.set_colorkey(colorkey)
+
+def replace(target: pg.Surface, new: pg.Surface):
+    """copy_into() and then remakes every surface derived from target. Returns False if the size changed, in which
+    case target is left alone."""
+    if not target.get_size() == new.get_size():
+        return False
+    copy_into(target, new)
+    for surface_ref, transform in _derived.get(target, ()):
+        derived = surface_ref()
+        if derived is not None:
+            replace(derived, transform(target))
+    return True
+
+def reload_asset(filename):
+    """Loads filename again and swaps the result into every surface that was loaded from it. Returns how many
+    surfaces were swapped and how many were skipped because their size changed."""
+    global _replaying
+    path = Path(filename).resolve()
+    swapped = skipped = 0
+    loads = [(refs, reconvert) for refs, reconvert in _loads.get(path, ()) if any(ref() is not None for ref in refs)]
+    if not loads:
+        _loads.pop(path, None)
+        return swapped, skipped
+    _loads[path] = loads
+    raw = pg.image.load(path)
+    _replaying = True
+    try:
+        for refs, reconvert in loads:
+            for ref, new in zip(refs, reconvert(raw)):
+                target = ref()
+                if target is None:
+                    continue
+                if replace(target, new):
+                    swapped += 1
+                else:
+                    skipped += 1
+    finally:
+        _replaying = False
+    return swapped, skipped
+
+def loaded_surfaces(paths):
+    """Every surface still alive that was loaded from one of paths, and every surface derived from those."""
+    surfaces = []
+    for path in paths:
+        for refs, _ in _loads.get(Path(path).resolve(), ()):
+            surfaces += [surface for surface in (ref() for ref in refs) if surface is not None]
+    for surface in surfaces:  # Grows while it goes, so derived surfaces of derived surfaces are found too
+        surfaces += [derived for derived in (ref() for ref, _ in _derived.get(surface, ())) if derived is not None]
+    return surfaces
+
+def reload_assets(paths, errors=None):
+    """reload_asset() for every path, then lets the on_reload() callbacks drop what they cached. Returns the paths
+    that had surfaces swapped. If an errors dict is given, paths that fail to load (like a half written file) are
+    put in it with their exception and skipped instead of raising."""
+    global generation
+    reloaded = []
+    for path in paths:
+        try:
+            swapped, _ = reload_asset(path)
+        except (pg.error, OSError) as error:
+            if errors is None:
+                raise
+            errors[path] = error
+            continue
+        if swapped:
+            reloaded.append(path)
+    if reloaded:
+        generation += 1
+        for callback in _reload_callbacks:
+            callback(reloaded)
+    return reloaded
+
+
+class FileWatcher:
+    """Finds files under some directories that changed since the last poll by comparing modification times, which
+    works anywhere, headless included. Only scans once every interval seconds."""
+    def __init__(self, roots, suffixes=(".png", ".json"), interval=None):
+        self.roots = [Path(root) for root in roots]
+        self.suffixes = suffixes
+        self.interval = interval or HOT_RELOAD_SETTINGS["interval"]
+        self.next_scan = 0
+        self.mtimes = self.scan()
+
+    def scan(self):
+        mtimes = {}
+        for root in self.roots:
+            for directory, _, filenames in os.walk(root):
+                for filename in filenames:
+                    if filename.endswith(self.suffixes):
+                        path = os.path.join(directory, filename)
+                        try:
+                            mtimes[path] = os.stat(path).st_mtime_ns
+                        except OSError:
+                            pass  # Deleted while scanning, or an editor swapping files
+        return mtimes
+
+    def poll(self):
+        """Paths that were added or modified since the last scan."""
+        now = time.monotonic()
+        if now < self.next_scan:
+            return []
+        self.next_scan = now + self.interval
+        mtimes = self.scan()
+        changed = [Path(path) for path, mtime in mtimes.items() if not self.mtimes.get(path) == mtime]
+        self.mtimes = mtimes
+        return changed
+
+    def retry(self, path):
+        """Reports path as changed again on the next poll, like after it failed to load."""
+        self.mtimes.pop(str(path), None)
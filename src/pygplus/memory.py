@@ -0,0 +1,68 @@
+import pygame as pg
+
+from pathlib import Path
+import gc
+import json
+import weakref
+
+
+# Every surface made by the pygplus loaders and transforms is tagged with an owner string like
+# "asset:assets/tiles/rope.png" or "cache:Enemy rotate". Entries go away with their surface.
+enabled = True
+_owners = weakref.WeakKeyDictionary()
+
+def track(surface: pg.Surface, owner: str) -> pg.Surface:
+    if enabled:
+        _owners[surface] = owner
+    return surface
+
+def surface_bytes(surface: pg.Surface):
+    width, height = surface.get_size()
+    return width * height * surface.get_bytesize()
+
+def breakdown():
+    """{owner: {"count": surfaces, "bytes": pixel bytes}}, largest owners first."""
+    owners = {}
+    for surface, owner in list(_owners.items()):
+        entry = owners.setdefault(owner, {"count": 0, "bytes": 0})
+        entry["count"] += 1
+        entry["bytes"] += surface_bytes(surface)
+    return dict(sorted(owners.items(), key=lambda item: item[1]["bytes"], reverse=True))
+
+def total_bytes():
+    return sum(surface_bytes(surface) for surface in list(_owners.keys()))
+
+def dump(filename: Path = None, collect=False):
+    """Snapshot of tracked surface memory. With collect, unreachable sprites are garbage collected first so only
+    surfaces that are really still alive get counted."""
+    if collect:
+        gc.collect()
+    owners = breakdown()
+    data = {
+        "total_bytes": sum(entry["bytes"] for entry in owners.values()),
+        "total_count": sum(entry["count"] for entry in owners.values()),
+        "owners": owners
+    }
+    if filename is not None:
+        with open(filename, "w") as file:
+            json.dump(data, file, indent=4)
+    return data
+
+def load_dump(filename: Path):
+    with open(filename) as file:
+        return json.load(file)
+
+def diff(before, after):
+    """Per owner change between two dumps. Owners that didn't change are left out."""
+    changes = {}
+    before_owners, after_owners = before["owners"], after["owners"]
+    for owner in {**before_owners, **after_owners}:
+        old = before_owners.get(owner, {"count": 0, "bytes": 0})
+        new = after_owners.get(owner, {"count": 0, "bytes": 0})
+        if not old == new:
+            changes[owner] = {"count": new["count"]-old["count"], "bytes": new["bytes"]-old["bytes"]}
+    return {
+        "total_bytes": after["total_bytes"]-before["total_bytes"],
+        "total_count": after["total_count"]-before["total_count"],
+        "owners": dict(sorted(changes.items(), key=lambda item: item[1]["bytes"], reverse=True))
+    }
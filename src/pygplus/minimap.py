@@ -0,0 +1,178 @@
+import pygame as pg
+
+from .constants import MINIMAP_SETTINGS
+from .utils import world_per_pixel
+from .sprite import Node
+from . import memory
+
+
+class Minimap(Node):
+    """A map of a hash tilemap SpriteList with one block of cell_pixels per cell, drawn once into a cached surface.
+
+    Only cells that change get repainted: the list calls update_cell() from add_tile() and remove_tile(), and static
+    items like coins are painted in with add_item() and taken out with remove_item(). Drawing copies the part of the
+    cached surface around a point into a small frame and puts markers for moving things on top, so a frame never
+    touches the whole map. Cells are colored with the average color of their tile's surface."""
+    def __init__(self, walls, cell_pixels=None, view_cells=None):
+        self.walls = walls
+        self.tile_size = walls.tile_size
+        # At low resolution a render target pixel is already several world pixels wide
+        self.cell_pixels = cell_pixels or max(1, round(MINIMAP_SETTINGS["cell_pixels"]/world_per_pixel()))
+        self.view_cells = view_cells or MINIMAP_SETTINGS["view_cells"]
+        self.background = MINIMAP_SETTINGS["background"]
+        self.z = None
+        self.surface = None
+        self.origin = (0, 0)  # Grid position of the cached surface's topleft cell
+        self.items = {}  # Grid position -> color of static items painted into the cached surface
+        self.item_cells = {}  # Item sprite -> (grid position, color)
+        self.colors = {}  # Tile surface -> average color
+        self.grown = False  # Set when a tile or item landed outside the cached surface, build() again to show it
+        cp = self.cell_pixels
+        self.frame = pg.Surface((self.view_cells[0]*cp, self.view_cells[1]*cp)).convert()
+        self.frame.set_alpha(MINIMAP_SETTINGS["alpha"])
+        memory.track(self.frame, "minimap")
+        walls.minimap = self
+
+    def build(self):
+        for _ in self.build_steps():
+            pass
+
+    def build_steps(self, chunk=2048):
+        """Paints every cell of the hash tilemap. Yields every chunk cells, for building a level over several
+        frames."""
+        hash_tilemap = self.walls.hash_tilemap
+        if hash_tilemap is None:
+            raise Exception("Hash tilemap has not been loaded yet")
+        cells = hash_tilemap.keys() | self.items.keys() if self.items else hash_tilemap
+        if cells:
+            left = min(x for x, _ in cells)
+            top = min(y for _, y in cells)
+            width = max(x for x, _ in cells) - left + 1
+            height = max(y for _, y in cells) - top + 1
+        else:
+            left = top = 0
+            width = height = 1
+        self.origin = (left, top)
+        self.colors.clear()
+        self.grown = False
+        self.surface = pg.Surface((width*self.cell_pixels, height*self.cell_pixels)).convert()
+        self.surface.fill(self.background)
+        memory.track(self.surface, "minimap")
+        yield
+        for index, grid_pos in enumerate(hash_tilemap):
+            self.paint(grid_pos)
+            if index % chunk == chunk-1:
+                yield
+        for grid_pos in self.items:
+            self.paint(grid_pos)
+
+    def cell_color(self, grid_pos):
+        if grid_pos in self.items:
+            return self.items[grid_pos]
+        tile = self.walls.hash_tilemap.get(grid_pos)
+        if tile is None or tile.surface is None:
+            return self.background
+        color = self.colors.get(tile.surface)
+        if color is None:
+            color = pg.transform.average_color(tile.surface, tile.surface.get_bounding_rect())[:3]
+            self.colors[tile.surface] = color
+        return color
+
+    def paint(self, grid_pos):
+        cp = self.cell_pixels
+        x = (grid_pos[0]-self.origin[0]) * cp
+        y = (grid_pos[1]-self.origin[1]) * cp
+        # Cells outside the map's bounds when it was built have nowhere to go
+        if 0 <= x < self.surface.get_width() and 0 <= y < self.surface.get_height():
+            self.surface.fill(self.cell_color(grid_pos), (x, y, cp, cp))
+        elif grid_pos in self.walls.hash_tilemap or grid_pos in self.items:
+            self.grown = True
+
+    def update_colors(self, surfaces):
+        """Recolors the cells of tiles drawn with surfaces, like after they were reloaded. Only cells whose color
+        actually changed get repainted."""
+        changed = set()
+        for surface in surfaces:
+            old_color = self.colors.pop(surface, None)
+            if old_color is not None:
+                color = pg.transform.average_color(surface, surface.get_bounding_rect())[:3]
+                self.colors[surface] = color
+                if not color == old_color:
+                    changed.add(surface)
+        if not changed or self.surface is None:
+            return
+        for grid_pos, tile in self.walls.hash_tilemap.items():
+            if tile.surface in changed:
+                self.paint(grid_pos)
+
+    def update_cell(self, grid_pos):
+        """Repaints a changed cell and its neighbours, whose tiles the autotiler may have swapped."""
+        if self.surface is None:
+            return
+        gx, gy = grid_pos
+        for x in range(gx-1, gx+2):
+            for y in range(gy-1, gy+2):
+                self.paint((x, y))
+
+    def grid_pos(self, point):
+        return int(point[0]//self.tile_size), int(point[1]//self.tile_size)
+
+    def add_item(self, sprite, color):
+        grid_pos = self.grid_pos((sprite.centerx, sprite.centery))
+        self.item_cells[sprite] = (grid_pos, color)
+        self.items[grid_pos] = color
+        if self.surface is not None:
+            self.paint(grid_pos)
+
+    def remove_item(self, sprite):
+        if not sprite in self.item_cells:
+            return
+        grid_pos, _ = self.item_cells.pop(sprite)
+        del self.items[grid_pos]
+        # Another item may share the cell
+        for other_pos, color in self.item_cells.values():
+            if other_pos == grid_pos:
+                self.items[grid_pos] = color
+                break
+        if self.surface is not None:
+            self.paint(grid_pos)
+
+    def view(self, center):
+        """The topleft cell of the cached surface that's shown around center (a world position)."""
+        cp = self.cell_pixels
+        view_width, view_height = self.view_cells
+        center_x, center_y = self.grid_pos(center)
+        # Keep the view inside the map where the map is big enough
+        map_width = self.surface.get_width() // cp
+        map_height = self.surface.get_height() // cp
+        left = max(0, min(center_x - self.origin[0] - view_width//2, map_width - view_width))
+        top = max(0, min(center_y - self.origin[1] - view_height//2, map_height - view_height))
+        return left, top
+
+    def view_rect(self, center) -> pg.Rect:
+        """The part of the world shown around center, to look up just the things that need a marker."""
+        left, top = self.view(center)
+        ts = self.tile_size
+        return pg.Rect((self.origin[0]+left)*ts, (self.origin[1]+top)*ts, self.view_cells[0]*ts, self.view_cells[1]*ts)
+
+    def draw(self, center, markers=(), pos=None):
+        """Draws the cells around center (a world position) and markers, (world position, color) pairs, into the
+        top right corner of the screen or at pos."""
+        cp = self.cell_pixels
+        view_width, view_height = self.view_cells
+        left, top = self.view(center)
+
+        frame = self.frame
+        frame.fill(self.background)
+        frame.blit(self.surface, (0, 0), (left*cp, top*cp, view_width*cp, view_height*cp))
+        marker_size = cp + 2
+        for point, color in markers:
+            x = (int(point[0]//self.tile_size) - self.origin[0] - left) * cp
+            y = (int(point[1]//self.tile_size) - self.origin[1] - top) * cp
+            if 0 <= x < view_width*cp and 0 <= y < view_height*cp:
+                frame.fill(color, (x-1, y-1, marker_size, marker_size))
+
+        if pos is None:
+            margin = 10 // world_per_pixel() + 1
+            pos = (self.engine.screen.get_width() - frame.get_width() - margin, margin)
+        self.engine.render_queue.push(frame, pos, self.z)
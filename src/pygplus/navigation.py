@@ -0,0 +1,321 @@
+from .constants import NAVIGATION_SETTINGS
+from .shapes import SHAPES, geometry
+
+from collections import OrderedDict, deque
+import heapq
+
+WALK = 0
+DROP = 1
+JUMP = 2
+
+
+class NavGraph:
+    """Where a walker can stand in a hash tilemap and how it can get from one spot to the next.
+
+    Nodes are grid cells: an open cell with a full tile under it, or a slope cell, with headroom above. Every node
+    has a list of (node, kind, cost) links: WALK to the next cell along the ground (stepping a row up or down on
+    slopes), DROP off a ledge into the first node below, and JUMP up to jump_height rows and across up to
+    jump_distance columns where the arc is clear. Call update_around() when a tile is added or removed."""
+    def __init__(self, hash_tilemap, tile_size, jump_height=None, jump_distance=None, max_drop=None, build=True):
+        self.hash_tilemap = hash_tilemap
+        self.tile_size = tile_size
+        self.jump_height = jump_height or NAVIGATION_SETTINGS["jump_height"]
+        self.jump_distance = jump_distance or NAVIGATION_SETTINGS["jump_distance"]
+        self.max_drop = max_drop or NAVIGATION_SETTINGS["max_drop"]
+        self.links = {}
+        if build:
+            self.build()
+
+    def is_solid(self, cell):
+        tile = self.hash_tilemap.get(cell)
+        return tile is not None and SHAPES[tile.shape_type].full
+
+    def is_slope(self, cell):
+        """Whether the cell has a tile that isn't a full block, like a slope or a platform, to stand in."""
+        tile = self.hash_tilemap.get(cell)
+        return tile is not None and not SHAPES[tile.shape_type].full
+
+    def is_node(self, cell):
+        x, y = cell
+        if self.is_solid(cell) or self.is_solid((x, y-1)):
+            return False
+        return self.is_slope(cell) or self.is_solid((x, y+1))
+
+    def build(self):
+        for _ in self.build_steps():
+            pass
+
+    def build_steps(self, chunk=512):
+        """build() that yields every chunk nodes, so it can be spread over frames."""
+        self.links = {}
+        for index, (x, y) in enumerate(self.hash_tilemap):
+            for cell in ((x, y-1), (x, y)):
+                if not cell in self.links and self.is_node(cell):
+                    self.links[cell] = []
+            if index % chunk == chunk-1:
+                yield
+        for index, node in enumerate(self.links):
+            self.links[node] = self.find_links(node)
+            if index % chunk == chunk-1:
+                yield
+
+    def find_links(self, node):
+        x, y = node
+        links = []
+        for direction in (-1, 1):
+            walked = False
+            for dy in (0, -1, 1):
+                other = (x+direction, y+dy)
+                if other in self.links and (dy == 0 or self.is_slope(node) or self.is_slope(other)):
+                    links.append((other, WALK, 1))
+                    walked = True
+                    break
+
+            if not walked and not self.is_solid((x+direction, y)):
+                for drop_y in range(y+1, y+self.max_drop+1):
+                    other = (x+direction, drop_y)
+                    if other in self.links:
+                        links.append((other, DROP, 1 + (drop_y-y)*0.5))
+                        break
+                    if self.is_solid(other):
+                        break
+
+            for distance in range(1, self.jump_distance+1):
+                for height in range(0, self.jump_height+1):
+                    if distance == 1 and height <= 1 and walked:
+                        continue
+                    other = (x+direction*distance, y-height)
+                    if other in self.links and self.jump_clear(node, direction, distance, height):
+                        links.append((other, JUMP, distance + height*1.5 + 1))
+        return links
+
+    def jump_clear(self, node, direction, distance, height):
+        """Whether the column above node up to the arc's top row, and that row out to the target, are open."""
+        x, y = node
+        top = y - height - 1
+        for row in range(top, y):
+            if self.is_solid((x, row)):
+                return False
+        for column in range(1, distance+1):
+            if self.is_solid((x+direction*column, top)):
+                return False
+        return True
+
+    def update_around(self, grid_pos):
+        """Rebuilds nodes and links that a tile change at grid_pos could affect. Returns the cells whose links
+        changed, including nodes that no longer exist."""
+        gx, gy = grid_pos
+        reach_x = self.jump_distance + 1
+        cells = [(x, y) for x in range(gx-reach_x, gx+reach_x+1)
+                 for y in range(gy-self.jump_height-2, gy+self.max_drop+2)]
+        changed = set()
+        for cell in cells:
+            if self.is_node(cell):
+                if not cell in self.links:
+                    self.links[cell] = []
+                    changed.add(cell)
+            elif cell in self.links:
+                del self.links[cell]
+                changed.add(cell)
+        for cell in cells:
+            if cell in self.links:
+                links = self.find_links(cell)
+                if links != self.links[cell]:
+                    self.links[cell] = links
+                    changed.add(cell)
+        return changed
+
+    def node_at(self, point, search_down=4):
+        """The node a point (usually a walker's feet) is standing in, or the first one below it when in the air."""
+        x = int(point[0]//self.tile_size)
+        y = int(point[1]//self.tile_size)
+        for row in range(y, y+search_down+1):
+            if (x, row) in self.links:
+                return (x, row)
+            if self.is_solid((x, row)):
+                return None
+        return None
+
+    def standing_point(self, node):
+        """World position of the bottom center of a walker standing on node."""
+        x, y = node
+        bottom = (y+1) * self.tile_size
+        if self.is_slope(node):
+            tile = self.hash_tilemap[node]
+            bottom -= geometry(tile.surface, tile.shape_type, tile.size).floor_height(self.tile_size//2)
+        return (x*self.tile_size + self.tile_size//2, bottom)
+
+    def walk_span(self, node, max_cells):
+        """Leftmost and rightmost cells reachable from node by walking on flat ground, up to max_cells each way."""
+        span = [node[0], node[0]]
+        for index, direction in ((0, -1), (1, 1)):
+            current = node
+            for _ in range(max_cells):
+                step = (current[0]+direction, current[1])
+                if not any(other == step and kind == WALK for other, kind, _ in self.links.get(current, ())):
+                    break
+                if self.is_slope(step):
+                    break
+                current = step
+            span[index] = current[0]
+        return span
+
+
+class PathRequest:
+    def __init__(self, start, goal):
+        self.start = start
+        self.goal = goal
+        self.done = False
+        self.path = None  # List of (node, kind) once done, None if the goal can't be reached
+
+
+class _Search:
+    """A* over a NavGraph that can be paused after any number of expansions."""
+    def __init__(self, graph, request, max_expansions):
+        self.graph = graph
+        self.request = request
+        self.max_expansions = max_expansions
+        self.expansions = 0
+        self.open = [(0, 0, request.start)]
+        self.came_from = {request.start: None}
+        self.cost = {request.start: 0}
+        self.closed = set()
+        self.counter = 0  # Tie breaker so the heap never compares nodes
+
+    def heuristic(self, node):
+        goal = self.request.goal
+        # No link costs less than the columns it crosses or half the rows it drops
+        return max(abs(goal[0]-node[0]), abs(goal[1]-node[1])*0.5)
+
+    def step(self, budget):
+        """Expands up to budget nodes. Returns how many were used, and finishes the request when the search ends."""
+        used = 0
+        links = self.graph.links
+        goal = self.request.goal
+        while used < budget:
+            if not self.open or self.expansions >= self.max_expansions:
+                self.finish(None)
+                return used
+            _, _, node = heapq.heappop(self.open)
+            if node in self.closed:
+                continue
+            if node == goal:
+                self.finish(node)
+                return used
+            self.closed.add(node)
+            used += 1
+            self.expansions += 1
+            for other, kind, link_cost in links.get(node, ()):
+                cost = self.cost[node] + link_cost
+                if cost < self.cost.get(other, float("inf")):
+                    self.cost[other] = cost
+                    self.came_from[other] = (node, kind)
+                    self.counter += 1
+                    heapq.heappush(self.open, (cost + self.heuristic(other), self.counter, other))
+        return used
+
+    def finish(self, goal):
+        path = None
+        if goal is not None:
+            path = []
+            node = goal
+            while node is not None:
+                previous = self.came_from[node]
+                if previous is None:
+                    path.append((node, None))
+                    node = None
+                else:
+                    # Each entry has the kind of link that leads into its node
+                    path.append((node, previous[1]))
+                    node = previous[0]
+            path.reverse()
+        self.request.path = path
+        self.request.done = True
+
+
+class Pathfinder:
+    """Answers path requests over a NavGraph without ever doing more than expansions_per_tick A* expansions per
+    tick. Requests are queued and searched in order, a search that runs out of budget carries on next tick.
+
+    Finished paths go into an LRU cache keyed by (start, goal), and identical requests share one search, so many
+    walkers chasing the same target mostly cost cache lookups. Paths through cells that change are evicted."""
+    def __init__(self, graph: NavGraph, cache_size=None, expansions_per_tick=None, max_expansions=None):
+        self.graph = graph
+        self.cache_size = cache_size or NAVIGATION_SETTINGS["cache_size"]
+        self.expansions_per_tick = expansions_per_tick or NAVIGATION_SETTINGS["expansions_per_tick"]
+        self.max_expansions = max_expansions or NAVIGATION_SETTINGS["max_expansions"]
+        self.cache = OrderedDict()  # (start, goal) -> finished PathRequest
+        self.paths_through = {}  # node -> keys of cached paths that use it
+        self.pending = {}  # (start, goal) -> PathRequest being searched
+        self.searches = deque()
+        self.hits = 0
+        self.misses = 0
+        self.expansions_last_tick = 0
+
+    def request(self, start, goal):
+        """Returns a PathRequest that is either already done or will be done within a few ticks."""
+        key = (start, goal)
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            self.hits += 1
+            return self.cache[key]
+        if key in self.pending:
+            self.hits += 1
+            return self.pending[key]
+        self.misses += 1
+        request = PathRequest(start, goal)
+        if start is None or goal is None or not start in self.graph.links:
+            request.done = True
+            return request
+        self.pending[key] = request
+        self.searches.append(_Search(self.graph, request, self.max_expansions))
+        return request
+
+    def update(self):
+        budget = self.expansions_per_tick
+        while self.searches and budget > 0:
+            search = self.searches[0]
+            budget -= max(search.step(budget), 1)
+            if search.request.done:
+                self.searches.popleft()
+                self.store(search.request)
+        self.expansions_last_tick = self.expansions_per_tick - budget
+
+    def store(self, request):
+        key = (request.start, request.goal)
+        del self.pending[key]
+        self.cache[key] = request
+        for node, _ in request.path or ((request.start, None), (request.goal, None)):
+            self.paths_through.setdefault(node, set()).add(key)
+        while len(self.cache) > self.cache_size:
+            self.evict(next(iter(self.cache)))
+
+    def evict(self, key):
+        request = self.cache.pop(key, None)
+        if request is None:
+            return
+        for node, _ in request.path or ((request.start, None), (request.goal, None)):
+            keys = self.paths_through.get(node)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.paths_through[node]
+
+    def update_around(self, grid_pos):
+        """Updates the graph after the tile at grid_pos changed and forgets paths that went near it. Failed
+        searches are forgotten too, since the change may have opened a way."""
+        changed = self.graph.update_around(grid_pos)
+        for node in changed:
+            for key in tuple(self.paths_through.get(node, ())):
+                self.evict(key)
+        for key in [key for key, request in self.cache.items() if request.path is None]:
+            self.evict(key)
+        # Searches in progress may have expanded a stale link, so start them over
+        searches = self.searches
+        self.searches = deque(_Search(self.graph, search.request, self.max_expansions) for search in searches)
+
+    def clear(self):
+        self.cache.clear()
+        self.paths_through.clear()
+        self.pending.clear()
+        self.searches.clear()
@@ -0,0 +1,84 @@
+import pygame as pg
+
+from .constants import PALETTE_SETTINGS
+from .utils import split_spritesheet
+from . import hotreload
+from . import memory
+
+from collections import OrderedDict
+from pathlib import Path
+
+
+def index_surfaces(surfaces, owner="palette:indexed"):
+    """8 bit copies of surfaces that share one palette of every color used across them, so a Recolor works the
+    same on all of them. The colorkey is kept. Raises if there are more than 256 colors."""
+    # Pixels as 0xXXBBGGRR ints, which key the palette without building a tuple per pixel
+    pixels = [memoryview(pg.image.tobytes(surface, "RGBX")).cast("I") for surface in surfaces]
+    colors = sorted(set().union(*pixels), key=lambda color: (color & 255, color >> 8 & 255, color >> 16 & 255))
+    if len(colors) > 256:
+        raise Exception(f"Can't index {len(colors)} colors into a 256 color palette")
+    palette = [(color & 255, color >> 8 & 255, color >> 16 & 255) for color in colors]
+    indices = {color: index for index, color in enumerate(colors)}
+
+    indexed = []
+    for surface, data in zip(surfaces, pixels):
+        new = pg.image.frombytes(bytes(map(indices.__getitem__, data)), surface.get_size(), "P")
+        new.set_palette(palette)
+        colorkey = surface.get_colorkey()
+        if colorkey is not None:
+            new.set_colorkey(palette.index(tuple(colorkey[:3])) if tuple(colorkey[:3]) in palette else None)
+        indexed.append(memory.track(new, owner))
+    return indexed
+
+def load_spritesheet(filename: Path, size=16, count: int = -1, owner: str = None):
+    """pgp.load_spritesheet() into indexed surfaces sharing one palette, to be drawn through a Recolor."""
+    owner = owner or f"asset:{Path(filename).as_posix()}"
+    def reconvert(raw):
+        return index_surfaces(split_spritesheet(raw, filename, size, count, owner), owner)
+    surfaces = reconvert(pg.image.load(filename))
+    hotreload.register_load(filename, surfaces, reconvert)
+    return surfaces
+
+
+class Recolor:
+    """Colors to swap when drawing indexed surfaces, like a blink or a team color. Only the swaps are stored, the
+    pixels stay shared with every other recolor of the same surfaces."""
+    def __init__(self, swaps=None):
+        self.swaps = {tuple(old[:3]): tuple(new[:3]) for old, new in (swaps or {}).items()}
+
+    def apply(self, palette):
+        return [self.swaps.get(tuple(color[:3]), color) for color in palette]
+
+
+ORIGINAL = Recolor()  # Draws indexed surfaces in their own colors
+
+# (indexed surface, Recolor) -> display format surface, least recently used first
+_cache = OrderedDict()
+hits = 0
+misses = 0
+
+def resolve(surface: pg.Surface, recolor: Recolor) -> pg.Surface:
+    """The display format surface to blit for an indexed surface drawn with a recolor. The palette is swapped on
+    the shared pixels just long enough to convert them, and the result is cached."""
+    global hits, misses
+    key = (surface, recolor)
+    converted = _cache.get(key)
+    if converted is not None:
+        _cache.move_to_end(key)
+        hits += 1
+        return converted
+    misses += 1
+    palette = surface.get_palette()
+    surface.set_palette(recolor.apply(palette))
+    converted = surface.convert()
+    converted.set_colorkey(surface.get_colorkey())
+    surface.set_palette(palette)
+    _cache[key] = memory.track(converted, "cache:palette")
+    if len(_cache) > PALETTE_SETTINGS["cache_size"]:
+        _cache.popitem(last=False)
+    return converted
+
+def clear_cache(paths=()):
+    _cache.clear()
+
+hotreload.on_reload(clear_cache)
@@ -0,0 +1,353 @@
+import pygame as pg
+
+from .constants import SCALE, TARGET_DT, FIXED_TIMESTEP_SETTINGS, PARTICLE_SETTINGS
+from .utils import world_per_pixel, lerp
+from .sprite import Node
+from .shapes import geometry
+from .prefetch import Prefetch
+from . import memory
+
+np = None  # NumPy, imported in the background by the first ParticleSystem
+
+
+def import_numpy():
+    """NumPy, or None where it isn't available (like the pygbag build), in which case particles are skipped."""
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+class ParticleEffect:
+    """What one kind of particle looks like and how it moves. Units are world units and ticks, angles are in
+    degrees with 90 pointing down.
+
+    colors and sizes are (start, end) pairs that a particle goes through over its life in `steps` steps. Colors can
+    have an alpha to fade out."""
+    def __init__(self, colors=((255, 255, 255), (255, 255, 255, 0)), sizes=(8, 8), lifetime=(20, 40), speed=(2, 6),
+                 angle=(0, 360), spread=0, gravity=0.5, drag=0.0, collide=False, bounce=0.4, steps=8):
+        self.colors = colors
+        self.sizes = sizes
+        self.lifetime = lifetime
+        self.speed = speed
+        self.angle = angle
+        self.spread = spread
+        self.gravity = gravity
+        self.drag = drag
+        self.collide = collide
+        self.bounce = bounce
+        self.steps = steps
+
+
+class ParticleSystem(Node):
+    """Every live particle is a row in a set of preallocated NumPy arrays that are integrated, collided and culled
+    all at once. Live particles are kept packed at the front of the arrays, so dead ones are dropped with one masked
+    copy per tick.
+
+    max_particles, spawn_budget (new particles per tick) and draw_budget (particles drawn per frame) are hard caps, anything
+    over them is dropped and counted instead of slowing the frame down.
+
+    NumPy is imported and the arrays allocated through a Prefetch, so neither holds up starting the game. Anything
+    that needs them sooner finishes that right away. Without NumPy every particle is dropped."""
+    def __init__(self, max_particles=None, spawn_budget=None, draw_budget=None, max_emitters=64, seed=None):
+        self.max_particles = max_particles or PARTICLE_SETTINGS["max_particles"]
+        self.spawn_budget = spawn_budget or PARTICLE_SETTINGS["spawn_budget"]
+        self.draw_budget = draw_budget or PARTICLE_SETTINGS["draw_budget"]
+        self.seed = seed
+        self.max_emitters = max_emitters
+        self.z = None
+        self.count = 0
+        self.emitter_effects = [None] * max_emitters
+
+        # Particles are rasterized into a layer with one pixel per asset pixel, with a pixel of margin all around
+        self.layer = pg.Surface((self.engine.screen_width//SCALE + 3, self.engine.screen_height//SCALE + 3),
+                                pg.SRCALPHA)
+        self.scaled_layer = None
+        if not world_per_pixel() == SCALE:
+            self.scaled_layer = pg.Surface([side*SCALE for side in self.layer.get_size()], pg.SRCALPHA)
+            memory.track(self.scaled_layer, "particles:layer")
+        memory.track(self.layer, "particles:layer")
+        self.dirty = None  # The part of the layer drawn into last frame, cleared before the next one
+
+        self.walls = None
+        self.grid = None
+        self.grid_origin = (0, 0)
+        self.tile_size = 0
+
+        self.spawned_this_tick = 0
+        self.dropped_count = 0
+        self.drawn_count = 0
+
+        self.enabled = False  # Set once the arrays are allocated
+        self.setup = Prefetch(load=import_numpy, build=self.allocate)
+
+    def allocate(self, numpy):
+        global np
+        if numpy is None:
+            return
+        np = numpy
+        self.rng = np.random.default_rng(self.seed)
+        capacity = self.max_particles
+        self.pos = np.zeros((capacity, 2), np.float32)
+        self.old_pos = np.zeros((capacity, 2), np.float32)
+        self.vel = np.zeros((capacity, 2), np.float32)
+        self.age = np.zeros(capacity, np.float32)
+        self.lifetime = np.ones(capacity, np.float32)
+        self.gravity = np.zeros(capacity, np.float32)
+        self.drag = np.zeros(capacity, np.float32)
+        self.bounce = np.zeros(capacity, np.float32)
+        self.collide = np.zeros(capacity, bool)
+        # Color and size come from the effect's ramp: ramp_colors[ramp_base + step] and ramp_sizes[...]
+        self.ramp_base = np.zeros(capacity, np.int32)
+        self.steps = np.ones(capacity, np.float32)
+        self.arrays = (self.pos, self.old_pos, self.vel, self.age, self.lifetime, self.gravity, self.drag,
+                       self.bounce, self.collide, self.ramp_base, self.steps)
+
+        self.emitter_pos = np.zeros((self.max_emitters, 2), np.float32)
+        self.emitter_rate = np.zeros(self.max_emitters, np.float32)
+        self.emitter_accumulator = np.zeros(self.max_emitters, np.float32)
+
+        self.ramp_bases = {}  # ParticleEffect -> index of its first step in the ramp arrays
+        self.ramp_colors = np.empty(0, np.uint32)
+        self.ramp_sizes = np.empty(0, np.int32)
+        self.enabled = True
+        yield 0.5
+        if self.walls is not None:
+            self.set_collision_walls(self.walls)
+
+    def ready(self):
+        """Whether particles can be spawned, finishing the setup first if it's still going."""
+        if not self.setup.done:
+            self.setup.finish()
+        return self.enabled
+
+    def ramp(self, effect: ParticleEffect):
+        if effect in self.ramp_bases:
+            return self.ramp_bases[effect]
+        base = len(self.ramp_colors)
+        start_color, end_color = (tuple(color) + (255,)*(4-len(color)) for color in effect.colors)
+        colors = []
+        sizes = []
+        for step in range(effect.steps):
+            alpha = step/(effect.steps-1) if effect.steps > 1 else 0
+            color = [round(lerp(start, end, alpha)) for start, end in zip(start_color, end_color)]
+            colors.append(self.layer.map_rgb(color) & 0xFFFFFFFF)  # map_rgb can come back signed
+            sizes.append(max(1, round(lerp(*effect.sizes, alpha)/SCALE)))
+        self.ramp_colors = np.append(self.ramp_colors, np.array(colors, np.uint32))
+        self.ramp_sizes = np.append(self.ramp_sizes, np.array(sizes, np.int32))
+        self.ramp_bases[effect] = base
+        return base
+
+    def burst(self, effect: ParticleEffect, pos, count, velocity=(0, 0)):
+        """Spawns up to count particles at pos. Returns how many were actually spawned."""
+        if not self.ready():
+            self.dropped_count += count
+            return 0
+        allowed = min(count, self.max_particles - self.count, self.spawn_budget - self.spawned_this_tick)
+        if allowed < count:
+            self.dropped_count += count - max(allowed, 0)
+        if allowed <= 0:
+            return 0
+        rng = self.rng
+        new = slice(self.count, self.count + allowed)
+
+        angles = np.radians(rng.uniform(*effect.angle, allowed))
+        speeds = rng.uniform(*effect.speed, allowed)
+        self.vel[new, 0] = np.cos(angles)*speeds + velocity[0]
+        self.vel[new, 1] = np.sin(angles)*speeds + velocity[1]
+        self.pos[new] = pos
+        if effect.spread:
+            self.pos[new] += rng.uniform(-effect.spread, effect.spread, (allowed, 2))
+        self.old_pos[new] = self.pos[new]
+        self.age[new] = 0
+        self.lifetime[new] = rng.integers(effect.lifetime[0], effect.lifetime[1], allowed, endpoint=True)
+        self.gravity[new] = effect.gravity
+        self.drag[new] = effect.drag
+        self.bounce[new] = effect.bounce
+        self.collide[new] = effect.collide and self.grid is not None
+        self.ramp_base[new] = self.ramp(effect)
+        self.steps[new] = effect.steps
+
+        self.count += allowed
+        self.spawned_this_tick += allowed
+        return allowed
+
+    def add_emitter(self, effect: ParticleEffect, pos, rate):
+        """Emits rate particles per tick (fractions carry over) until removed. Returns the emitter's index, or None
+        without NumPy."""
+        if not self.ready():
+            return None
+        for index, other in enumerate(self.emitter_effects):
+            if other is None:
+                self.emitter_effects[index] = effect
+                self.emitter_pos[index] = pos
+                self.emitter_rate[index] = rate
+                self.emitter_accumulator[index] = 0
+                return index
+        raise Exception("Too many particle emitters")
+
+    def move_emitter(self, index, pos):
+        if index is not None:
+            self.emitter_pos[index] = pos
+
+    def remove_emitter(self, index):
+        if index is None:
+            return
+        self.emitter_effects[index] = None
+        self.emitter_rate[index] = 0
+
+    def clear(self):
+        self.count = 0
+        self.emitter_effects = [None] * self.max_emitters
+        if self.enabled:
+            self.emitter_rate[:] = 0
+
+    def set_collision_walls(self, walls):
+        """Builds a grid of tile shapes from a SpriteList's hash tilemap for particles with collide set. Call it
+        again if the walls change. If the setup is still going the grid is built once it's done."""
+        if walls.hash_tilemap is None:
+            raise Exception("Hash tilemap has not been loaded yet")
+        self.walls = walls
+        self.tile_size = walls.tile_size
+        if not self.enabled or not walls.hash_tilemap:
+            self.grid = None
+            return
+        cells = np.array(list(walls.hash_tilemap.keys()), np.int64)
+        left, top = cells.min(axis=0)
+        right, bottom = cells.max(axis=0)
+        # An empty border around the map, so lookups outside it can just be clamped onto the border
+        self.grid = np.zeros((bottom-top+3, right-left+3), np.int16)
+        self.grid_origin = (int(left)-1, int(top)-1)
+        # Cells hold an index into floor_heights, the per column floor heights of every distinct tile geometry.
+        # Index 0 is an empty cell with no floor
+        indices = {}
+        floor_heights = [[0] * (self.tile_size+1)]
+        shapes = []
+        size = (self.tile_size, self.tile_size)
+        for tile in walls.hash_tilemap.values():
+            tile_geometry = geometry(tile.surface, tile.shape_type, size)
+            index = indices.get(tile_geometry)
+            if index is None:
+                index = indices[tile_geometry] = len(floor_heights)
+                floor_heights.append(tile_geometry.heights)
+            shapes.append(index)
+        self.floor_heights = np.array(floor_heights, np.float32)
+        self.grid[cells[:, 1]-top+1, cells[:, 0]-left+1] = shapes
+
+    def solid_at(self, x, y):
+        """Vectorized Tile.point_in_tile over the collision grid."""
+        tile_size = self.tile_size
+        cell_x = np.floor_divide(x, tile_size).astype(np.int64)
+        cell_y = np.floor_divide(y, tile_size).astype(np.int64)
+        height, width = self.grid.shape
+        shape = self.grid[np.clip(cell_y - self.grid_origin[1], 0, height-1),
+                          np.clip(cell_x - self.grid_origin[0], 0, width-1)]
+        rel_x = x - cell_x*tile_size
+        rel_y = y - cell_y*tile_size
+        column = np.clip(rel_x.astype(np.int64), 0, tile_size)
+        return rel_y >= tile_size - self.floor_heights[shape, column]
+
+    def update(self):
+        self.spawned_this_tick = 0
+        if not self.setup.step() or not self.enabled:
+            return
+        for index, effect in enumerate(self.emitter_effects):
+            if effect is not None:
+                self.emitter_accumulator[index] += self.emitter_rate[index]
+                count = int(self.emitter_accumulator[index])
+                if count:
+                    self.emitter_accumulator[index] -= count
+                    self.burst(effect, self.emitter_pos[index], count)
+
+        n = self.count
+        if not n:
+            return
+        pos, old_pos, vel = self.pos[:n], self.old_pos[:n], self.vel[:n]
+        old_pos[:] = pos
+        vel[:, 1] += self.gravity[:n]
+        vel *= (1 - self.drag[:n])[:, None]
+        pos += vel
+
+        if self.grid is not None:
+            colliding = np.flatnonzero(self.collide[:n])
+            if len(colliding):
+                self.resolve_collisions(colliding)
+
+        self.age[:n] += 1
+        alive = self.age[:n] < self.lifetime[:n]
+        if not alive.all():
+            live = int(np.count_nonzero(alive))
+            for array in self.arrays:
+                array[:live] = array[:n][alive]
+            self.count = live
+
+    def resolve_collisions(self, indexes):
+        # One axis at a time like the player does: step back on the axis that hit and bounce on it
+        pos, old_pos, vel = self.pos, self.old_pos, self.vel
+        bounce = self.bounce[indexes]
+        hit_x = self.solid_at(pos[indexes, 0], old_pos[indexes, 1])
+        hit = indexes[hit_x]
+        pos[hit, 0] = old_pos[hit, 0]
+        vel[hit, 0] *= -bounce[hit_x]
+
+        hit_y = self.solid_at(pos[indexes, 0], pos[indexes, 1])
+        hit = indexes[hit_y]
+        pos[hit, 1] = old_pos[hit, 1]
+        vel[hit, 1] *= -bounce[hit_y]
+        vel[hit, 0] *= 0.8  # Friction, so particles settle on the ground
+
+    def draw(self):
+        """Rasterizes every visible particle into the layer with a few array writes per particle size, then pushes
+        the part of the layer around them to the render queue as a single blit. Only that part is cleared, scaled
+        and blitted, so a few particles cost a few pixels rather than the whole screen. Particles snap to asset
+        pixels like everything else."""
+        n = self.count
+        self.drawn_count = 0
+        if not n:
+            return
+        pos = self.pos[:n]
+        if FIXED_TIMESTEP_SETTINGS["interpolate"]:
+            alpha = self.engine.accumulator/TARGET_DT
+            old_pos = self.old_pos[:n]
+            pos = old_pos + (pos - old_pos)*alpha
+
+        step = np.minimum(self.age[:n]/self.lifetime[:n]*self.steps[:n], self.steps[:n]-1).astype(np.int32)
+        keys = self.ramp_base[:n] + step
+        sizes = self.ramp_sizes[keys]
+        cam_x, cam_y = self.engine.camera_position
+        origin_x = int(cam_x//SCALE) - 1
+        origin_y = int(cam_y//SCALE) - 1
+        x = (pos[:, 0]//SCALE).astype(np.int32) - origin_x - sizes//2
+        y = (pos[:, 1]//SCALE).astype(np.int32) - origin_y - sizes//2
+
+        width, height = self.layer.get_size()
+        visible = np.flatnonzero((x > -sizes) & (x < width) & (y > -sizes) & (y < height))[:self.draw_budget]
+        if not len(visible):
+            return
+        x, y, sizes, colors = x[visible], y[visible], sizes[visible], self.ramp_colors[keys[visible]]
+        area = pg.Rect(int(x.min()), int(y.min()), 0, 0)
+        area.size = (int((x + sizes).max()) - area.x, int((y + sizes).max()) - area.y)
+        area = area.clip(self.layer.get_rect())
+
+        if self.dirty is not None:
+            self.layer.fill((0, 0, 0, 0), self.dirty)
+        self.dirty = area
+        pixels = pg.surfarray.pixels2d(self.layer)
+        for offset_y in range(int(sizes.max())):
+            for offset_x in range(int(sizes.max())):
+                covered = sizes > max(offset_x, offset_y)
+                # Pixels hanging off the layer get clamped onto its margin, which is never on screen
+                pixels[np.clip(x[covered] + offset_x, 0, width-1),
+                       np.clip(y[covered] + offset_y, 0, height-1)] = colors[covered]
+        del pixels  # Unlocks the layer
+
+        layer = self.layer.subsurface(area)
+        pixel_size = world_per_pixel()
+        dest = (round(((origin_x + area.x)*SCALE - cam_x)/pixel_size),
+                round(((origin_y + area.y)*SCALE - cam_y)/pixel_size))
+        if self.scaled_layer is not None:
+            scaled = self.scaled_layer.subsurface((0, 0, area.width*SCALE, area.height*SCALE))
+            layer = pg.transform.scale(layer, scaled.get_size(), scaled)
+        self.engine.render_queue.push(layer, dest, self.z)
+        self.drawn_count = len(visible)
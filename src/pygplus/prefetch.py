@@ -0,0 +1,124 @@
+from .constants import PREFETCH_SETTINGS
+
+import sys
+import threading
+import time
+
+_loads_running = 0  # Prefetches whose load() hasn't been picked up yet, they share one lowered switch interval
+_old_switch_interval = None
+
+
+def _lower_switch_interval():
+    # The worker holds the GIL for up to the switch interval at a time, keep that short while loads run
+    global _loads_running, _old_switch_interval
+    if not _loads_running:
+        _old_switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(min(_old_switch_interval, PREFETCH_SETTINGS["switch_interval"]))
+    _loads_running += 1
+
+def _restore_switch_interval():
+    global _loads_running
+    _loads_running -= 1
+    if not _loads_running:
+        sys.setswitchinterval(_old_switch_interval)
+
+
+def exhaust(steps):
+    """Runs a step generator to the end right away and returns its result."""
+    while True:
+        try:
+            next(steps)
+        except StopIteration as stop:
+            return stop.value
+
+
+class Prefetch:
+    """Prepares something in the background without ever stalling a frame for long.
+
+    load() runs on a worker thread and should do everything that doesn't touch the display, like reading and
+    parsing files. build(loaded) is a generator that runs on the main thread for whatever has to happen there, like
+    converting surfaces. It yields its progress from 0 to 1 between small steps and returns the result. Call step()
+    once per frame, it works on the build for at most budget seconds.
+
+    Where threads aren't available (like in the browser), load() runs inside the first step() instead."""
+    def __init__(self, load, build, budget=None):
+        self.load = load
+        self.build = build
+        self.budget = budget or PREFETCH_SETTINGS["budget"]
+        self.loaded = None
+        self.error = None
+        self.steps = None
+        self.progress = 0  # Of the main thread part, the worker's part doesn't report any
+        self.result = None
+        self.done = False
+        self.cancelled = False
+
+        _lower_switch_interval()
+        self.thread = threading.Thread(target=self.run_load, daemon=True)
+        try:
+            self.thread.start()
+        except RuntimeError:
+            self.thread = None
+
+    def run_load(self):
+        try:
+            self.loaded = self.load()
+        except Exception as error:
+            self.error = error
+
+    @property
+    def loading(self):
+        return self.steps is None and not (self.done or self.cancelled)
+
+    def start_build(self):
+        if self.thread is None:
+            self.run_load()
+        _restore_switch_interval()
+        if self.error is not None:
+            raise self.error
+        self.steps = self.build(self.loaded)
+        self.loaded = None
+
+    def step(self, budget=None):
+        """Works on the build for up to budget seconds. Returns whether the result is ready."""
+        if self.done or self.cancelled:
+            return self.done
+        if self.steps is None:
+            if self.thread is not None and self.thread.is_alive():
+                return False
+            self.start_build()
+        deadline = time.perf_counter() + (self.budget if budget is None else budget)
+        while True:
+            try:
+                self.progress = next(self.steps)
+            except StopIteration as stop:
+                self.result = stop.value
+                self.progress = 1
+                self.done = True
+                break
+            if time.perf_counter() >= deadline:
+                break
+        return self.done
+
+    def finish(self):
+        """Returns the result, doing whatever is left of the work right now if it isn't ready yet."""
+        if self.cancelled:
+            raise Exception("Prefetch was cancelled")
+        if self.thread is not None:
+            self.thread.join()
+        while not self.step(budget=float("inf")):
+            pass
+        return self.result
+
+    def cancel(self):
+        """Stops the build and drops whatever was prepared. A load already running on the worker can't be
+        interrupted, its result is just thrown away."""
+        if self.done or self.cancelled:
+            return
+        self.cancelled = True
+        if self.steps is not None:
+            self.steps.close()
+        else:
+            _restore_switch_interval()
+        self.steps = None
+        self.loaded = None
@@ -0,0 +1,104 @@
+from pathlib import Path
+import cProfile
+import io
+import json
+import pstats
+import time
+
+
+class _NullSection:
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *args):
+        pass
+
+NULL_SECTION = _NullSection()
+
+
+class _Section:
+    def __init__(self, capture, name):
+        self.capture = capture
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *args):
+        sections = self.capture.frame_sections
+        sections[self.name] = sections.get(self.name, 0) + time.perf_counter() - self.start
+
+
+class ProfileCapture:
+    """Runs cProfile over the next N frames without restarting the game, then writes a .pstats file and a text
+    summary with the top functions and the timing breakdown of the slowest frame.
+
+    The engine calls begin_frame() and end_frame() around every frame. Game code can wrap work in
+    section(name) to get it into the per-frame breakdown; outside of a capture that costs next to nothing."""
+    def __init__(self, folder: Path = Path("."), top=30):
+        self.folder = Path(folder)
+        self.top = top
+        self.active = False
+        self.requested_frames = 0
+        self.frames_total = 0
+        self.frames_left = 0
+        self.profiler = None
+        self.frame_sections = {}
+        self.slowest_frame = None
+        self.last_files = None
+
+    def start(self, frames=120):
+        """Starts capturing from the next frame. Does nothing if a capture is already running."""
+        if self.active or self.requested_frames:
+            return
+        self.requested_frames = frames
+
+    def section(self, name):
+        if not self.active:
+            return NULL_SECTION
+        return _Section(self, name)
+
+    def begin_frame(self):
+        if self.requested_frames:
+            self.frames_total = self.frames_left = self.requested_frames
+            self.requested_frames = 0
+            self.slowest_frame = None
+            self.active = True
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        if self.active:
+            self.frame_sections = {}
+            self.frame_start = time.perf_counter()
+
+    def end_frame(self):
+        if not self.active:
+            return
+        frame_time = time.perf_counter() - self.frame_start
+        if self.slowest_frame is None or frame_time > self.slowest_frame["frame_ms"]/1000:
+            self.slowest_frame = {
+                "frame_index": self.frames_total - self.frames_left,
+                "frame_ms": frame_time*1000,
+                "sections_ms": {name: seconds*1000 for name, seconds in self.frame_sections.items()}
+            }
+        self.frames_left -= 1
+        if self.frames_left <= 0:
+            self.stop()
+
+    def stop(self):
+        self.profiler.disable()
+        self.active = False
+
+        name = f"profile_{time.strftime('%Y%m%d_%H%M%S')}"
+        pstats_path = self.folder / f"{name}.pstats"
+        summary_path = self.folder / f"{name}.txt"
+        self.profiler.dump_stats(pstats_path)
+
+        stream = io.StringIO()
+        stats = pstats.Stats(self.profiler, stream=stream)
+        stats.sort_stats(pstats.SortKey.TIME).print_stats(self.top)
+        with open(summary_path, "w") as file:
+            file.write(f"Slowest frame:\n{json.dumps(self.slowest_frame, indent=4)}\n\n")
+            file.write(stream.getvalue())
+
+        self.profiler = None
+        self.last_files = (pstats_path, summary_path)
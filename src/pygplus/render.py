@@ -0,0 +1,32 @@
+import pygame as pg
+
+from operator import itemgetter
+
+
+class RenderQueue:
+    """Collects blits during a frame and submits them to the target in one call, sorted by z.
+
+    Sprites push with their own z if they have one, otherwise with current_z, which a SpriteList sets to its own z
+    before drawing its sprites. The sort is stable, so commands with the same z keep the order they were pushed in."""
+    def __init__(self, target: pg.Surface):
+        self.target = target
+        self.commands = []
+        self.current_z = 0
+        self.command_count = 0  # Commands submitted by the last flush
+        self.use_fblits = hasattr(pg.Surface, "fblits")
+
+    def push(self, surface, dest, z=None):
+        self.commands.append((self.current_z if z is None else z, surface, dest))
+
+    def flush(self):
+        commands = self.commands
+        self.command_count = len(commands)
+        if not commands:
+            return
+        commands.sort(key=itemgetter(0))
+        sequence = [(surface, dest) for _, surface, dest in commands]
+        if self.use_fblits:
+            self.target.fblits(sequence)
+        else:
+            self.target.blits(sequence, doreturn=False)
+        commands.clear()
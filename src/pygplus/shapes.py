@@ -0,0 +1,128 @@
+import pygame as pg
+
+from . import hotreload
+
+import weakref
+
+
+class Shape:
+    """How much of a tile is solid, as data. left and right are the heights of the floor at the tile's two edges, as
+    fractions of the tile's height, with a straight line in between. A one_way shape only stops things landing on
+    it from above. A from_surface shape takes its floor from the tile image's opaque pixels instead."""
+    def __init__(self, left=1, right=1, one_way=False, from_surface=False):
+        self.left = left
+        self.right = right
+        self.one_way = one_way
+        self.from_surface = from_surface
+
+    @property
+    def full(self):
+        return self.left == self.right == 1 and not self.one_way and not self.from_surface
+
+
+# shape_type property -> Shape. None is a plain solid block
+SHAPES = {}
+# Surface -> {(shape_type, width, height): TileGeometry}. Only from_surface shapes differ between surfaces, the
+# others are shared through _shared
+_geometries = weakref.WeakKeyDictionary()
+_shared = {}
+
+def register_shape(shape_type, shape: Shape):
+    SHAPES[shape_type] = shape
+    _geometries.clear()
+    _shared.clear()
+
+
+register_shape(None, Shape())
+register_shape("slope1", Shape(0, 1))
+register_shape("slope2", Shape(1, 0))
+register_shape("half_slope1_low", Shape(0, 0.5))
+register_shape("half_slope1_high", Shape(0.5, 1))
+register_shape("half_slope2_high", Shape(1, 0.5))
+register_shape("half_slope2_low", Shape(0.5, 0))
+register_shape("platform", Shape(one_way=True))
+register_shape("mask", Shape(from_surface=True))
+
+
+class TileGeometry:
+    """A shape type's collision data for one tile size, computed once. heights has the floor's height above the tile's
+    bottom at every whole x from 0 to width, span_heights[a][b] the highest of heights[a:b+1], and mask the solid
+    pixels, so every query is a lookup."""
+    def __init__(self, shape_type, size, surface: pg.Surface = None):
+        self.shape_type = shape_type
+        self.shape = shape = SHAPES[shape_type]
+        self.full = shape.full
+        self.one_way = shape.one_way
+        self.from_surface = shape.from_surface
+        self.width, self.height = width, height = round(size[0]), round(size[1])
+        if shape.from_surface:
+            surface_mask = pg.mask.from_surface(surface).scale((width, height))
+            columns = []
+            for x in range(width):
+                top = next((y for y in range(height) if surface_mask.get_at((x, y))), height)
+                columns.append(height - top)
+            # An edge between two columns is as high as the higher of them
+            self.heights = [max(columns[max(x-1, 0)], columns[min(x, width-1)]) for x in range(width+1)]
+        else:
+            self.heights = [(shape.left + (shape.right-shape.left)*x/width) * height for x in range(width+1)]
+
+        self.span_heights = []
+        for start in range(width+1):
+            row = [0] * (width+1)
+            highest = 0
+            for end in range(start, width+1):
+                highest = max(highest, self.heights[end])
+                row[end] = highest
+            self.span_heights.append(row)
+
+        self.mask = pg.mask.Mask((width, height))
+        for x in range(width):
+            # A pixel is solid if its center is under the floor
+            column_height = round((self.heights[x] + self.heights[x+1]) / 2)
+            if column_height > 0:
+                self.mask.draw(pg.mask.Mask((1, column_height), fill=True), (x, height-column_height))
+
+    def contains(self, x, y):
+        """Whether a point relative to the tile's topleft is solid."""
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return self.mask.get_at((int(x), int(y))) == 1
+        return False
+
+    def floor_height(self, x):
+        """The floor's height above the bottom at x relative to the tile's left, clamped to the tile."""
+        return self.heights[min(max(int(x), 0), self.width)]
+
+    def floor_under(self, left, right):
+        """The highest the floor gets between left and right relative to the tile's left, for standing a rect on it.
+        0 if they don't overlap the tile."""
+        width = self.width
+        if right < 0 or left > width:
+            return 0
+        start = int(left) if left > 0 else 0
+        end = -int(-right) if right < width else width
+        return self.span_heights[start][end]
+
+
+def geometry(surface: pg.Surface, shape_type, size) -> TileGeometry:
+    key = (shape_type, size[0], size[1])
+    cached = _geometries.get(surface) if surface is not None else None
+    if cached is not None and key in cached:
+        return cached[key]
+    shape = SHAPES.get(shape_type)
+    if shape is None:
+        raise Exception(f"Unknown shape type {shape_type!r}")
+    if shape.from_surface:
+        result = TileGeometry(shape_type, size, surface)
+    else:
+        result = _shared.get(key)
+        if result is None:
+            result = _shared[key] = TileGeometry(shape_type, size)
+    if surface is not None:
+        _geometries.setdefault(surface, {})[key] = result
+    return result
+
+def _forget_surfaces(paths):
+    # Reloaded images can have different opaque pixels
+    _geometries.clear()
+
+hotreload.on_reload(_forget_surfaces)
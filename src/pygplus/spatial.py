@@ -0,0 +1,61 @@
+import pygame as pg
+
+
+class SpatialHash:
+    """Uniform grid that buckets objects by the cells their rect overlaps. Good enough for anything that moves a
+    few pixels per tick, since objects are only re-bucketed when they actually cross a cell boundary."""
+    def __init__(self, cell_size=256):
+        self.cell_size = cell_size
+        self.cells = {}
+        self.object_cells = {}
+
+    def cell_range(self, rect: pg.Rect):
+        cs = self.cell_size
+        return rect.left//cs, rect.top//cs, (rect.right-1)//cs, (rect.bottom-1)//cs
+
+    def insert(self, obj, rect: pg.Rect):
+        cell_range = self.cell_range(rect)
+        self.object_cells[obj] = cell_range
+        left, top, right, bottom = cell_range
+        for x in range(left, right+1):
+            for y in range(top, bottom+1):
+                self.cells.setdefault((x,y), []).append(obj)
+
+    def remove(self, obj):
+        cell_range = self.object_cells.pop(obj, None)
+        if cell_range is None:
+            return
+        left, top, right, bottom = cell_range
+        for x in range(left, right+1):
+            for y in range(top, bottom+1):
+                bucket = self.cells[(x,y)]
+                bucket.remove(obj)
+                if not bucket:
+                    del self.cells[(x,y)]
+
+    def update(self, obj, rect: pg.Rect):
+        if self.object_cells.get(obj) == self.cell_range(rect):
+            return
+        self.remove(obj)
+        self.insert(obj, rect)
+
+    def clear(self):
+        self.cells.clear()
+        self.object_cells.clear()
+
+    def query(self, rect: pg.Rect):
+        """Every object in the cells overlapping rect, without duplicates. Callers still do the exact test."""
+        left, top, right, bottom = self.cell_range(rect)
+        found = {}
+        for x in range(left, right+1):
+            for y in range(top, bottom+1):
+                if (x,y) in self.cells:
+                    for obj in self.cells[(x,y)]:
+                        found[obj] = None
+        return list(found)
+
+    def __contains__(self, obj):
+        return obj in self.object_cells
+
+    def __len__(self):
+        return len(self.object_cells)
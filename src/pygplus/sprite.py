@@ -2,21 +2,47 @@ import pygame as pg
 import pygplus as pgp
 
 from .constants import *
-from .utils import get_offsets_from_rect, load_spritesheet, lerp
+from .utils import get_offsets_from_rect, load_spritesheet, lerp, world_per_pixel
+from .spatial import SpatialHash
+from .autotile import Autotiler
+from .activity import ActivityScheduler
+from .navigation import NavGraph, Pathfinder
+from .shapes import geometry
+from . import memory
+from . import palette
+from . import hotreload
 
 from typing import List
+from contextlib import contextmanager
 from pathlib import Path
 
 
 def init_nodes(engine):
     Node.engine = engine
 
+_dynamic_classes = {}
+def is_dynamic(sprite_class):
+    """Whether sprites of a class get ticked by default. A class that sets dynamic = False is static, and so are its
+    subclasses, unless they set it back or override update()."""
+    if not sprite_class in _dynamic_classes:
+        declared = next(klass for klass in sprite_class.__mro__ if "dynamic" in klass.__dict__)
+        _dynamic_classes[sprite_class] = declared.dynamic or not sprite_class.update is declared.update
+    return _dynamic_classes[sprite_class]
+
 class Node:
     engine = None
 
 class Sprite(Node):
     _loaded_resources = False
     _rotate_cache = {}
+    update_policy = None  # An activity.UpdatePolicy to let far away sprites be throttled or put to sleep
+    dynamic = True  # Static sprites (see is_dynamic()) aren't ticked by their SpriteLists until activate() is called
+    # See hits.HitDetector. Bit flags of what the sprite is and what it can hit
+    hit_layer = 0
+    hit_mask = 0
+    swept_hits = False
+    palette = None  # A palette.Recolor to draw the sprite's indexed surfaces (see palette.index_surfaces()) with
+    geometry = None  # The shapes.TileGeometry of shape_type for sprites that are collided with, see set_shape()
     def __init__(self, surface: pg.Surface=None):
         self.screen = self.engine.screen
         self.draw_rect_offset = (0,0)
@@ -25,11 +51,13 @@ class Sprite(Node):
         self.movement = pg.Vector2(0,0)
 
         self.opacity = 255
+        self.z = None  # Draw order key, None to use the z of the SpriteList being drawn
         self.angle = 0
         self.scale = 1
 
         self.pos = [0,0]  # Topleft
         self.old_pos = list(self.pos)
+        self.draw_pos = [0,0]  # Reused for the interpolated position every draw
 
         if surface is not None:
             self.surface = surface
@@ -38,18 +66,30 @@ class Sprite(Node):
             self.surface = None
             self.size = [0,0]
 
-        self.spritelists = []
+        self.spritelists = {}  # Used as an ordered set
+        self.active = is_dynamic(self.__class__)
 
         self.use_rotate_cache = False
 
-        if not self.__class__._loaded_resources:
+        # Looked up on the class itself, so a subclass still loads its own resources after its parent did
+        if not self.__class__.__dict__.get("_loaded_resources"):
             self.__class__._loaded_resources = True
             self.load_resources()
 
+    def set_shape(self, shape_type):
+        self.shape_type = shape_type
+        self.update_geometry()
+
+    def update_geometry(self):
+        """Looks the geometry up again. Call it after changing the size, or the surface of a sprite whose shape is
+        taken from it, so collisions never have to check."""
+        self.geometry = geometry(self.surface, self.shape_type, self.size)
+
     def set_size_from_surface(self, surface):
         hitbox_rect = surface.get_bounding_rect()
-        self.size = list(hitbox_rect.size)
-        self.draw_rect_offset = -hitbox_rect.topleft[0], -hitbox_rect.topleft[1]
+        pixel_size = world_per_pixel()
+        self.size = [hitbox_rect.width*pixel_size, hitbox_rect.height*pixel_size]
+        self.draw_rect_offset = -hitbox_rect.topleft[0]*pixel_size, -hitbox_rect.topleft[1]*pixel_size
 
     def load_resources(self):
         pass
@@ -121,140 +161,304 @@ class Sprite(Node):
         return pg.Rect(round(self.pos[0]), round(self.pos[1]), round(self.size[0]), round(self.size[1]))
     
     def draw_rect(self) -> pg.Rect:
-        """The rect of the surface that will be drawn."""
-        rect = self.surface.get_rect()
+        """The rect of the surface that will be drawn, in world units."""
+        width, height = self.surface.get_size()
+        pixel_size = world_per_pixel()
+        rect = pg.Rect(0, 0, width*pixel_size, height*pixel_size)
         rect.topleft = [round(self.pos[0]), round(self.pos[1])]
         rect.x += self.draw_rect_offset[0]
         rect.y += self.draw_rect_offset[1]
         return rect
 
+    def view_bounds(self) -> pg.Rect:
+        """Conservative world-space rect of everything draw() could cover. It spans both interpolation endpoints
+        and any rotation, so it can be tested against the camera before doing any per-sprite draw work."""
+        width, height = self.surface.get_size()
+        width *= world_per_pixel()
+        height *= world_per_pixel()
+        left = min(self.old_pos[0], self.pos[0]) + self.draw_rect_offset[0]
+        top = min(self.old_pos[1], self.pos[1]) + self.draw_rect_offset[1]
+        rect = pg.Rect(left, top, width + abs(self.pos[0]-self.old_pos[0]) + 2,
+                       height + abs(self.pos[1]-self.old_pos[1]) + 2)
+        if not self.angle == 0:
+            # A rotated surface never grows past its diagonal
+            diagonal = (width*width + height*height) ** 0.5
+            rect.inflate_ip(diagonal-width+2, diagonal-height+2)
+        return rect
+
     def on_screen(self, rect):
-        return not (rect.right< 0 or rect.left > self.engine.screen_width or 
-                    rect.bottom < 0 or rect.top > self.engine.screen_height)
+        """Whether a rect in render target pixels overlaps the render target."""
+        return not (rect.right< 0 or rect.left > self.screen.get_width() or 
+                    rect.bottom < 0 or rect.top > self.screen.get_height())
             
     def update(self): 
         self.reset_old_pos()
 
-    def raw_draw(self):
-        draw_rect_to_cam = self.draw_rect()
-        draw_rect_to_cam.topleft = self.engine.rel_to_camera(draw_rect_to_cam.topleft)
+    def catch_up(self, ticks):
+        """Called before an update when the activity scheduler skipped this sprite for some ticks. Override it to
+        roughly account for the missed ticks, by default the sprite just stays frozen while it's skipped."""
+        pass
+
+    def raw_draw(self, pos=None):
+        """Draws the surface with the sprite's topleft at pos (self.pos by default). Works on plain numbers instead
+        of rects and lists so drawing a sprite allocates as little as possible."""
+        if self.opacity == 0:
+            return
+        if pos is None:
+            pos = self.pos
+        cam_x, cam_y = self.engine.camera_position
+        x = int(round(pos[0]) + self.draw_rect_offset[0] - cam_x)
+        y = int(round(pos[1]) + self.draw_rect_offset[1] - cam_y)
+        pixel_size = world_per_pixel()
+        if not pixel_size == 1:
+            # Rendering at low resolution, so go from world units to render target pixels
+            x = round(x/pixel_size)
+            y = round(y/pixel_size)
+        surface = self.surface
+        if self.palette is not None:
+            surface = palette.resolve(surface, self.palette)
+        width, height = surface.get_size()
 
         if not self.angle == 0:
             if self.use_rotate_cache:
                 # Cache the rotated surfaces for faster rotations
                 r_angle = round(self.angle)%360
-                if (info := (self.surface, r_angle)) in self._rotate_cache:
+                if (info := (surface, r_angle)) in self._rotate_cache:
                     surface = self.__class__._rotate_cache[info]
                 else:
-                    surface = pg.transform.rotate(self.surface, r_angle)
+                    surface = pg.transform.rotate(surface, r_angle)
+                    memory.track(surface, f"cache:{self.__class__.__name__} rotate")
                     self.__class__._rotate_cache[info] = surface
             else:
-                surface = pg.transform.rotate(self.surface, self.angle)
-            rect = surface.get_rect()
-            rect.center = draw_rect_to_cam.center
-            pos = rect.topleft
-        else:
-            surface = self.surface
-            rect = draw_rect_to_cam
-            pos = draw_rect_to_cam.topleft
-        if self.opacity == 0:
+                surface = pg.transform.rotate(surface, self.angle)
+            # Keep the rotated surface centered on the unrotated one
+            rotated_width, rotated_height = surface.get_size()
+            x += width//2 - rotated_width//2
+            y += height//2 - rotated_height//2
+            width, height = rotated_width, rotated_height
+
+        screen_width, screen_height = self.screen.get_size()
+        if x+width < 0 or x > screen_width or y+height < 0 or y > screen_height:
             return
-        elif not self.opacity == 255:
+        if not self.opacity == 255:
             surface = surface.copy()
             surface.set_alpha(self.opacity)
-
-        if self.on_screen(rect):
-            self.screen.blit(surface, pos)
+        self.engine.render_queue.push(surface, (x, y), self.z)
 
     def draw(self):
-        alpha = self.engine.accumulator/pgp.TARGET_DT
-        old = self.pos
-        if pgp.FIXED_TIMESTEP_SETTINGS["interpolate"]:
-            self.pos = [
-                lerp(self.old_pos[0], self.pos[0], alpha),
-                lerp(self.old_pos[1], self.pos[1], alpha)
-            ]
-        self.raw_draw()
-        self.pos = old
+        pos = self.pos
+        old_pos = self.old_pos
+        # Sprites that didn't move last tick (most tiles) have nothing to interpolate
+        if pgp.FIXED_TIMESTEP_SETTINGS["interpolate"] and not (pos[0] == old_pos[0] and pos[1] == old_pos[1]):
+            alpha = self.engine.accumulator/pgp.TARGET_DT
+            draw_pos = self.draw_pos
+            draw_pos[0] = lerp(old_pos[0], pos[0], alpha)
+            draw_pos[1] = lerp(old_pos[1], pos[1], alpha)
+            self.raw_draw(draw_pos)
+        else:
+            self.raw_draw(pos)
 
     def kill(self):
-        for spritelist in self.spritelists.copy():
-            spritelist.remove(self)
+        for spritelist in tuple(self.spritelists):
+            if spritelist.has(self):
+                spritelist.remove(self)
+
+    def activate(self):
+        """Has the SpriteLists this sprite is in tick it from now on, even if it's static."""
+        self.active = True
+        for spritelist in self.spritelists:
+            spritelist.activate(self)
+
+    def deactivate(self):
+        """Stops the SpriteLists this sprite is in from ticking it, until activate() is called."""
+        self.active = False
+        self.reset_old_pos()
+        for spritelist in self.spritelists:
+            spritelist.deactivate(self)
 
     def add_spritelist(self, spritelist):
-        self.spritelists.append(spritelist)
+        self.spritelists[spritelist] = None
 
     def remove_spritelist(self, spritelist):
-        self.spritelists.remove(spritelist)
+        del self.spritelists[spritelist]
 
     def reset_old_pos(self):
-        self.old_pos = list(self.pos)
+        self.old_pos[0] = self.pos[0]
+        self.old_pos[1] = self.pos[1]
 
 
-DYNAMIC_TEMPLATE = [
-    "top_left", "top", "top_right", "top_left_right", "slope2",
-    "left", "none", "right", "left_right", "slope2_bottom", 
-    "bottom_left", "bottom", "bottom_right", "bottom_left_right", "slope1",
-    "left_top_bottom", "top_bottom", "right_top_bottom", "top_bottom_left_right", "slope1_bottom"
-]
+def clear_rotate_cache(paths=None):
+    """Rotated surfaces are copies, so they have to go when the surfaces they were made from are reloaded."""
+    Sprite._rotate_cache.clear()
 
-
-loaded_dynamics = False
-def load_dynamic_surfaces():
-    global loaded_dynamics, DYNAMIC_NAME_TO_SURFACES
-    if not loaded_dynamics:
-        loaded_dynamics = True
-        DYNAMIC_NAME_TO_SURFACES = {
-            "grass": load_spritesheet(Path("assets/tiles/grass.png"))
-        }
+hotreload.on_reload(clear_rotate_cache)
 
 
 class SpriteList(Node):
-    def __init__(self):
+    # Lists without a hash tilemap that grow past this many sprites get a spatial index for view culling
+    CULL_INDEX_THRESHOLD = 128
+    CULL_CELL_SIZE = 256
+
+    # Tombstones left by removals in a stable list are compacted once there are this many and they outnumber sprites
+    COMPACT_THRESHOLD = 32
+
+    def __init__(self, stable_order=True):
+        """With stable_order, removals leave a tombstone so iteration keeps insertion order (which is also draw
+        order). Without it, the last sprite is swapped into the hole, which is cheaper but reorders the list."""
         self.tile_size = 16*pgp.SCALE
         self.hash_tilemap = None
-        self.sprites: List[Sprite] = []
+        self.autotiler = None
+        self.navigation = None
+        self.minimap = None
+        self.stable_order = stable_order
+        self.sprites: List[Sprite] = []  # May contain None tombstones, iterate the SpriteList instead
+        self.sprite_indexes = {}
+        self.active_sprites = {}  # Sprites that update() ticks, used as an ordered set
+        self.tombstones = 0
+        self.iterating = 0
+        self.pending = {}  # Sprite -> True to add, False to remove. Flushed once iteration finishes
+        self.z = 0  # Draw order key for the sprites in this list
+        self.scheduler = None
+        self.cull_index = None
+        self.drawn_count = 0
+        self.culled_count = 0
 
     def hash_point(self, point):
         return point[0]//self.tile_size, point[1]//self.tile_size
 
     def load_hash_tilemap(self):
+        for _ in self.load_hash_tilemap_steps():
+            pass
+
+    def load_hash_tilemap_steps(self, chunk=2048):
+        """load_hash_tilemap() in small steps, for building a level over several frames."""
         self.hash_tilemap = {}
-        for tile in self.sprites:
+        for index, tile in enumerate(self):
             grid_pos = self.hash_point(tile.pos)
             self.hash_tilemap[grid_pos] = tile
+            if index % chunk == chunk-1:
+                yield
 
     def append(self, sprite):
         if not isinstance(sprite, Sprite):
             raise TypeError("Argument is not an instance of Sprite")
-        self.sprites.append(sprite)
-        sprite.add_spritelist(self)
+        if self.iterating:
+            self.pending[sprite] = True
+        elif not sprite in self.sprite_indexes:
+            self._insert(sprite)
 
     def remove(self, sprite):
         if not isinstance(sprite, Sprite):
             raise TypeError("Argument is not an instance of Sprite")
-        self.sprites.remove(sprite)
+        if not self.has(sprite):
+            raise ValueError("Sprite is not in this SpriteList")
+        if self.iterating:
+            self.pending[sprite] = False
+        else:
+            self._delete(sprite)
+
+    def _insert(self, sprite):
+        self.sprite_indexes[sprite] = len(self.sprites)
+        self.sprites.append(sprite)
+        sprite.add_spritelist(self)
+        if sprite.active:
+            self.activate(sprite)
+        else:
+            # It won't get the update that would catch old_pos up with wherever it was placed
+            sprite.reset_old_pos()
+        if self.cull_index is not None and sprite.surface is not None:
+            self.cull_index.insert(sprite, sprite.view_bounds())
+
+    def _delete(self, sprite):
+        index = self.sprite_indexes.pop(sprite)
+        if self.stable_order:
+            self.sprites[index] = None
+            self.tombstones += 1
+            if self.tombstones > self.COMPACT_THRESHOLD and self.tombstones > len(self.sprite_indexes):
+                self.compact()
+        else:
+            last = self.sprites.pop()
+            if last is not sprite:
+                self.sprites[index] = last
+                self.sprite_indexes[last] = index
         sprite.remove_spritelist(self)
+        self.deactivate(sprite)
+        if self.cull_index is not None:
+            self.cull_index.remove(sprite)
+
+    def compact(self):
+        self.sprites = [sprite for sprite in self.sprites if sprite is not None]
+        self.sprite_indexes = {sprite: index for index, sprite in enumerate(self.sprites)}
+        self.tombstones = 0
+
+    @contextmanager
+    def deferred(self):
+        """Queues appends and removals made inside the block and applies them once it exits, so sprites can kill
+        themselves or spawn others while the list is being iterated."""
+        self.iterating += 1
+        try:
+            yield self
+        finally:
+            self.iterating -= 1
+            if not self.iterating:
+                self.flush()
+
+    def flush(self):
+        pending = self.pending
+        self.pending = {}
+        for sprite, add in pending.items():
+            if add and not sprite in self.sprite_indexes:
+                self._insert(sprite)
+            elif not add and sprite in self.sprite_indexes:
+                self._delete(sprite)
 
     def empty(self):
-        for sprite in self.sprites.copy():
-            self.sprites.remove(sprite)
+        if self.iterating:
+            for sprite in self.sprite_indexes:
+                self.pending[sprite] = False
+            return
+        for sprite in self.sprite_indexes:
             sprite.remove_spritelist(self)
+        self.sprites = []
+        self.sprite_indexes = {}
+        self.active_sprites = {}
+        self.tombstones = 0
+        if self.scheduler is not None:
+            self.scheduler.clear()
+        if self.cull_index is not None:
+            self.cull_index.clear()
+
+    def activate(self, sprite):
+        """Starts ticking a sprite in this list. Use Sprite.activate() to do it for every list the sprite is in."""
+        if sprite in self.sprite_indexes and not sprite in self.active_sprites:
+            self.active_sprites[sprite] = None
+            if self.scheduler is not None:
+                self.scheduler.add(sprite)
+
+    def deactivate(self, sprite):
+        if sprite in self.active_sprites:
+            del self.active_sprites[sprite]
+            if self.scheduler is not None:
+                self.scheduler.remove(sprite)
 
     def has(self, sprite):
-        return sprite in self.sprites
+        if sprite in self.pending:
+            return self.pending[sprite]
+        return sprite in self.sprite_indexes
     
     def __iter__(self):
-        return iter(self.sprites)
+        for sprite in self.sprites:
+            if sprite is not None:
+                yield sprite
     
     def __contains__(self, sprite):
         return self.has(sprite)
     
     def __bool__(self):
-        return bool(self.sprites)
+        return bool(self.sprite_indexes)
 
     def __len__(self):
-        return len(self.sprites)
+        return len(self.sprite_indexes)
     
     def __repr__(self):
         return f"<{self.__class__.__name__}({len(self)} sprites)>"
@@ -281,58 +485,132 @@ class SpriteList(Node):
             "right": not (grid_pos[0]+1, grid_pos[1]) in self.hash_tilemap
         }
 
+    def view_rect(self) -> pg.Rect:
+        """The camera rect in world units. Inside Engine.draw the camera position is already interpolated."""
+        cam_x, cam_y = self.engine.camera_position
+        return pg.Rect(int(cam_x)-1, int(cam_y)-1, self.engine.screen_width+2, self.engine.screen_height+2)
+
+    def build_cull_index(self):
+        self.cull_index = SpatialHash(self.CULL_CELL_SIZE)
+        for sprite in self:
+            if sprite.surface is not None:
+                self.cull_index.insert(sprite, sprite.view_bounds())
+
+    def update_cull_index(self, sprite):
+        if sprite.surface is None:
+            self.cull_index.remove(sprite)
+        else:
+            self.cull_index.update(sprite, sprite.view_bounds())
+
     def draw(self):
+        self.engine.render_queue.current_z = self.z
         if not self.hash_tilemap is None:
             cam_x, cam_y = self.engine.camera_position
             r_cam_pos = round(cam_x), round(cam_y)
+            drawn = 0
             for x in range(r_cam_pos[0]//self.tile_size, (r_cam_pos[0]+Node.engine.screen_width)//self.tile_size+1):
                 for y in range(r_cam_pos[1]//self.tile_size, (r_cam_pos[1]+Node.engine.screen_height)//
                                self.tile_size+1):
                     grid_pos = x,y
                     if grid_pos in self.hash_tilemap:
                         self.hash_tilemap[grid_pos].draw()
+                        drawn += 1
+            self.drawn_count = drawn
+            self.culled_count = len(self) - drawn
+        else:
+            self.draw_culled()
+
+    def draw_culled(self):
+        """Draws only sprites whose view bounds touch the camera, before any interpolation or transform work is
+        done for them. Large lists are narrowed down with the spatial index first."""
+        view = self.view_rect()
+        if len(self) > self.CULL_INDEX_THRESHOLD:
+            if self.cull_index is None:
+                self.build_cull_index()
+            candidates = self.cull_index.query(view)
         else:
-            for sprite in self.sprites:
+            self.cull_index = None
+            candidates = self
+
+        drawn = 0
+        for sprite in candidates:
+            if sprite.surface is not None and view.colliderect(sprite.view_bounds()):
                 sprite.draw()
+                drawn += 1
+        self.drawn_count = drawn
+        self.culled_count = len(self) - drawn
 
     def set_dynamic_surfaces(self):
+        for _ in self.set_dynamic_surfaces_steps():
+            pass
+
+    def set_dynamic_surfaces_steps(self):
+        """set_dynamic_surfaces() in small steps, for building a level over several frames."""
         if self.hash_tilemap is None:
             raise Exception("Hash tilemap has not been loaded yet")
-        if not loaded_dynamics:
-            load_dynamic_surfaces()
-        for grid_pos, tile in self.hash_tilemap.items():
-            if not "dynamic_type" in tile.properties:
-                continue
-
-            dynamic_type = None
-            if tile.shape_type == "slope1":
-                dynamic_type = "slope1"
-
-            elif tile.shape_type == "slope2":
-                dynamic_type = "slope2"
-            
-            elif (pos := (grid_pos[0], grid_pos[1]-1)) in self.hash_tilemap:
-                if self.hash_tilemap[pos].shape_type == "slope1":
-                    dynamic_type = "slope1_bottom"
-
-                elif self.hash_tilemap[pos].shape_type == "slope2":
-                    dynamic_type = "slope2_bottom"
-
-            if dynamic_type is None:
-                directions = sorted([key for key, value in self.get_surrounding_directions(grid_pos).items() if value])
-                if len(directions) == 0:
-                    dynamic_type = "none"
-                for dynamic_dir in DYNAMIC_TEMPLATE:
-                    if directions == sorted(dynamic_dir.split("_")):
-                        dynamic_type = dynamic_dir
-
-            if dynamic_type is None:
-                raise Exception("Uknown dynamic type")
-            
-            surfaces = DYNAMIC_NAME_TO_SURFACES[tile.properties["dynamic_type"]]
-            tile.surface = surfaces[DYNAMIC_TEMPLATE.index(dynamic_type)]
+        self.autotiler = Autotiler(self.hash_tilemap)
+        yield from self.autotiler.tile_all_steps()
+
+    def add_tile(self, tile):
+        """Adds a tile to a list with a hash tilemap at runtime and re-tiles only the cells around it."""
+        if self.hash_tilemap is None:
+            raise Exception("Hash tilemap has not been loaded yet")
+        grid_pos = self.hash_point(tile.pos)
+        if grid_pos in self.hash_tilemap:
+            self.remove(self.hash_tilemap[grid_pos])
+        self.append(tile)
+        self.hash_tilemap[grid_pos] = tile
+        if self.autotiler is not None:
+            self.autotiler.retile_around(grid_pos)
+        if self.navigation is not None:
+            self.navigation.update_around(grid_pos)
+        if self.minimap is not None:
+            self.minimap.update_cell(grid_pos)
+
+    def remove_tile(self, tile):
+        if self.hash_tilemap is None:
+            raise Exception("Hash tilemap has not been loaded yet")
+        grid_pos = self.hash_point(tile.pos)
+        self.remove(tile)
+        if self.hash_tilemap.get(grid_pos) is tile:
+            del self.hash_tilemap[grid_pos]
+        if self.autotiler is not None:
+            self.autotiler.retile_around(grid_pos)
+        if self.navigation is not None:
+            self.navigation.update_around(grid_pos)
+        if self.minimap is not None:
+            self.minimap.update_cell(grid_pos)
+
+    def load_navigation(self):
+        """Builds a navigation graph of the hash tilemap and a Pathfinder over it, kept up to date by add_tile() and
+        remove_tile()."""
+        for _ in self.load_navigation_steps():
+            pass
+
+    def load_navigation_steps(self):
+        """load_navigation() in small steps, for building a level over several frames."""
+        if self.hash_tilemap is None:
+            raise Exception("Hash tilemap has not been loaded yet")
+        graph = NavGraph(self.hash_tilemap, self.tile_size, build=False)
+        yield from graph.build_steps()
+        self.navigation = Pathfinder(graph)
 
+    def use_activity_scheduler(self):
+        """Updates active sprites with an update_policy based on their distance from the camera from now on."""
+        self.scheduler = ActivityScheduler()
+        for sprite in self.active_sprites:
+            self.scheduler.add(sprite)
 
     def update(self):
-        for sprite in self.sprites:
-            sprite.update()
\ No newline at end of file
+        with self.deferred():
+            if self.scheduler is None:
+                # Static sprites are left out, so a list of walls costs next to nothing per tick
+                updated = tuple(self.active_sprites)
+                for sprite in updated:
+                    sprite.update()
+            else:
+                updated = self.scheduler.update(self.view_rect())
+        if self.cull_index is not None:
+            for sprite in updated:
+                if sprite in self.sprite_indexes:
+                    self.update_cull_index(sprite)
\ No newline at end of file
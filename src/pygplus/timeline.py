@@ -0,0 +1,48 @@
+from contextlib import contextmanager
+import time
+
+
+class Timeline:
+    """Records when startup milestones happen and how long repeated work (like asset loads) adds up to, relative to
+    when pygplus was first imported. Stops recording once finish() is called."""
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.marks = []
+        self.totals = {}
+        self.finished = False
+
+    def mark(self, label):
+        if not self.finished:
+            self.marks.append((label, time.perf_counter() - self.origin))
+
+    @contextmanager
+    def measure(self, category):
+        if self.finished:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.totals[category] = self.totals.get(category, 0) + time.perf_counter() - start
+
+    def finish(self, label="first flip"):
+        self.mark(label)
+        self.finished = True
+
+    @property
+    def elapsed(self):
+        return self.marks[-1][1] if self.marks else 0
+
+    def report(self):
+        lines = ["Startup timeline:"]
+        last = 0
+        for label, at in self.marks:
+            lines.append(f"  {at*1000:8.1f} ms  (+{(at-last)*1000:7.1f} ms)  {label}")
+            last = at
+        for category, total in self.totals.items():
+            lines.append(f"  {category}: {total*1000:.1f} ms total")
+        return "\n".join(lines)
+
+
+startup = Timeline()
@@ -1,17 +1,37 @@
 import pygame as pg
 
-from .constants import SCALE
+from .constants import SCALE, RENDER_SETTINGS
+from . import memory
+from . import hotreload
+from .timeline import startup as startup_timeline
 
 from pathlib import Path
 import time
 
 
 
-def load_image(filename: Path) -> pg.Surface:
-    surface = pg.image.load(filename).convert()
-    surface = pg.transform.scale_by(surface, SCALE)
+def asset_scale():
+    """How much the loaders scale assets up. With low resolution rendering the final upscale does it instead."""
+    return 1 if RENDER_SETTINGS["low_res"] else SCALE
+
+def world_per_pixel():
+    """World units covered by one pixel of a loaded surface."""
+    return SCALE if RENDER_SETTINGS["low_res"] else 1
+
+def load_image(filename: Path, owner: str = None) -> pg.Surface:
+    with startup_timeline.measure("asset loads"):
+        surface = pg.image.load(filename)
+    return convert_image(surface, filename, owner)
+
+def convert_image(surface: pg.Surface, filename: Path, owner: str = None) -> pg.Surface:
+    """The main thread half of load_image(), for a surface that was loaded with pg.image.load() elsewhere."""
+    with startup_timeline.measure("asset loads"):
+        surface = surface.convert()
+    if not asset_scale() == 1:
+        surface = pg.transform.scale_by(surface, asset_scale())
     surface.set_colorkey((0,0,0))
-    return surface
+    hotreload.register_load(filename, [surface], lambda raw: [convert_image(raw, filename, owner)])
+    return memory.track(surface, owner or f"asset:{Path(filename).as_posix()}")
 
 def rotate_surface(surface, angle, pivot, offset):
     raise NotImplementedError
@@ -21,9 +41,17 @@ def rotate_surface(surface, angle, pivot, offset):
     rect = rotated_surface.get_rect(center=pivot+rotated_offset)
     return rotated_surface, rect  # Return the rotated image and shifted rect.
 
-def load_spritesheet(filename: Path, size=16, count: int = -1):
+def load_spritesheet(filename: Path, size=16, count: int = -1, owner: str = None):
+    with startup_timeline.measure("asset loads"):
+        spritesheet = pg.image.load(filename)
+    return split_spritesheet(spritesheet, filename, size, count, owner)
+
+def split_spritesheet(spritesheet: pg.Surface, filename: Path, size=16, count: int = -1, owner: str = None):
+    """The main thread half of load_spritesheet(), for a surface that was loaded with pg.image.load() elsewhere."""
     tile_size = size
-    spritesheet = pg.image.load(filename).convert()
+    owner = owner or f"asset:{Path(filename).as_posix()}"
+    with startup_timeline.measure("asset loads"):
+        spritesheet = spritesheet.convert()
     spritesheet.set_colorkey((0,0,0))
 
     rows = spritesheet.get_height()//tile_size
@@ -35,12 +63,16 @@ def load_spritesheet(filename: Path, size=16, count: int = -1):
         for column in range(columns):
             pos = column*tile_size, row*tile_size
             surface = spritesheet.subsurface(pos, (tile_size, tile_size))
-            surface = pg.transform.scale_by(surface, SCALE)
-            surfaces.append(surface)
+            if asset_scale() == 1:
+                surface = surface.copy()  # Don't keep the whole spritesheet alive through a subsurface
+            else:
+                surface = pg.transform.scale_by(surface, asset_scale())
+            surfaces.append(memory.track(surface, owner))
             i += 1
             if i >= count and not count==-1: break
         if i >= count and not count==-1: break
 
+    hotreload.register_load(filename, surfaces, lambda raw: split_spritesheet(raw, filename, size, count, owner))
     return surfaces
 
 def lerp(num1, num2, alpha):
@@ -57,7 +89,7 @@ def get_offsets_from_rect(rect: pg.Rect, tile_size: int):
             offsets.append((x,y))
     return offsets
 
-def pallete_swap(surface: pg.Surface, old_color, new_color):
+def pallete_swap(surface: pg.Surface, old_color, new_color, owner="transform:pallete_swap"):
     new_surface = pg.Surface(surface.get_size())
     new_surface.fill(new_color)
 
@@ -67,4 +99,5 @@ def pallete_swap(surface: pg.Surface, old_color, new_color):
     new_surface.blit(surface_copy, (0,0))
     new_surface.set_colorkey(old_colorkey)
 
-    return new_surface
\ No newline at end of file
+    hotreload.derive(surface, new_surface, lambda source: pallete_swap(source, old_color, new_color, owner))
+    return memory.track(new_surface, owner)
\ No newline at end of file
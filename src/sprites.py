@@ -5,8 +5,39 @@ from pathlib import Path
 import math
 import random
 
+SHURIKEN_SPARKS = pgp.particles.ParticleEffect(
+    colors=((255, 236, 150), (255, 120, 40, 0)), sizes=(8, 4), lifetime=(10, 22), speed=(3, 9), gravity=0.6,
+    collide=True, bounce=0.5
+)
+COIN_SPARKLE = pgp.particles.ParticleEffect(
+    colors=((255, 230, 90), (255, 255, 220, 0)), sizes=(8, 4), lifetime=(20, 40), speed=(1, 5), gravity=0.05,
+    drag=0.06
+)
+SPRING_DUST = pgp.particles.ParticleEffect(
+    colors=((235, 235, 235), (200, 200, 200, 0)), sizes=(12, 4), lifetime=(15, 30), speed=(2, 6), angle=(200, 340),
+    gravity=0.2, drag=0.05
+)
+LANDING_DUST = pgp.particles.ParticleEffect(
+    colors=((220, 210, 190), (200, 190, 170, 0)), sizes=(12, 4), lifetime=(12, 24), speed=(1, 5), angle=(190, 350),
+    gravity=0.3, drag=0.04, collide=True, bounce=0.2
+)
+ENEMY_POOF = pgp.particles.ParticleEffect(
+    colors=((120, 200, 110), (60, 110, 60, 0)), sizes=(16, 4), lifetime=(20, 35), speed=(2, 7), gravity=0.25,
+    drag=0.05, collide=True, bounce=0.3
+)
+
+# Hit layers, see pgp.hits.HitDetector
+HIT_ENEMY = 1 << 0
+
 # TODO Add interpolation
 class Enemy(pgp.sprite.Sprite):
+    # Keep patrolling coarsely while off screen so enemies aren't frozen in place when the player gets there
+    update_policy = pgp.activity.UpdatePolicy(active_radius=512, throttle_radius=4096, throttle_interval=8)
+    chase_radius = 768
+    chase_speed = 5
+    repath_interval = 30  # Ticks between asking for a fresh path to the player
+    hit_layer = HIT_ENEMY
+
     def __init__(self, boundary_left, boundary_right, surface: pg.Surface=None):
         super().__init__(surface)
 
@@ -21,12 +52,21 @@ class Enemy(pgp.sprite.Sprite):
         )
 
         self.movement[0] = 3
+        self.face_direction = pgp.RIGHT_FACING
         self.boundary_left = boundary_left
         self.boundary_right = boundary_right
+        self.patrol_width = boundary_right - boundary_left
 
         self.walking = random.choice([True, False])
         self.flip_timer = 0
 
+        self.chasing = False
+        self.path_request = None
+        self.path = None
+        self.path_index = 0
+        self.segment = None  # [start, end, link kind, progress] of the path link being followed
+        self.repath_timer = 0
+
         self.use_rotate_cache = True
 
     @classmethod
@@ -38,8 +78,114 @@ class Enemy(pgp.sprite.Sprite):
             "fall": pgp.load_spritesheet(Path("assets/enemy/enemy_fall.png"), size=24, count=3),
         }
 
+    def catch_up(self, ticks):
+        if self.chasing:
+            self.stop_chasing()
+            return
+        # Walk the missed distance between the boundaries, skipping animation and random stops
+        self.flip_timer -= ticks
+        if not self.walking:
+            return
+        self.pos[0] += self.movement[0]*ticks
+        if self.right >= self.boundary_right:
+            self.right = self.boundary_right - 1
+            self.movement[0] = -abs(self.movement[0])
+        elif self.left <= self.boundary_left:
+            self.left = self.boundary_left + 1
+            self.movement[0] = abs(self.movement[0])
+
     def update(self):
         super().update()
+        navigation = self.engine.scene["Walls"].navigation
+        player = self.engine.player
+        near_player = math.hypot(player.centerx-self.centerx, player.centery-self.centery) < self.chase_radius
+        if navigation is not None and near_player:
+            self.chase(navigation)
+        else:
+            if self.chasing:
+                self.stop_chasing()
+            self.patrol()
+
+    def hurt(self):
+        self.hit_layer = 0  # Nothing else hits it before it's gone
+        self.engine.particles.burst(ENEMY_POOF, (self.centerx, self.centery), 24)
+        self.kill()
+
+    def chase(self, navigation):
+        self.chasing = True
+        graph = navigation.graph
+        self.repath_timer -= 1
+        # Only plan from a node, so a new path never starts halfway along a jump
+        if self.segment is None and (self.repath_timer <= 0 or self.path_request is None):
+            self.repath_timer = self.repath_interval
+            player = self.engine.player
+            start = graph.node_at((self.centerx, self.bottom-1))
+            goal = graph.node_at((player.centerx, player.bottom-1))
+            self.path_request = navigation.request(start, goal)
+            self.path = None
+        if self.path is None and self.path_request.done and self.path_request.path is not None:
+            self.path = self.path_request.path
+            self.path_index = 1  # The first node is where the enemy already is
+
+        if self.segment is None and self.path is not None and self.path_index < len(self.path):
+            node, kind = self.path[self.path_index]
+            self.path_index += 1
+            self.segment = [(self.centerx, self.bottom), graph.standing_point(node), kind, 0]
+
+        if self.segment is None:
+            self.surface = self.idle_anim.update(direction=self.face_direction)
+            return
+        self.follow_segment(graph.tile_size)
+
+    def follow_segment(self, tile_size):
+        (start_x, start_y), (end_x, end_y), kind, progress = self.segment
+        length = max(math.hypot(end_x-start_x, end_y-start_y), 1)
+        progress = min(progress + self.chase_speed/length, 1)
+        self.segment[3] = progress
+
+        if kind == pgp.navigation.JUMP:
+            height = tile_size/2 + max(start_y-end_y, 0)/2
+            x = pgp.lerp(start_x, end_x, progress)
+            y = pgp.lerp(start_y, end_y, progress) - 4*height*progress*(1-progress)
+        elif kind == pgp.navigation.DROP:
+            # Step off the ledge first, then fall
+            x = pgp.lerp(start_x, end_x, min(progress*3, 1))
+            y = pgp.lerp(start_y, end_y, progress*progress)
+        else:
+            x = pgp.lerp(start_x, end_x, progress)
+            y = pgp.lerp(start_y, end_y, progress)
+        self.centerx = x
+        self.bottom = y
+
+        if end_x > start_x:
+            self.face_direction = pgp.RIGHT_FACING
+        elif end_x < start_x:
+            self.face_direction = pgp.LEFT_FACING
+        if kind == pgp.navigation.WALK:
+            self.surface = self.walk_anim.update(direction=self.face_direction)
+        else:
+            self.surface = self.fall_anim.frames_dict[self.face_direction]["default"][-1]
+        if progress >= 1:
+            self.segment = None
+
+    def stop_chasing(self):
+        """Lands wherever the current path link ends and goes back to patrolling the flat ground it is on."""
+        self.chasing = False
+        if self.segment is not None:
+            self.centerx, self.bottom = self.segment[1]
+            self.segment = None
+        self.path_request = None
+        self.path = None
+
+        navigation = self.engine.scene["Walls"].navigation
+        node = navigation.graph.node_at((self.centerx, self.bottom-1)) if navigation is not None else None
+        if node is not None:
+            tile_size = navigation.graph.tile_size
+            left, right = navigation.graph.walk_span(node, int(self.patrol_width//tile_size//2) + 1)
+            self.boundary_left = left*tile_size
+            self.boundary_right = (right+1)*tile_size
+
+    def patrol(self):
         self.flip_timer -= 1
         switched = False
         if self.right >= self.boundary_right or self.left <= self.boundary_left:
@@ -52,8 +198,10 @@ class Enemy(pgp.sprite.Sprite):
             if self.walking:
                 if random.choice([True, False]):
                     self.movement[0] *= -1
-        
-        if self.walking:
+        # A ledge the enemy ended up on after a chase can be too short to pace on
+        walking = self.walking and self.boundary_right - self.boundary_left > self.size[0] + abs(self.movement[0])*2
+
+        if walking:
             self.pos[0] += self.movement[0]
         self.pos[1] += self.movement[1]
 
@@ -62,13 +210,16 @@ class Enemy(pgp.sprite.Sprite):
         elif self.movement[0] < 0:
             self.face_direction = pgp.LEFT_FACING
 
-        if self.walking:
+        if walking:
             self.surface = self.walk_anim.update(direction=self.face_direction)
         else:
             self.surface = self.idle_anim.update(direction=self.face_direction)
         
 
 class Tile(pgp.sprite.Sprite):
+    update_policy = pgp.activity.UpdatePolicy(active_radius=256)
+    dynamic = False  # Plain tiles never change on their own, subclasses that override update() are ticked
+
     def __init__(self, surface: pg.Surface, pos=[0,0], properties={}, animated=False):
         super().__init__()
         self.surface = surface
@@ -78,45 +229,87 @@ class Tile(pgp.sprite.Sprite):
         self.tile_type = self.properties.get("tile_type")
         self.animated = animated
         self.pos = pos
+        self.update_geometry()
 
     def point_in_tile(self, point):
         """This method can calculate collisions with shape types like slopes."""
-        if self.rect().collidepoint(*point):
-            rel_to_tile = point[0] - self.left, point[1] - self.top
-            if self.shape_type == "slope1":
-                if rel_to_tile[1] > self.size[0]-rel_to_tile[0]:
-                    return True
-                else:
-                    return False
-            elif self.shape_type == "slope2":
-                if rel_to_tile[1] >= rel_to_tile[0]:
-                    return True
-                else:
-                    return False
-            else:
-                return True
-        return False
+        return self.geometry.contains(point[0] - self.left, point[1] - self.top)
 
     def update(self):
         super().update()
         self.opacity = 255
 
 
+class AnimatedTile(Tile):
+    """A tile of a Tiled animated tile type. Every tile of the type shows the same pgp.animation.SharedAnimation,
+    so they cost nothing per tick and a single frame lookup per tick between them when drawn."""
+    def __init__(self, surface: pg.Surface, pos=[0,0], properties={}, animation=None):
+        self.animation = animation
+        self.loaded = False
+        super().__init__(surface, pos, properties, animated=True)
+        self.loaded = True
+
+    @property
+    def surface(self):
+        return self.animation.surface
+
+    @surface.setter
+    def surface(self, value):
+        # Tile.__init__ assigns the surface it was made with, after that the frame always comes from the animation
+        if self.loaded:
+            raise Exception("An animated tile's surface comes from its animation and can't be assigned")
+
+
 class MovingTile(pgp.sprite.Sprite): pass
 
 
 class CoinTile(Tile):
+    """Coins bob in step with each other off the global animation clock while they wait to be collected, so they
+    stay static and aren't ticked. collect() activates the coin to play its collect animation."""
+    dynamic = False
+    BOB_HEIGHT = 7
+    _bob_tick = None
+    _bob = 0
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.surface = pgp.load_image(Path("assets/tiles/gold_coin/gold_coin.png"))
-        surfaces = pgp.load_spritesheet(Path("assets/tiles/gold_coin/gold_coin_collect.png"))
-        self.collect_anim = pgp.animation.AnimationStates({"default": surfaces}, speed=0.1)
-        self.original_y = self.pos[1]
-        self.frames_passed = 0
+        self.surface = self.coin_surface
+        self.collect_anim = None
         self.collected = False
 
+    @classmethod
+    def load_resources(cls):
+        cls.coin_surface = pgp.load_image(Path("assets/tiles/gold_coin/gold_coin.png"))
+        cls.collect_surfaces = pgp.load_spritesheet(Path("assets/tiles/gold_coin/gold_coin_collect.png"))
+
+    @classmethod
+    def bob(cls):
+        """How far down every waiting coin is drawn this tick, worked out once per tick for all of them."""
+        ticks = pgp.animation.clock.ticks
+        if not CoinTile._bob_tick == ticks:
+            CoinTile._bob_tick = ticks
+            CoinTile._bob = math.sin(ticks/21) * CoinTile.BOB_HEIGHT
+        return CoinTile._bob
+
     def collect(self):
         self.collected = True
+        self.collect_anim = pgp.animation.AnimationStates({"default": self.collect_surfaces}, speed=0.1)
+        self.activate()
+        self.engine.particles.burst(COIN_SPARKLE, (self.centerx, self.centery), 16)
+        minimap = self.engine.scene["Walls"].minimap
+        if minimap is not None:
+            minimap.remove_item(self)
+
+    def view_bounds(self):
+        return super().view_bounds().inflate(0, self.BOB_HEIGHT*2)
+
+    def draw(self):
+        if self.collected:
+            super().draw()
+        else:
+            self.draw_pos[0] = self.pos[0]
+            self.draw_pos[1] = self.pos[1] + self.bob()
+            self.raw_draw(self.draw_pos)
 
     def update(self):
         super().update()
@@ -124,19 +317,19 @@ class CoinTile(Tile):
             self.surface = self.collect_anim.update()
             if self.collect_anim.finished:
                 self.kill()
-            self.pos[1] = self.original_y
-        else:
-            self.frames_passed += 1
-            self.pos[1] = self.original_y + (math.sin(self.frames_passed/21) * 7)
 
 
 class RopeTile(Tile):
     """Doesn't do much now... will work on later"""
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.surface = pgp.load_image(Path("assets/tiles/rope.png"))
+        self.surface = self.rope_surface
         self.change_angle = 2
 
+    @classmethod
+    def load_resources(cls):
+        cls.rope_surface = pgp.load_image(Path("assets/tiles/rope.png"))
+
     def update(self):
         super().update()
         self.angle += self.change_angle
@@ -151,6 +344,8 @@ DEACCELERATION = 1.15
 MAX_WALK_SPEED = 8.25
 
 class Player(pgp.sprite.Sprite):
+    blink_palette = pgp.palette.Recolor({(21,12,69): (232,187,121)})
+
     def __init__(self, spawn_centerx, spawn_bottom):
         super().__init__()
 
@@ -165,6 +360,7 @@ class Player(pgp.sprite.Sprite):
         )
         
         self.collisions = {"top": False, "left": False, "right": False, "bottom": False}
+        self.landing_speed = 0
         self.face_direction = pgp.RIGHT_FACING
 
         self.can_jump = True
@@ -172,16 +368,10 @@ class Player(pgp.sprite.Sprite):
         self.jump_count = 0
         self.gravity = 1.1
 
-        self.sounds = {
-            "jump": pg.mixer.Sound(Path("assets/sounds/jump.wav")),
-            "spring": pg.mixer.Sound(Path("assets/sounds/spring.wav")),
-            "coin": pg.mixer.Sound(Path("assets/sounds/coin.wav")),
-            "shuriken_throw": pg.mixer.Sound(Path("assets/sounds/shuriken_throw.wav"))
-        }
-
         self.god_mode = False
         self.on_slope = False
         self.blink = 0
+        self.palette = pgp.palette.ORIGINAL
         self.walking = False
         self.anim_state = "idle"
 
@@ -190,9 +380,7 @@ class Player(pgp.sprite.Sprite):
 
         self.use_rotate_cache = True
 
-        hitbox_rect = pgp.load_image(Path("assets/player/hitbox.png")).get_bounding_rect()
-        self.size = list(hitbox_rect.size)
-        self.draw_rect_offset = -hitbox_rect.topleft[0], -hitbox_rect.topleft[1]
+        self.set_size_from_surface(pgp.load_image(Path("assets/player/hitbox.png")))
 
         self.centerx = spawn_centerx
         self.bottom = spawn_bottom
@@ -200,25 +388,14 @@ class Player(pgp.sprite.Sprite):
 
     @classmethod
     def load_resources(cls):
-        s = pgp.load_spritesheet(Path("assets/player/player_idle.png"), size=24, count=4)
+        # Indexed frames, blinking is a palette swap at draw time instead of a second copy of every frame
+        s = pgp.palette.load_spritesheet(Path("assets/player/player_idle.png"), size=24, count=4)
         idle_surfaces = [s[0], s[0], s[1], s[2], s[3], s[3], s[2], s[1]]
-        idle_surfaces_dict = {
-            "default": idle_surfaces, 
-            "blink": cls.blinkify_surfaces(idle_surfaces)
-        }
-
-        walk_surfaces = pgp.load_spritesheet(Path("assets/player/player_walk.png"), size=24, count=10)
-        walk_surfaces_dict = {
-            "default": walk_surfaces, 
-            "blink": cls.blinkify_surfaces(walk_surfaces)
-        }
-        
-
-        fall_surfaces = pgp.load_spritesheet(Path("assets/player/player_fall.png"), size=24, count=3)
-        fall_surfaces_dict = {
-            "default": fall_surfaces,
-            "blink": cls.blinkify_surfaces(fall_surfaces)
-        }
+        idle_surfaces_dict = {"default": idle_surfaces}
+        walk_surfaces = pgp.palette.load_spritesheet(Path("assets/player/player_walk.png"), size=24, count=10)
+        walk_surfaces_dict = {"default": walk_surfaces}
+        fall_surfaces = pgp.palette.load_spritesheet(Path("assets/player/player_fall.png"), size=24, count=3)
+        fall_surfaces_dict = {"default": fall_surfaces}
 
         cls.all_images = {
             "idle_dict": idle_surfaces_dict,
@@ -226,6 +403,12 @@ class Player(pgp.sprite.Sprite):
             "fall_dict": fall_surfaces_dict,
         }
 
+        sound_bank = cls.engine.sound_bank
+        sound_bank.load("jump", Path("assets/sounds/jump.wav"), max_voices=1, priority=2)
+        sound_bank.load("spring", Path("assets/sounds/spring.wav"), max_voices=2, priority=2)
+        sound_bank.load("coin", Path("assets/sounds/coin.wav"), max_voices=3, priority=0)
+        sound_bank.load("shuriken_throw", Path("assets/sounds/shuriken_throw.wav"), max_voices=2, priority=1)
+
     
     def move_on_god_mode(self):
         speed = 18
@@ -255,7 +438,7 @@ class Player(pgp.sprite.Sprite):
             and not self.stop_jump:
             self.movement[1] = -JUMP_SPEED
             if self.jump_count == 0:
-                self.sounds["jump"].play()
+                self.engine.sound_bank.play("jump")
             self.jump_count += 1
 
         if self.engine.keys["right"] and not self.engine.keys["left"]:
@@ -287,10 +470,6 @@ class Player(pgp.sprite.Sprite):
                 hit_list.append(tile)
         return hit_list
 
-    @staticmethod
-    def blinkify_surfaces(surfaces):
-        return [pgp.pallete_swap(surface, (21,12,69,255), (232,187,121,255)) for surface in surfaces]
-    
     def do_collisions(self):
         if self.on_slope and not self.movement[1] < 0:
             self.movement[1] += 10
@@ -302,7 +481,7 @@ class Player(pgp.sprite.Sprite):
         self.pos[0] += self.movement[0]
         hit_list = self.get_collisions(walls.get_nearby_tiles_at(self.rect()))
         for tile in hit_list:
-            if not tile.shape_type in ("slope1", "slope2"):
+            if tile.geometry.full:
                 if self.movement[0] > 0 and self.right>=tile.left and self.left<=tile.left:
                     self.right = tile.left
                     self.collisions["right"] = True
@@ -324,42 +503,40 @@ class Player(pgp.sprite.Sprite):
                 #         rect.right = tile.rect().left
                 #         self.collisions["right"] = True
 
+        bottom_before_fall = self.bottom
         self.pos[1] += self.movement[1]
         hit_list = self.get_collisions(walls.get_nearby_tiles_at(self.rect()))
         for tile in hit_list:
-            if not tile.shape_type in ("slope1", "slope2"):
+            geometry = tile.geometry
+            if geometry.full:
                 if self.movement[1] > 0 and tile.top<=self.bottom and tile.bottom>=self.bottom:
                     self.bottom = tile.top
                     self.collisions["bottom"] = True
                 elif self.movement[1] < 0 and self.top<=tile.bottom and self.bottom>=tile.bottom:
                     self.top = tile.bottom
                     self.collisions["top"] = True
-            else:
-                if tile.shape_type in ("slope1", "slope2"):
-                    if self.movement[1] < 0 and self.top<=tile.bottom and self.bottom>=tile.bottom:
-                        self.top = tile.bottom
-                        self.collisions["top"] = True
+            elif not geometry.one_way:
+                if self.movement[1] < 0 and self.top<=tile.bottom and self.bottom>=tile.bottom:
+                    self.top = tile.bottom
+                    self.collisions["top"] = True
         
         self.on_slope = False
         hit_list = self.get_collisions(walls.get_nearby_tiles_at(self.rect()))
         for tile in hit_list:
-            if tile.shape_type in ("slope1", "slope2"):
-                if tile.shape_type == "slope1":
-                    pos_height = self.right - tile.left
-                elif tile.shape_type == "slope2":
-                    pos_height = tile.right - self.left
-                
-                # Add constraints
-                pos_height = min(pos_height, tile.rect().height)
-                pos_height = max(pos_height, 0)
-
+            geometry = tile.geometry
+            if not geometry.full:
+                pos_height = geometry.floor_under(self.left - tile.left, self.right - tile.left)
                 target_y = tile.bottom - pos_height
+                # One way platforms only catch what comes down onto them from above
+                if geometry.one_way and (self.movement[1] < 0 or bottom_before_fall > target_y):
+                    continue
 
                 if self.bottom > target_y:
                     self.bottom = target_y
                     self.collisions["bottom"] = True
                     self.on_slope = True
 
+        self.landing_speed = self.movement[1]
         if self.collisions["bottom"] or self.collisions["top"]:
             self.movement[1] = 0
 
@@ -381,7 +558,7 @@ class Player(pgp.sprite.Sprite):
             self.engine.scene["Projectiles"].append(shuriken)
             self.can_shoot_shuriken = False
             self.shuriken_refresh_time = 22
-            self.sounds["shuriken_throw"].play()
+            self.engine.sound_bank.play("shuriken_throw")
             self.shuriken_refresh_time
 
         hit_list = self.get_collisions(self.engine.scene["Objects"]) 
@@ -389,15 +566,20 @@ class Player(pgp.sprite.Sprite):
             if obj.tile_type == "spring":
                 self.bottom = obj.top
                 self.movement[1] = -32
-                self.sounds["spring"].play()
+                self.engine.sound_bank.play("spring")
+                self.engine.particles.burst(SPRING_DUST, (self.centerx, self.bottom), 20)
                 # Cancel the jump
                 self.jump_count = MAX_JUMP_COUNT
             elif obj.tile_type == "coin":
                 if not obj.collected:
                     obj.collect()
-                    self.sounds["coin"].play()
+                    self.engine.sound_bank.play("coin")
 
+        was_on_ground = self.collisions["bottom"]
         self.do_collisions()
+        # Only land hard enough to kick up dust when falling faster than a short hop
+        if self.collisions["bottom"] and not was_on_ground and self.landing_speed > 16:
+            self.engine.particles.burst(LANDING_DUST, (self.centerx, self.bottom), int(self.landing_speed))
         self.update_animation()
 
     def update_animation(self):
@@ -411,13 +593,13 @@ class Player(pgp.sprite.Sprite):
             self.blink = random.randint(-400, -250)
 
         if self.blink > 0:
-            state = "blink"
+            self.palette = self.blink_palette
         else:
-            state = "default"
+            self.palette = pgp.palette.ORIGINAL
 
         if self.god_mode:
             self.anim_state = "god"
-            self.surface = self.fall_anim.frames_dict[self.face_direction][state][-1]
+            self.surface = self.fall_anim.frames_dict[self.face_direction]["default"][-1]
 
         elif not self.can_jump:
             if not self.anim_state in ("in_fall", "fall"):
@@ -425,19 +607,18 @@ class Player(pgp.sprite.Sprite):
                 self.fall_anim.reset()
 
             if self.anim_state == "in_fall":
-                self.surface = self.fall_anim.update(state=state, direction=self.face_direction)
+                self.surface = self.fall_anim.update(direction=self.face_direction)
                 if self.fall_anim.finished:
                     self.anim_state = "fall"
 
             elif self.anim_state == "fall":
-                self.surface = self.fall_anim.frames_dict[self.face_direction][state][-1]
+                self.surface = self.fall_anim.frames_dict[self.face_direction]["default"][-1]
 
         elif self.anim_state in ("in_fall", "fall", "out_fall"):
             if self.anim_state in ("in_fall", "fall"):
                 self.anim_state = "out_fall"
                 self.fall_anim.reset()
-            self.surface = self.fall_anim.update(state=state, direction=self.face_direction, 
-                                                 reverse=True, speed_alpha=3)
+            self.surface = self.fall_anim.update(direction=self.face_direction, reverse=True, speed_alpha=3)
             if self.fall_anim.finished:
                 self.anim_state = "exit_fall"
 
@@ -446,20 +627,21 @@ class Player(pgp.sprite.Sprite):
             if not self.anim_state == "walk":
                 self.walk_anim.reset()
             self.anim_state = "walk"
-            self.surface = self.walk_anim.update(state=state, 
-                                                 direction=self.face_direction, 
+            self.surface = self.walk_anim.update(direction=self.face_direction,
                                                  speed_alpha=abs(self.movement[0]/MAX_WALK_SPEED))
 
         else:
             if not self.anim_state == "idle":
                 self.idle_anim.reset()
             self.anim_state = "idle"
-            self.surface = self.idle_anim.update(state=state, direction=self.face_direction)
+            self.surface = self.idle_anim.update(direction=self.face_direction)
 
 
 
 class Shuriken(pgp.sprite.Sprite):
     speed = 14
+    hit_mask = HIT_ENEMY
+    swept_hits = True
     def __init__(self, player, direction):
         super().__init__()
         if direction == pgp.RIGHT_FACING:
@@ -484,7 +666,7 @@ class Shuriken(pgp.sprite.Sprite):
     @classmethod
     def load_resources(cls):
         cls.idle_surface = pgp.load_image(Path("assets/projectiles/shuriken.png"))
-        cls.idle_surface_flipped = pg.transform.flip(cls.idle_surface, True, False)
+        cls.idle_surface_flipped = pgp.memory.track(pgp.animation.flip_x(cls.idle_surface), "transform:Shuriken flip")
         
     def update(self):
         super().update()
@@ -512,11 +694,23 @@ class Shuriken(pgp.sprite.Sprite):
             for point in points:
                 if tile := walls.hash_tilemap.get(walls.hash_point(point)):
                     if tile.point_in_tile(point):
+                        # Sparks fly back the way the shuriken came from
+                        self.engine.particles.burst(SHURIKEN_SPARKS, point, 12,
+                                                    velocity=(-self.movement[0]*0.3, -3))
                         self.movement[0], self.movement[1] = 0,0
                         self.time_on_wall = 280
+                        self.hit_mask = 0  # Stuck in the wall, it can't hurt anyone anymore
+                        break
         self.angle += self.movement[0]*-0.7
         self.pos[0] += self.movement[0]
         self.pos[1] += self.movement[1]
         self.distance_traveled += abs(self.movement[0])
         if self.distance_traveled > 3200:
-            self.kill()
\ No newline at end of file
+            self.kill()
+
+    def strike(self, enemy):
+        self.hit_mask = 0
+        self.engine.particles.burst(SHURIKEN_SPARKS, (self.centerx, self.centery), 8,
+                                    velocity=(self.movement[0]*0.2, -3))
+        self.kill()
+        enemy.hurt()
\ No newline at end of file
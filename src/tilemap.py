@@ -1,95 +1,262 @@
+import pygame as pg
 import pygplus as pgp
 
-import pytiled_parser
-import pytiled_parser.tiled_object
-
-from sprites import Tile, CoinTile, Enemy, RopeTile
+from sprites import Tile, AnimatedTile, CoinTile, Enemy, RopeTile
 
 from pathlib import Path
 
 DEFAULT_CLASS = Tile
-TYPES_TO_TILES = {
-    "coin": {
-        "class": CoinTile
-    },
-    "rope": {
-        "class": RopeTile
-    }
-}
+DEFAULT_BACKGROUND = (119, 196, 236)  # For maps without a background color
+
+# tile_type property -> factory(surface, pos, properties) for tiles in tile layers
+TILE_TYPES = {}
+# tile_type property -> factory(obj, properties, surface, objects_by_id) for tile objects in object layers
+OBJECT_TYPES = {}
+
+def register_tile_type(tile_type, factory):
+    TILE_TYPES[tile_type] = factory
+
+def register_object_type(tile_type, factory):
+    OBJECT_TYPES[tile_type] = factory
+
+
+def make_green_ninja(obj, properties, surface, objects_by_id):
+    b_left_x = objects_by_id[properties["boundary_left"]].coordinates[0] * pgp.SCALE
+    b_right_x = objects_by_id[properties["boundary_right"]].coordinates[0] * pgp.SCALE
+
+    sprite = Enemy(b_left_x, b_right_x, surface)
+    sprite.left = obj.coordinates[0] * pgp.SCALE
+    sprite.bottom = obj.coordinates[1] * pgp.SCALE
+    return sprite
+
+
+register_tile_type("coin", CoinTile)
+register_tile_type("rope", RopeTile)
+register_object_type("green_ninja", make_green_ninja)
+
+
+def parse_tilemap(filename: Path):
+    """Everything about loading a map that doesn't need the display, so it can run on a worker thread: parsing the
+    map and its tilesets and reading their images and those of image layers from disk. Returns (tiled map,
+    {image path: raw surface})."""
+    # pytiled_parser is slow to import and only needed once a map is actually loaded
+    import pytiled_parser
+
+    tilemap = pytiled_parser.parse_map(filename)
+    images = {}
+    for layer in tilemap.layers:
+        if isinstance(layer, pytiled_parser.ImageLayer):
+            # Unlike tileset images, image layer paths are left relative to the map
+            layer.image = Path(filename).parent / layer.image
+            if not layer.image in images:
+                images[layer.image] = pg.image.load(layer.image)
+    for tileset in tilemap.tilesets.values():
+        paths = [tileset.image] if tileset.image is not None else [tile.image for tile in tileset.tiles.values()]
+        for path in paths:
+            if not path in images:
+                images[path] = pg.image.load(path)
+    return tilemap, images
 
 
 class Tilemap:
-    def __init__(self, filename: Path):
-        tilemap = pytiled_parser.parse_map(filename)
-        tile_size = 16
+    # Cells of a tile layer built per step of build()
+    CELLS_PER_STEP = 256
+    OBJECTS_PER_STEP = 32
+
+    def __init__(self, filename: Path = None):
+        self.width = self.height = 0
+        self.layers = {}
+        self.cells = {}  # Tile layer name -> {grid position: tile}, for patch()
+        self.data = {}  # Tile layer name -> the gids it was built from
+        self.background = None
+        self.spawn_point = None
+        if filename is not None:
+            for _ in self.build(parse_tilemap(filename)):
+                pass
+
+    def build(self, parsed):
+        """Builds the layers from parse_tilemap()'s result in small steps, yielding progress from 0 to 1 between
+        them so the work can be spread over frames. Exhausting it right away is a plain synchronous load."""
+        import pytiled_parser
+
+        tilemap, images = parsed
+        self.width = tilemap.map_size.width * tilemap.tile_size.width * pgp.SCALE
+        self.height = tilemap.map_size.height * tilemap.tile_size.height * pgp.SCALE
+        self.id_to_tile_info = yield from self.build_tile_info(tilemap, images)
+        total_cells = sum(len(layer.data)*tilemap.map_size.width for layer in tilemap.layers
+                          if isinstance(layer, pytiled_parser.TileLayer))
+        cells_done = 0
+        self.background = pgp.background.Background(color=tuple(tilemap.background_color or DEFAULT_BACKGROUND)[:3])
+        for layer in tilemap.layers:
+            if isinstance(layer, pytiled_parser.ImageLayer):
+                if layer.visible:
+                    self.background.layers.append(self.load_image_layer(layer, images))
+                    yield cells_done / max(total_cells, 1)
+                continue
+            self.layers[layer.name] = pgp.sprite.SpriteList()
+            if isinstance(layer, pytiled_parser.TileLayer):
+                self.cells[layer.name] = {}
+                self.data[layer.name] = layer.data
+                for cells in self.load_tile_layer(layer):
+                    cells_done += cells
+                    yield cells_done / max(total_cells, 1)
+            elif isinstance(layer, pytiled_parser.ObjectLayer):
+                for _ in self.load_object_layer(layer):
+                    yield cells_done / max(total_cells, 1)
+
+    @staticmethod
+    def build_tile_info(tilemap, images):
+        """gid -> {"surface", "properties", "animation"} for every tile in every tileset, built in one pass over each
+        tileset. Tiles with Tiled animation frames get one pgp.animation.SharedAnimation per gid, shared by all of
+        their tiles. Converts one image per step."""
         id_to_tile_info = {}
+        image_cache = {}
         for firstgid, tileset in tilemap.tilesets.items():
+            tiles = tileset.tiles or {}
             if tileset.image is None:
                 # Collection of images
-                for tileid, tile in tileset.tiles.items():
-                    id_to_tile_info[tileid+firstgid] = {
-                        "surface": pgp.load_image(tile.image),  # TODO: Add caching
-                        "properties": tile.properties,
-                    }
+                surfaces = {}
+                for tileid, tile in tiles.items():
+                    if not tile.image in image_cache:
+                        image_cache[tile.image] = pgp.convert_image(images[tile.image], tile.image)
+                        yield 0
+                    surfaces[tileid] = image_cache[tile.image]
             else:
                 # Spritesheet image
-                surfaces = pgp.load_spritesheet(tileset.image)
-                for index, surface in enumerate(surfaces):
-                    id_to_tile_info[index+firstgid] = {"surface": surface, "properties": {}}
-                    for tileid, tile in tileset.tiles.items():
-                        if index == tileid:
-                            id_to_tile_info[index+firstgid]["properties"] = tile.properties
-        self.layers = {}
+                surfaces = dict(enumerate(pgp.split_spritesheet(images[tileset.image], tileset.image)))
+                yield 0
+            for tileid, surface in surfaces.items():
+                tile = tiles.get(tileid)
+                properties = tile.properties if tile is not None else None
+                animation = None
+                if tile is not None and tile.animation:
+                    animation = pgp.animation.SharedAnimation([surfaces[frame.tile_id] for frame in tile.animation],
+                                                              [frame.duration for frame in tile.animation])
+                id_to_tile_info[tileid+firstgid] = {
+                    "surface": surface,
+                    "properties": properties or {},
+                    "animation": animation,
+                }
+        return id_to_tile_info
+
+    @staticmethod
+    def load_image_layer(layer, images):
+        surface = pgp.convert_image(images[layer.image], layer.image)
+        offset = ((layer.offset.x + layer.coordinates.x) * pgp.SCALE,
+                  (layer.offset.y + layer.coordinates.y) * pgp.SCALE)
+        return pgp.background.ParallaxLayer(surface, parallax=layer.parallax_factor, offset=offset,
+                                            repeat_x=layer.repeat_x, repeat_y=layer.repeat_y,
+                                            opacity=round(layer.opacity*255))
+
+    def load_tile_layer(self, layer):
+        """Yields the number of cells built every CELLS_PER_STEP cells."""
+        spritelist = self.layers[layer.name]
+        layer_cells = self.cells[layer.name]
+        cells = 0
+        for y, row in enumerate(layer.data):
+            for x, num in enumerate(row):
+                cells += 1
+                if cells == self.CELLS_PER_STEP:
+                    yield cells
+                    cells = 0
+                if num == 0: continue
+                tile_object = self.make_tile(num, x, y)
+                layer_cells[(x, y)] = tile_object
+                spritelist.append(tile_object)
+        yield cells
+
+    def make_tile(self, num, x, y):
+        tile_size = 16*pgp.SCALE
+        tile_info = self.id_to_tile_info[num]
+        properties = tile_info["properties"]
+        surface = tile_info["surface"]
+
+        factory = TILE_TYPES.get(properties.get("tile_type"), DEFAULT_CLASS)
+        pos = [x*tile_size, y*tile_size-(surface.get_height()*pgp.world_per_pixel()-tile_size)]
+        animation = tile_info["animation"]
+        if animation is not None and factory is DEFAULT_CLASS:
+            tile_object = AnimatedTile(surface=surface, pos=pos, properties=properties, animation=animation)
+        else:
+            tile_object = factory(surface=surface, pos=pos, properties=properties)
+
+        shape_type = properties.get("shape_type")
+        if shape_type is not None and shape_type in pgp.shapes.SHAPES:
+            tile_object.set_shape(shape_type)
+        return tile_object
+
+    def patch(self, parsed, rebuild_all=False):
+        """Brings the live tile layers in line with a new parse_tilemap() of the same map, touching only cells whose
+        gid changed. Lists with a hash tilemap go through add_tile() and remove_tile(), so autotiling, navigation and
+        the minimap follow along. Object layers are left alone since they hold live state like enemies. With
+        rebuild_all every cell is rebuilt, for when a tileset changed what its gids mean. Returns (old tile or None,
+        new tile or None) for every changed cell. Raises before touching anything if the map uses a gid that no
+        tileset has."""
+        import pytiled_parser
+
+        tilemap, images = parsed
+        id_to_tile_info = pgp.prefetch.exhaust(self.build_tile_info(tilemap, images))
         for layer in tilemap.layers:
-            self.layers[layer.name] = pgp.sprite.SpriteList()
-            if isinstance(layer, pytiled_parser.TileLayer):
-                tiles_data = layer.data
-                for y, row in enumerate(tiles_data):
-                    for x, num in enumerate(row):
-                        if num == 0: continue
-                        tile_info = id_to_tile_info[num]
-                        properties = tile_info["properties"]
-                        if properties is None:
-                            properties = {}
-
-                        custom_class = Tile
-                        if properties:
-                            tile_type = properties.get("tile_type")
-                            if TYPES_TO_TILES.get(tile_type):
-                                custom_class = TYPES_TO_TILES.get(tile_type)["class"]
-                        pos = [x*tile_size*pgp.SCALE, 
-                               y*tile_size*pgp.SCALE-(tile_info["surface"].get_height()-
-                                                                tile_size*pgp.SCALE)]
-                        tile_object = custom_class(surface=tile_info["surface"], 
-                                                   pos=pos, 
-                                                   properties=properties)
-
-                        if properties.get("shape_type") == "slope1":
-                            tile_object.shape_type = "slope1"
-                        elif properties.get("shape_type") == "slope2":
-                            tile_object.shape_type = "slope2"
-                        self.layers[layer.name].append(tile_object)
+            if isinstance(layer, pytiled_parser.TileLayer) and layer.name in self.cells:
+                unknown = {num for row in layer.data for num in row if num and not num in id_to_tile_info}
+                if unknown:
+                    raise Exception(f"Layer {layer.name} uses gids {sorted(unknown)} that no tileset has")
+        self.width = tilemap.map_size.width * tilemap.tile_size.width * pgp.SCALE
+        self.height = tilemap.map_size.height * tilemap.tile_size.height * pgp.SCALE
+        self.id_to_tile_info = id_to_tile_info
+        changes = []
+        for layer in tilemap.layers:
+            if not isinstance(layer, pytiled_parser.TileLayer) or not layer.name in self.cells:
+                continue
+            spritelist = self.layers[layer.name]
+            layer_cells = self.cells[layer.name]
+            old_data = self.data[layer.name]
+            changed = set()
+            for y, row in enumerate(layer.data):
+                old_row = old_data[y] if y < len(old_data) else ()
+                for x, num in enumerate(row):
+                    if rebuild_all and num or not num == (old_row[x] if x < len(old_row) else 0):
+                        changed.add((x, y))
+            # Cells that are gone because the map got smaller
+            changed.update(cell for cell in layer_cells if cell[1] >= len(layer.data) or
+                           cell[0] >= len(layer.data[cell[1]]))
 
-            elif isinstance(layer, pytiled_parser.ObjectLayer):
-                for obj in layer.tiled_objects:
-                   if isinstance(obj, pytiled_parser.tiled_object.Tile):
-                        properties = {**id_to_tile_info[obj.gid]["properties"], **obj.properties}
-                        if properties.get("tile_type") == "green_ninja":
-                            b_left_id = properties["boundary_left"]
-                            b_left_obj = [obj for obj in layer.tiled_objects if obj.id == b_left_id][0]
-                            b_left_x = b_left_obj.coordinates[0] * pgp.SCALE
-                            
-                            b_right_id = properties["boundary_right"]
-                            b_right_obj = [obj for obj in layer.tiled_objects if obj.id == b_right_id][0]
-                            b_right_x = b_right_obj.coordinates[0] * pgp.SCALE
-
-                            sprite = Enemy(b_left_x, b_right_x, id_to_tile_info[obj.gid]["surface"])
-                            sprite.left, sprite.bottom = list(obj.coordinates)
-                            sprite.left *= pgp.SCALE
-                            sprite.bottom *= pgp.SCALE
-                            self.layers[layer.name].append(sprite)
-                   elif isinstance(obj, pytiled_parser.tiled_object.Point):
-                       if "spawn" in obj.properties:
-                           self.spawn_point = list(obj.coordinates)
-                           self.spawn_point[0] *= pgp.SCALE
-                           self.spawn_point[1] *= pgp.SCALE
\ No newline at end of file
+            for x, y in changed:
+                old = layer_cells.pop((x, y), None)
+                if old is not None and spritelist.has(old):
+                    if spritelist.hash_tilemap is not None:
+                        spritelist.remove_tile(old)
+                    else:
+                        spritelist.remove(old)
+                num = layer.data[y][x] if y < len(layer.data) and x < len(layer.data[y]) else 0
+                new = None
+                if num:
+                    new = self.make_tile(num, x, y)
+                    layer_cells[(x, y)] = new
+                    if spritelist.hash_tilemap is not None:
+                        spritelist.add_tile(new)
+                    else:
+                        spritelist.append(new)
+                changes.append((old, new))
+            self.data[layer.name] = layer.data
+        return changes
+
+    def load_object_layer(self, layer):
+        """Yields every OBJECTS_PER_STEP objects."""
+        import pytiled_parser.tiled_object
+
+        spritelist = self.layers[layer.name]
+        objects_by_id = {obj.id: obj for obj in layer.tiled_objects}
+        for index, obj in enumerate(layer.tiled_objects):
+            if index % self.OBJECTS_PER_STEP == self.OBJECTS_PER_STEP-1:
+                yield
+            if isinstance(obj, pytiled_parser.tiled_object.Tile):
+                tile_info = self.id_to_tile_info[obj.gid]
+                properties = {**tile_info["properties"], **obj.properties}
+                factory = OBJECT_TYPES.get(properties.get("tile_type"))
+                if factory is not None:
+                    spritelist.append(factory(obj, properties, tile_info["surface"], objects_by_id))
+            elif isinstance(obj, pytiled_parser.tiled_object.Point):
+                if "spawn" in obj.properties:
+                    self.spawn_point = list(obj.coordinates)
+                    self.spawn_point[0] *= pgp.SCALE
+                    self.spawn_point[1] *= pgp.SCALE